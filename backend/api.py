@@ -1,15 +1,19 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 import sys
 import os
-import csv
-import io
+import queue
 from datetime import datetime
 
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from database import Database
+from storage import get_storage, page_cursor
+from keyword_import import import_keywords, iter_csv_keywords
+from result_export import FORMATS, export_chunks
+from scan_manager import ScanBusy, scan_manager
+from event_stream import EventStream, format_event, status_counts
+from email_notifier import SECURITY_MODES, connect
 
 # Resolve static folder path
 if getattr(sys, 'frozen', False):
@@ -26,7 +30,12 @@ else:
     static_folder = os.path.join(project_root, 'frontend')
 
 app = Flask(__name__, static_folder=static_folder, template_folder=template_folder, static_url_path='')
-db = Database()
+db = get_storage()
+# Push channel shared by every open dashboard
+stream = EventStream(db, jobs=lambda: scan_manager().jobs())
+
+# Seconds between keepalive comments on an idle event stream
+_STREAM_KEEPALIVE = 15
 
 # Configure logging to file
 import logging
@@ -86,12 +95,13 @@ def add_keywords():
         if isinstance(keywords, str):
             keywords = [kw.strip() for kw in keywords.split(',') if kw.strip()]
         
-        added_count = db.add_keywords_bulk(keywords)
+        result = import_keywords(db, keywords)
         
         return jsonify({
             'success': True,
-            'message': f'Added {added_count} keyword(s)',
-            'count': added_count
+            'message': f'Added {result.inserted} keyword(s)',
+            'count': result.inserted,
+            **result.as_dict()
         })
         
     except Exception as e:
@@ -112,27 +122,17 @@ def upload_csv():
         if not file.filename.endswith('.csv'):
             return jsonify({'error': 'Only CSV files are allowed'}), 400
         
-        # Read CSV file
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_reader = csv.reader(stream)
-        
-        keywords = []
-        for row in csv_reader:
-            if row:  # Skip empty rows
-                # Take first column as keyword
-                keyword = row[0].strip()
-                if keyword and not keyword.startswith('#'):  # Skip empty and comment lines
-                    keywords.append(keyword)
+        # Parse and insert the CSV as it is read, in chunks
+        result = import_keywords(db, iter_csv_keywords(file.stream))
         
-        if not keywords:
+        if not result.rows:
             return jsonify({'error': 'No valid keywords found in CSV'}), 400
         
-        added_count = db.add_keywords_bulk(keywords)
-        
         return jsonify({
             'success': True,
-            'message': f'Uploaded {added_count} keyword(s) from CSV',
-            'count': added_count
+            'message': f'Uploaded {result.inserted} keyword(s) from CSV',
+            'count': result.inserted,
+            **result.as_dict()
         })
         
     except Exception as e:
@@ -140,17 +140,36 @@ def upload_csv():
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
-    """Get discovered domains"""
+    """
+    Get discovered domains, one page at a time.
+    status=available (default, newest first), taken or all (by keyword);
+    tld and keyword filter; pass next_cursor back as cursor for the next page.
+    """
     try:
-        limit = request.args.get('limit', 100, type=int)
-        domains = db.get_available_domains(limit)
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        cursor = request.args.get('cursor') or None
+        status = request.args.get('status', 'available')
+        tld = request.args.get('tld') or None
+        keyword = request.args.get('keyword') or None
+        
+        # One extra row tells whether another page exists
+        if status == 'available':
+            listing = 'available'
+            domains = db.get_available_domains(limit + 1, cursor, tld, keyword)
+        elif status in ('taken', 'all'):
+            listing = 'all'
+            domains = db.get_all_domains(limit + 1, cursor, tld, keyword,
+                                         status if status == 'taken' else None)
+        else:
+            return jsonify({'error': f"Invalid status '{status}'. Choose from: available, taken, all"}), 400
         
         results = []
-        for domain in domains:
+        for domain in domains[:limit]:
             results.append({
                 'id': domain['id'],
                 'domain': domain['domain'],
                 'keyword': domain['keyword'],
+                'available': bool(domain['available']),
                 'checked_date': domain['checked_date'],
                 'notified': bool(domain['notified'])
             })
@@ -158,7 +177,62 @@ def get_results():
         return jsonify({
             'success': True,
             'count': len(results),
-            'results': results
+            'results': results,
+            'next_cursor': page_cursor(listing, domains[limit - 1]) if len(domains) > limit else None
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _event_json(event):
+    return {
+        'epoch': event['epoch'],
+        'time': datetime.fromtimestamp(event['epoch']).strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'Available' if event['available'] else 'Taken'
+    }
+
+@app.route('/api/domains/<domain>/history', methods=['GET'])
+def get_domain_history(domain):
+    """Get when a domain became available or taken, newest first"""
+    try:
+        since = request.args.get('since', type=int)
+        until = request.args.get('until', type=int)
+        limit = min(request.args.get('limit', 1000, type=int), 10000)
+        events = db.get_domain_history(domain.lower().strip(), since, until, limit)
+        
+        return jsonify({
+            'success': True,
+            'domain': domain,
+            'count': len(events),
+            'events': [_event_json(event) for event in events]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """Get availability transitions of all domains in a time window (epoch seconds)"""
+    try:
+        # Default window: the last 24 hours
+        since = request.args.get('since', int(datetime.now().timestamp()) - 86400, type=int)
+        until = request.args.get('until', type=int)
+        limit = min(request.args.get('limit', 1000, type=int), 10000)
+        events = db.get_events(since, until, limit)
+        
+        results = []
+        for event in events:
+            item = _event_json(event)
+            item['domain'] = event['domain']
+            item['keyword'] = event['keyword']
+            results.append(item)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'events': results
         })
         
     except Exception as e:
@@ -166,46 +240,32 @@ def get_results():
 
 @app.route('/api/download-csv', methods=['GET'])
 def download_csv():
-    """Download results as CSV"""
+    """
+    Download all results, streamed as they are read.
+    format=csv (default) or ndjson; gzip=1 compresses; status, tld and
+    keyword filter as in /api/results.
+    """
     try:
-        # Get ALL domains (both available and taken)
-        domains = db.get_all_domains(limit=10000)
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Domain', 'Keyword', 'Status', 'Checked Date', 'Email Notified'])
-        
-        # Write data
-        for domain in domains:
-            # Parse the date string and format it properly for Excel
-            try:
-                # Parse the datetime string from database
-                dt = datetime.strptime(domain['checked_date'], '%Y-%m-%d %H:%M:%S')
-                # Format as Excel-friendly format (YYYY-MM-DD HH:MM:SS)
-                formatted_date = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                formatted_date = domain['checked_date']
-            
-            writer.writerow([
-                domain['domain'],
-                domain['keyword'],
-                'Available' if domain['available'] else 'Taken',
-                formatted_date,
-                'Yes' if domain['notified'] else 'No'
-            ])
-        
-        # Create response
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'domain_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        status = request.args.get('status') or None
+        rows = db.iter_export_rows(request.args.get('tld') or None,
+                                   request.args.get('keyword') or None,
+                                   None if status == 'all' else status)
+        chunks = export_chunks(rows, fmt, compress)
+        
+        mimetype, extension = FORMATS[fmt]
+        filename = f'domain_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        if compress:
+            mimetype, filename = 'application/gzip', filename + '.gz'
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -236,8 +296,8 @@ def list_keywords():
 def get_status():
     """Get system status"""
     try:
-        keywords = db.get_all_keywords()
-        all_domains = db.get_available_domains(limit=10000)
+        # Exact counts from the trigger-maintained stats row
+        stats = db.get_stats()
         
         # Check if email is strictly configured in DB (ignoring env vars for UI status)
         # This ensures users see the "Enter Email" prompt until they manually save settings
@@ -245,41 +305,126 @@ def get_status():
         
         return jsonify({
             'success': True,
-            'status': {
-                'keywords_count': len(keywords),
-                'domains_found': len(all_domains),
-                'email_configured': email_configured
-            }
+            'status': {**status_counts(stats), 'email_configured': email_configured}
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stream', methods=['GET'])
+def event_stream():
+    """Push status counters, domain changes and scan progress as Server-Sent Events"""
+    def events():
+        client = stream.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            for event, data in stream.snapshot():
+                yield format_event(event, data)
+            while True:
+                try:
+                    event, data = client.get(timeout=_STREAM_KEEPALIVE)
+                except queue.Empty:
+                    # A comment line; writing it is how a closed connection is noticed
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(event, data)
+        finally:
+            stream.unsubscribe(client)
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/scan-now', methods=['POST'])
 def trigger_scan():
-    """Trigger an immediate domain scan"""
+    """Trigger an immediate domain scan (or join the one already running)"""
     try:
-        from monitor_service import MonitorService
-        
-        # Run scan in background to avoid blocking
-        import threading
-        
-        def run_scan():
-            service = MonitorService()
-            service.run_scan()
-        
-        thread = threading.Thread(target=run_scan)
-        thread.daemon = True
-        thread.daemon = True
-        thread.start()
-        
-        logger.info("Manual scan triggered via API")
+        job, created = scan_manager().start()
+        if created:
+            logger.info("Manual scan triggered via API")
         
         return jsonify({
             'success': True,
-            'message': 'Domain scan started in background'
+            'message': 'Domain scan started in background' if created else 'Domain scan already running',
+            'created': created,
+            'job': job.as_dict()
         })
         
+    except ScanBusy as e:
+        return jsonify({'error': str(e), 'job': e.job.as_dict()}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _scan_keyword_ids(data):
+    """Keyword ids of a scan request's keyword_ids and/or keywords (names); None for all"""
+    ids, names = data.get('keyword_ids'), data.get('keywords')
+    if ids is None and names is None:
+        return None
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    
+    by_id = {row['id']: row['keyword'] for row in db.get_all_keywords()}
+    by_name = {keyword.lower(): keyword_id for keyword_id, keyword in by_id.items()}
+    selected = set()
+    for keyword_id in ids or []:
+        if not isinstance(keyword_id, int) or keyword_id not in by_id:
+            raise ValueError(f"Unknown keyword id: {keyword_id}")
+        selected.add(keyword_id)
+    for name in names or []:
+        keyword_id = by_name.get(str(name).strip().lower())
+        if keyword_id is None:
+            raise ValueError(f"Unknown keyword: {name}")
+        selected.add(keyword_id)
+    if not selected:
+        raise ValueError('No keywords selected')
+    return selected
+
+@app.route('/api/scans', methods=['POST'])
+def start_scan_job():
+    """Start a scan job, optionally of some keywords only"""
+    try:
+        job, created = scan_manager().start(_scan_keyword_ids(request.get_json(silent=True) or {}))
+        
+        return jsonify({
+            'success': True,
+            'created': created,
+            'job': job.as_dict()
+        }), 202 if created else 200
+        
+    except ScanBusy as e:
+        return jsonify({'error': str(e), 'job': e.job.as_dict()}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scans', methods=['GET'])
+def list_scan_jobs():
+    """Scan jobs of this process, newest first"""
+    try:
+        jobs = [job.as_dict() for job in scan_manager().jobs()]
+        return jsonify({'success': True, 'count': len(jobs), 'jobs': jobs})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scans/<job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """A scan job with its live progress"""
+    try:
+        job = scan_manager().get(job_id)
+        if job is None:
+            return jsonify({'error': f'Unknown scan job: {job_id}'}), 404
+        return jsonify({'success': True, 'job': job.as_dict()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scans/<job_id>/cancel', methods=['POST'])
+def cancel_scan_job(job_id):
+    """Stop a scan job; results stored so far are kept"""
+    try:
+        job = scan_manager().cancel(job_id)
+        if job is None:
+            return jsonify({'error': f'Unknown scan job: {job_id}'}), 404
+        return jsonify({'success': True, 'job': job.as_dict()})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -354,18 +499,27 @@ def save_settings():
         data = request.get_json()
         settings = data.get('settings', {})
         
-        # Save each setting
+        # Save the email settings together
+        changes = {}
         for key, value in settings.items():
             if key == 'smtp_password' and value == '********':
                 continue # Don't update password if it's the mask
                 
-            if key in ['smtp_server', 'smtp_port', 'smtp_username', 'smtp_password', 'smtp_from', 'smtp_to']:
-                db.save_setting(key, value)
+            if key == 'smtp_security' and value not in SECURITY_MODES:
+                raise ValueError(f"smtp_security must be one of {', '.join(SECURITY_MODES)}")
+                
+            if key in ['smtp_server', 'smtp_port', 'smtp_security', 'smtp_username', 'smtp_password', 'smtp_from',
+                       'smtp_to']:
+                changes[key] = value
+        if changes:
+            db.save_settings(changes)
         
         return jsonify({
             'success': True,
             'message': 'Settings saved successfully'
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -376,10 +530,9 @@ def test_email():
         # Load fresh config (which might have just been saved)
         config = Config.get_email_config()
         
-        if not Config.is_email_configured():
+        if not Config.is_email_configured(config):
             return jsonify({'error': 'Email not fully configured'}), 400
             
-        import smtplib
         from email.mime.text import MIMEText
         
         msg = MIMEText('This is a test email from Domain Monitor System.\n\nIf you received this, your email settings are configured correctly!')
@@ -387,9 +540,8 @@ def test_email():
         msg['From'] = config['smtp_from']
         msg['To'] = config['smtp_to']
         
-        with smtplib.SMTP(config['smtp_server'], config['smtp_port']) as server:
-            server.starttls()
-            server.login(config['smtp_username'], config['smtp_password'])
+        # Secured and logged in as the alert sender does it
+        with connect(config) as server:
             server.send_message(msg)
             
         return jsonify({
@@ -0,0 +1,246 @@
+"""
+Candidate domain generation.
+Rules turn each keyword into labels (exact, typos, hyphenation, affixes,
+plurals, keyword combinations); labels are crossed with the configured
+extensions and streamed to the scan engine without building a full list.
+"""
+import logging
+import re
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_LABEL_RE = re.compile(r'^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$')
+_SEPARATORS_RE = re.compile(r'[\s_.]+')
+
+# Neighbouring keys on a QWERTY keyboard, for fat-finger typos
+_ADJACENT_KEYS = {
+    'q': 'wa', 'w': 'qes', 'e': 'wrd', 'r': 'etf', 't': 'ryg', 'y': 'tuh',
+    'u': 'yij', 'i': 'uok', 'o': 'ipl', 'p': 'o', 'a': 'qsz', 's': 'adw',
+    'd': 'sfe', 'f': 'dgr', 'g': 'fht', 'h': 'gjy', 'j': 'hku', 'k': 'jli',
+    'l': 'ko', 'z': 'xa', 'x': 'zcs', 'c': 'xvd', 'v': 'cbf', 'b': 'vng',
+    'n': 'bmh', 'm': 'nj',
+}
+
+
+def split_words(keyword):
+    """Lowercase words of a keyword, split on spaces, underscores and dots"""
+    return [word for word in _SEPARATORS_RE.split(keyword.lower().strip()) if word]
+
+
+def _config_list(value):
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+
+def is_valid_label(label):
+    return bool(_LABEL_RE.match(label))
+
+
+class CandidateRule:
+    """
+    A generation rule. labels() yields candidate labels for one keyword;
+    estimate() is a rough count used to size the deduplication filter.
+    """
+    name = None
+
+    def prepare(self, keywords):
+        """Called once per scan with every keyword string"""
+
+    def labels(self, keyword):
+        raise NotImplementedError
+
+    def estimate(self, keyword):
+        return 1
+
+
+class ExactRule(CandidateRule):
+    """The keyword itself, as it has always been checked"""
+    name = 'exact'
+
+    def labels(self, keyword):
+        yield keyword.lower().strip().replace(' ', '')
+
+
+class HyphenRule(CandidateRule):
+    """Hyphens between words, or inside a single long word"""
+    name = 'hyphen'
+
+    def labels(self, keyword):
+        words = split_words(keyword)
+        if len(words) > 1:
+            yield '-'.join(words)
+            return
+        word = ''.join(words)
+        for i in range(2, len(word) - 1):
+            yield f"{word[:i]}-{word[i:]}"
+
+    def estimate(self, keyword):
+        return max(1, len(keyword) - 3)
+
+
+class TypoRule(CandidateRule):
+    """Omitted, swapped, doubled and fat-fingered characters"""
+    name = 'typo'
+
+    def labels(self, keyword):
+        word = ''.join(split_words(keyword))
+        for i in range(len(word)):
+            yield word[:i] + word[i + 1:]
+            if i + 1 < len(word) and word[i] != word[i + 1]:
+                yield word[:i] + word[i + 1] + word[i] + word[i + 2:]
+            yield word[:i + 1] + word[i] + word[i + 1:]
+            for key in _ADJACENT_KEYS.get(word[i], ''):
+                yield word[:i] + key + word[i + 1:]
+
+    def estimate(self, keyword):
+        return 6 * len(keyword)
+
+
+class AffixRule(CandidateRule):
+    """Common prefixes and suffixes (CANDIDATE_PREFIXES / CANDIDATE_SUFFIXES)"""
+    name = 'affix'
+
+    def __init__(self, prefixes=None, suffixes=None):
+        self.prefixes = prefixes if prefixes is not None else _config_list(Config.CANDIDATE_PREFIXES)
+        self.suffixes = suffixes if suffixes is not None else _config_list(Config.CANDIDATE_SUFFIXES)
+
+    def labels(self, keyword):
+        word = ''.join(split_words(keyword))
+        for prefix in self.prefixes:
+            yield prefix + word
+        for suffix in self.suffixes:
+            yield word + suffix
+
+    def estimate(self, keyword):
+        return len(self.prefixes) + len(self.suffixes)
+
+
+class PluralRule(CandidateRule):
+    """Plural and singular forms of the last word"""
+    name = 'plural'
+
+    def labels(self, keyword):
+        word = ''.join(split_words(keyword))
+        if word.endswith('ies') and len(word) > 3:
+            yield word[:-3] + 'y'
+        elif word.endswith('s') and not word.endswith('ss'):
+            yield word[:-1]
+        elif word.endswith('y') and len(word) > 1 and word[-2] not in 'aeiou':
+            yield word[:-1] + 'ies'
+        elif word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+            yield word + 'es'
+        else:
+            yield word + 's'
+
+
+class CombinationRule(CandidateRule):
+    """The keyword joined with every other keyword, with and without a hyphen"""
+    name = 'combination'
+
+    def __init__(self):
+        self.words = []
+
+    def prepare(self, keywords):
+        seen = set()
+        self.words = []
+        for keyword in keywords:
+            word = ''.join(split_words(keyword))
+            if word and word not in seen:
+                seen.add(word)
+                self.words.append(word)
+
+    def labels(self, keyword):
+        word = ''.join(split_words(keyword))
+        for other in self.words:
+            if other != word:
+                yield word + other
+                yield f"{word}-{other}"
+
+    def estimate(self, keyword):
+        return 2 * len(self.words)
+
+
+RULES = {rule.name: rule for rule in (ExactRule, HyphenRule, TypoRule, AffixRule, PluralRule, CombinationRule)}
+
+
+class CandidateGenerator:
+    """
+    Streams (keyword_id, keyword, domain) candidates.
+    Duplicates within a keyword are dropped with a per-keyword set, and
+    duplicates across keywords with a set of the labels yielded so far.
+    That set stops growing at CANDIDATE_DEDUP_CAPACITY labels; later labels
+    are still checked against it, and their own repeats are yielded again.
+    Only exact matches are skipped, so no candidate is ever lost, and a
+    keyword itself is always yielded under its own keyword.
+    """
+
+    def __init__(self, extensions=None, rules=None, capacity=None):
+        self.extensions = extensions or Config.DOMAIN_EXTENSIONS
+        if rules is None:
+            rules = _config_list(Config.CANDIDATE_RULES)
+        self.rules = [self._make_rule(rule) for rule in rules]
+        self.capacity = capacity or Config.CANDIDATE_DEDUP_CAPACITY
+        self.generated = 0
+        self.duplicates = 0
+
+    @staticmethod
+    def _make_rule(rule):
+        if isinstance(rule, CandidateRule):
+            return rule
+        if rule not in RULES:
+            raise ValueError(f"Unknown candidate rule '{rule}'. Choose from: {', '.join(RULES)}")
+        return RULES[rule]()
+
+    def estimate(self, keywords, rows=None):
+        """Rough count of the candidates generate(keywords, rows) yields, duplicates included"""
+        keywords = list(keywords)
+        for rule in self.rules:
+            rule.prepare([row['keyword'] for row in keywords])
+        labels = sum(rule.estimate(row['keyword']) for row in (keywords if rows is None else rows)
+                     for rule in self.rules)
+        return labels * len(self.extensions)
+
+    def generate(self, keywords, rows=None):
+        """
+        Yield candidates for keyword rows (dicts or rows with id and keyword).
+        rows, if given, are the keywords to expand, read lazily (a node's
+        share of a scan); every keyword still counts for combinations.
+        """
+        keywords = list(keywords)
+        for rule in self.rules:
+            rule.prepare([row['keyword'] for row in keywords])
+
+        seen_globally = set()
+        self.generated = 0
+        self.duplicates = 0
+
+        for row in keywords if rows is None else rows:
+            keyword = row['keyword']
+            seen = set()
+            for rule in self.rules:
+                for label in rule.labels(keyword):
+                    if label in seen:
+                        self.duplicates += 1
+                        continue
+                    seen.add(label)
+
+                    exact = isinstance(rule, ExactRule)
+                    if not exact and not is_valid_label(label):
+                        continue
+                    if label in seen_globally and not exact:
+                        self.duplicates += 1
+                        continue
+                    if len(seen_globally) < self.capacity:
+                        seen_globally.add(label)
+                        if len(seen_globally) == self.capacity:
+                            # Keyword combinations grow quadratically; bound the memory instead
+                            logger.warning(f"{self.capacity} candidate labels reached CANDIDATE_DEDUP_CAPACITY; "
+                                           f"new labels are no longer deduplicated across keywords")
+
+                    for ext in self.extensions:
+                        self.generated += 1
+                        yield row['id'], keyword, f"{label}{ext}"
+
+        logger.info(f"Generated {self.generated} candidate(s) from {len(keywords)} keyword(s), "
+                    f"skipped {self.duplicates} duplicate label(s)")
@@ -27,7 +27,83 @@ class Config:
     # Application Settings
     API_PORT = int(os.getenv('API_PORT', 5000))
     MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL', 3600))  # seconds
+    STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'sqlite')  # 'sqlite', or 'memory' for one-shot runs
     DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(DATA_DIR, 'domains.db'))
+    DB_WRITE_BATCH = int(os.getenv('DB_WRITE_BATCH', 500))  # scan results stored per transaction
+    DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 30.0))  # seconds to wait for a write lock
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL').upper()  # NORMAL is durable enough with WAL
+    DB_CACHE_KB = int(os.getenv('DB_CACHE_KB', 16384))  # page cache per connection
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))  # bytes of the file read via mmap
+    KEYWORD_IMPORT_CHUNK = int(os.getenv('KEYWORD_IMPORT_CHUNK', 10000))  # keywords per insert transaction
+    EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', 365))  # domain history; 0 keeps it forever
+    EVENT_COMPACT_INTERVAL = int(os.getenv('EVENT_COMPACT_INTERVAL', 86400))  # seconds between compactions
+    SETTINGS_CHECK_INTERVAL = float(os.getenv('SETTINGS_CHECK_INTERVAL', 2.0))  # seconds; other processes' saves show up within this
+    STREAM_CHECK_INTERVAL = float(os.getenv('STREAM_CHECK_INTERVAL', 1.0))  # seconds between data version checks while dashboards are connected
+
+    # Scan Engine Settings
+    SCAN_CONCURRENCY = int(os.getenv('SCAN_CONCURRENCY', 50))  # max lookups in flight
+    SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', 1))  # processes; >1 shards keywords across them
+    SCAN_LEASE_SECONDS = float(os.getenv('SCAN_LEASE_SECONDS', 60))  # claimed work returns to the queue if not renewed
+    SCAN_CLAIM_BATCH = int(os.getenv('SCAN_CLAIM_BATCH', 20))  # keywords claimed from a scan's work list at a time
+    NODE_ID = os.getenv('NODE_ID', '')  # names this monitor in leases; defaults to host:pid
+
+    # Email Delivery (alerts are queued in the database and sent from a background thread)
+    SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 30.0))  # seconds per SMTP command
+    SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', 60.0))  # seconds a logged-in session is kept for reuse
+    NOTIFY_DIGEST_DELAY = float(os.getenv('NOTIFY_DIGEST_DELAY', 10.0))  # seconds queued alerts are gathered into one email
+    NOTIFY_DIGEST_MAX = int(os.getenv('NOTIFY_DIGEST_MAX', 1000))  # domains per email
+    NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', 30.0))  # seconds between looks for retries and other processes' alerts
+    NOTIFY_BASE_BACKOFF = float(os.getenv('NOTIFY_BASE_BACKOFF', 30.0))  # seconds before the first retry; doubles per failure
+    NOTIFY_MAX_BACKOFF = float(os.getenv('NOTIFY_MAX_BACKOFF', 3600.0))  # seconds
+
+    # DNS Pre-filter Settings
+    DNS_RESOLVER = os.getenv('DNS_RESOLVER', 'async')  # 'async' or 'system'
+    DNS_UPSTREAM = os.getenv('DNS_UPSTREAM', '')  # defaults to the system nameserver
+    DNS_TIMEOUT = float(os.getenv('DNS_TIMEOUT', 2.0))  # seconds per attempt
+    DNS_RETRIES = int(os.getenv('DNS_RETRIES', 2))
+    DNS_MAX_IN_FLIGHT = int(os.getenv('DNS_MAX_IN_FLIGHT', 1000))  # outstanding UDP queries
+
+    # WHOIS Client Settings
+    WHOIS_TIMEOUT = float(os.getenv('WHOIS_TIMEOUT', 10.0))  # seconds
+    WHOIS_MAX_CONNECTIONS = int(os.getenv('WHOIS_MAX_CONNECTIONS', 8))  # per server
+    WHOIS_SERVER_TTL = int(os.getenv('WHOIS_SERVER_TTL', 30))  # days before re-asking IANA
+    WHOIS_ADDRESS_TTL = int(os.getenv('WHOIS_ADDRESS_TTL', 3600))  # seconds to reuse a resolved address
+
+    # Per-registry Rate Limiting (queries per second per WHOIS server)
+    WHOIS_RATE = float(os.getenv('WHOIS_RATE', 5.0))  # starting rate
+    WHOIS_MIN_RATE = float(os.getenv('WHOIS_MIN_RATE', 0.2))
+    WHOIS_MAX_RATE = float(os.getenv('WHOIS_MAX_RATE', 50.0))
+    WHOIS_RATE_STEP = float(os.getenv('WHOIS_RATE_STEP', 0.5))  # additive increase per second of success
+    WHOIS_LATENCY_TARGET = float(os.getenv('WHOIS_LATENCY_TARGET', 3.0))  # seconds; slower answers back off
+    LOOKUP_MAX_RETRIES = int(os.getenv('LOOKUP_MAX_RETRIES', 5))
+    LOOKUP_BASE_BACKOFF = float(os.getenv('LOOKUP_BASE_BACKOFF', 2.0))  # seconds
+    LOOKUP_MAX_BACKOFF = float(os.getenv('LOOKUP_MAX_BACKOFF', 300.0))  # seconds
+
+    # Verdict Cache Settings (seconds a verdict is trusted before re-checking)
+    CACHE_TTL_TAKEN = int(os.getenv('CACHE_TTL_TAKEN', 86400))
+    CACHE_TTL_AVAILABLE = int(os.getenv('CACHE_TTL_AVAILABLE', 1800))
+    CACHE_TTL_FAILED = int(os.getenv('CACHE_TTL_FAILED', 900))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 500000))  # in-memory LRU cap
+
+    # Expiry-aware Scheduling (seconds unless noted)
+    SCHEDULE_MAX_INTERVAL = int(os.getenv('SCHEDULE_MAX_INTERVAL', 30 * 86400))  # far from expiry
+    SCHEDULE_LEAD_DAYS = int(os.getenv('SCHEDULE_LEAD_DAYS', 30))  # days before expiry to check daily
+    SCHEDULE_NEAR_INTERVAL = int(os.getenv('SCHEDULE_NEAR_INTERVAL', 86400))
+    SCHEDULE_GRACE_INTERVAL = int(os.getenv('SCHEDULE_GRACE_INTERVAL', 3600))  # expired / redemption
+    SCHEDULE_DROP_INTERVAL = int(os.getenv('SCHEDULE_DROP_INTERVAL', 300))  # pendingDelete
+    SCHEDULE_DROP_WINDOW_DAYS = int(os.getenv('SCHEDULE_DROP_WINDOW_DAYS', 80))  # grace + redemption + delete
+    SCHEDULE_MIN_SLEEP = int(os.getenv('SCHEDULE_MIN_SLEEP', 30))
+
+    # Offline Zone Index
+    ZONE_INDEX_DIR = os.getenv('ZONE_INDEX_DIR', os.path.join(DATA_DIR, 'zones'))
+    ZONE_BUILD_CHUNK = int(os.getenv('ZONE_BUILD_CHUNK', 2000000))  # labels sorted in memory per run
+    ZONE_BLOOM_FP = float(os.getenv('ZONE_BLOOM_FP', 0.01))  # Bloom filter false-positive rate
+
+    # Candidate Generation
+    CANDIDATE_RULES = os.getenv('CANDIDATE_RULES', 'exact')  # comma-separated, see candidate_generator.RULES
+    CANDIDATE_PREFIXES = os.getenv('CANDIDATE_PREFIXES', 'get,my,the,try,go')
+    CANDIDATE_SUFFIXES = os.getenv('CANDIDATE_SUFFIXES', 'app,hq,hub,online,ly')
+    CANDIDATE_DEDUP_CAPACITY = int(os.getenv('CANDIDATE_DEDUP_CAPACITY', 1000000))  # labels remembered across keywords (~100 B each)
     
     # Domain Extensions to Check
     DOMAIN_EXTENSIONS = [
@@ -41,16 +117,18 @@ class Config:
     def get_email_config():
         """Get email configuration from DB or env"""
         # Avoid circular import
-        from database import Database
+        from storage import get_storage
         try:
-            db = Database()
+            # SQLite serves this from its settings cache; no query unless settings changed
+            settings = get_storage().get_settings()
             return {
-                'smtp_server': db.get_setting('smtp_server') or os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
-                'smtp_port': int(db.get_setting('smtp_port') or os.getenv('SMTP_PORT', 587)),
-                'smtp_username': db.get_setting('smtp_username') or os.getenv('SMTP_USERNAME', ''),
-                'smtp_password': db.get_setting('smtp_password') or os.getenv('SMTP_PASSWORD', ''),
-                'smtp_from': db.get_setting('smtp_from') or os.getenv('SMTP_FROM', ''),
-                'smtp_to': db.get_setting('smtp_to') or os.getenv('SMTP_TO', '')
+                'smtp_server': settings.get('smtp_server') or os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+                'smtp_port': int(settings.get('smtp_port') or os.getenv('SMTP_PORT', 587)),
+                'smtp_username': settings.get('smtp_username') or os.getenv('SMTP_USERNAME', ''),
+                'smtp_password': settings.get('smtp_password') or os.getenv('SMTP_PASSWORD', ''),
+                'smtp_from': settings.get('smtp_from') or os.getenv('SMTP_FROM', ''),
+                'smtp_to': settings.get('smtp_to') or os.getenv('SMTP_TO', ''),
+                'smtp_security': (settings.get('smtp_security') or os.getenv('SMTP_SECURITY', 'starttls')).lower()
             }
         except Exception:
             # Fallback if DB not ready
@@ -60,13 +138,15 @@ class Config:
                 'smtp_username': os.getenv('SMTP_USERNAME', ''),
                 'smtp_password': os.getenv('SMTP_PASSWORD', ''),
                 'smtp_from': os.getenv('SMTP_FROM', ''),
-                'smtp_to': os.getenv('SMTP_TO', '')
+                'smtp_to': os.getenv('SMTP_TO', ''),
+                'smtp_security': os.getenv('SMTP_SECURITY', 'starttls').lower()
             }
 
     @staticmethod
-    def is_email_configured():
-        """Check if email is properly configured"""
-        config = Config.get_email_config()
+    def is_email_configured(config=None):
+        """Check if email is properly configured (pass a get_email_config() result to reuse it)"""
+        if config is None:
+            config = Config.get_email_config()
         # Strict check: Must have username, password, TO address, AND server
         # Also ensure they are not just whitespace
         has_server = bool(config['smtp_server'] and str(config['smtp_server']).strip())
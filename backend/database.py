@@ -1,13 +1,25 @@
 import sqlite3
 import os
 import logging
+import threading
+import time
 from datetime import datetime
 from config import Config
+from settings_cache import settings_cache
+from storage import StorageBackend, normalize_filters, read_cursor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class Database:
+# One connection per thread per database file, reused by every Database
+# instance; schema setup runs once per file per process
+_local = threading.local()
+_initialized = set()
+_init_lock = threading.Lock()
+
+class Database(StorageBackend):
+    """SQLite storage engine (see storage.StorageBackend)"""
+
     def __init__(self):
         # Ensure data directory exists
         db_dir = os.path.dirname(Config.DATABASE_PATH)
@@ -15,63 +27,63 @@ class Database:
             os.makedirs(db_dir)
         
         self.db_path = Config.DATABASE_PATH
-        self.init_database()
+        with _init_lock:
+            if self.db_path not in _initialized:
+                self.init_database()
+                _initialized.add(self.db_path)
     
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """
+        Get this thread's database connection.
+        The connection is shared by all Database instances on the thread;
+        commit or roll back, but do not close it.
+        """
+        connections = getattr(_local, 'connections', None)
+        if connections is None:
+            connections = _local.connections = {}
+        conn = connections.get(self.db_path)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f'PRAGMA synchronous = {Config.DB_SYNCHRONOUS}')
+            conn.execute(f'PRAGMA cache_size = {-Config.DB_CACHE_KB}')
+            conn.execute(f'PRAGMA mmap_size = {Config.DB_MMAP_SIZE}')
+            conn.execute('PRAGMA temp_store = MEMORY')
+            connections[self.db_path] = conn
         return conn
     
+    def close_connection(self):
+        """Close this thread's connection (it is reopened on next use)"""
+        conn = getattr(_local, 'connections', {}).pop(self.db_path, None)
+        if conn is not None:
+            conn.close()
+    
     def init_database(self):
-        """Initialize database tables"""
+        """Bring the database schema up to date"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Keywords table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS keywords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword TEXT UNIQUE NOT NULL,
-                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                active INTEGER DEFAULT 1
-            )
-        ''')
-        
-        # Domains table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS domains (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword_id INTEGER,
-                domain TEXT UNIQUE NOT NULL,
-                available INTEGER DEFAULT 0,
-                checked_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notified INTEGER DEFAULT 0,
-                FOREIGN KEY (keyword_id) REFERENCES keywords(id)
-            )
-        ''')
-        
-        # Scan history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scan_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                scan_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                keywords_scanned INTEGER DEFAULT 0,
-                domains_found INTEGER DEFAULT 0,
-                status TEXT
-            )
-        ''')
-        
-        # Settings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        ''')
+        # WAL lets the dashboard read while the monitor writes; the mode is
+        # stored in the database file, so every later connection uses it
+        cursor.execute('PRAGMA journal_mode = WAL')
         
-        conn.commit()
-        conn.close()
+        current = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            # The write lock keeps a second process from running the same step
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                if cursor.execute('PRAGMA user_version').fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+                logger.info(f"Database migrated to schema version {version} ({migration.__name__})")
+            except Exception:
+                conn.rollback()
+                raise
     
     def add_keyword(self, keyword):
         """Add a keyword to monitor"""
@@ -81,22 +93,26 @@ class Database:
             cursor.execute('INSERT INTO keywords (keyword) VALUES (?)', (keyword.lower().strip(),))
             conn.commit()
             keyword_id = cursor.lastrowid
-            conn.close()
             return keyword_id
         except sqlite3.IntegrityError:
             # Keyword already exists
+            conn.rollback()
             cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword.lower().strip(),))
             result = cursor.fetchone()
-            conn.close()
             return result[0] if result else None
     
-    def add_keywords_bulk(self, keywords):
-        """Add multiple keywords at once"""
-        added = 0
-        for keyword in keywords:
-            if self.add_keyword(keyword):
-                added += 1
-        return added
+    def insert_keywords(self, keywords):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('INSERT OR IGNORE INTO keywords (keyword) VALUES (?)',
+                               ((keyword,) for keyword in keywords))
+            inserted = cursor.rowcount
+            conn.commit()
+            return inserted
+        except sqlite3.Error:
+            conn.rollback()
+            raise
     
     def get_all_keywords(self):
         """Get all active keywords"""
@@ -104,115 +120,336 @@ class Database:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM keywords WHERE active = 1')
         keywords = cursor.fetchall()
-        conn.close()
         return keywords
     
-    def add_domain(self, keyword_id, domain, available):
+    def add_domain(self, keyword_id, domain, available, next_check=None, expiration_date=None, registry_status=None):
         """
         Add or update a discovered domain.
+        next_check is when the stored verdict expires (see ExpiryScheduler);
+        expiration_date/registry_status come from WHOIS when it was queried.
         Returns status code:
         0: No change / irrelevant change
         1: New available domain
         2: Regained availability (Taken -> Available)
         3: Lost availability (Available -> Taken)
         """
+        try:
+            return super().add_domain(keyword_id, domain, available, next_check, expiration_date, registry_status)
+        except sqlite3.Error as e:
+            # Fallback for safety
+            logger.error(f"Database error in add_domain: {e}")
+            return 0
+    
+    def apply_scan_results(self, rows):
+        rows = [
+            (keyword_id, domain, None if available is None else int(bool(available)),
+             next_check, expiration_date, registry_status)
+            for keyword_id, domain, available, next_check, expiration_date, registry_status in rows
+        ]
+        if not rows:
+            return {}
+        
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        status_code = 0
-        
         try:
-            # Check if domain exists first
-            cursor.execute('SELECT id, available, notified FROM domains WHERE domain = ?', (domain,))
-            existing = cursor.fetchone()
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS scan_results (
+                    domain TEXT PRIMARY KEY,
+                    keyword_id INTEGER,
+                    available INTEGER,
+                    next_check TIMESTAMP,
+                    expiration_date TIMESTAMP,
+                    registry_status TEXT,
+                    changed INTEGER DEFAULT 0
+                )
+            ''')
+            # Transitions are read before the write; take the write lock first so
+            # another monitor node's commit cannot invalidate them (SQLITE_BUSY)
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('DELETE FROM temp.scan_results')
+            cursor.executemany('''
+                INSERT OR REPLACE INTO temp.scan_results
+                    (keyword_id, domain, available, next_check, expiration_date, registry_status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
             
-            if existing:
-                domain_id = existing['id']
-                was_available = existing['available']
-                was_notified = existing['notified']
-                
-                # Logic for status changes
-                if available == 1 and was_available == 0:
-                    # REGAINED: Taken -> Available
-                    # We MUST reset notified to 0 so the user gets an alert
-                    cursor.execute('''
-                        UPDATE domains 
-                        SET available = 1, checked_date = ?, notified = 0 
-                        WHERE id = ?
-                    ''', (datetime.now(), domain_id))
-                    status_code = 2 # Regained
-                    
-                elif available == 0 and was_available == 1:
-                    # LOST: Available -> Taken
-                    cursor.execute('''
-                        UPDATE domains 
-                        SET available = 0, checked_date = ? 
-                        WHERE id = ?
-                    ''', (datetime.now(), domain_id))
-                    status_code = 3 # Lost
-                    
-                else:
-                    # No significant status change (e.g. Taken->Taken or Available->Available)
-                    # Just update checked_date
-                    cursor.execute('''
-                        UPDATE domains SET checked_date = ? WHERE id = ?
-                    ''', (datetime.now(), domain_id))
-                    status_code = 0
-                    
-            else:
-                # NEW Domain
-                cursor.execute('''
-                    INSERT INTO domains (keyword_id, domain, available, checked_date, notified)
-                    VALUES (?, ?, ?, ?, 0)
-                ''', (keyword_id, domain, available, datetime.now()))
-                
-                if available:
-                    status_code = 1 # New Available
-                else:
-                    status_code = 0 # New Taken (not interesting usually)
+            # Transitions against the stored state, before it is overwritten
+            cursor.execute('''
+                SELECT s.domain,
+                       CASE
+                           WHEN d.id IS NULL THEN s.available            -- 1: new available, 0: new taken
+                           WHEN s.available = 1 AND d.available = 0 THEN 2  -- regained
+                           WHEN s.available = 0 AND d.available = 1 THEN 3  -- lost
+                           ELSE 0
+                       END AS status_code
+                FROM temp.scan_results s
+                LEFT JOIN domains d ON d.domain = s.domain
+                WHERE s.available IS NOT NULL
+            ''')
+            codes = {row['domain']: row['status_code'] for row in cursor.fetchall()}
             
-            conn.commit()
-            conn.close()
-            return status_code
+            # New domains and flips are the only checks kept in domain_events
+            cursor.execute('''
+                UPDATE temp.scan_results SET changed = 1
+                WHERE available IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM domains d
+                    WHERE d.domain = temp.scan_results.domain AND d.available = temp.scan_results.available
+                )
+            ''')
             
-        except sqlite3.Error as e:
-            # Fallback for safety
-            logger.error(f"Database error in add_domain: {e}")
-            if conn:
-                conn.close()
-            return 0
+            # Regained domains get notified = 0 so the user is alerted again;
+            # registry data is kept when only DNS answered this time
+            cursor.execute('''
+                INSERT INTO domains (keyword_id, domain, available, checked_date, notified, next_check,
+                                     expiration_date, registry_status)
+                SELECT keyword_id, domain, available, ?, 0, next_check, expiration_date, registry_status
+                FROM temp.scan_results
+                WHERE available IS NOT NULL
+                ON CONFLICT(domain) DO UPDATE SET
+                    notified = CASE WHEN excluded.available = 1 AND domains.available = 0
+                                    THEN 0 ELSE domains.notified END,
+                    available = excluded.available,
+                    checked_date = excluded.checked_date,
+                    next_check = excluded.next_check,
+                    expiration_date = COALESCE(excluded.expiration_date, domains.expiration_date),
+                    registry_status = COALESCE(excluded.registry_status, domains.registry_status)
+            ''', (datetime.now(),))
+            
+            # Failed checks: only reschedule domains we already know
+            cursor.execute('''
+                UPDATE domains
+                SET next_check = (SELECT s.next_check FROM temp.scan_results s WHERE s.domain = domains.domain)
+                WHERE domain IN (SELECT domain FROM temp.scan_results WHERE available IS NULL)
+            ''')
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO domain_events (domain_id, epoch, available)
+                SELECT d.id, ?, s.available
+                FROM temp.scan_results s
+                JOIN domains d ON d.domain = s.domain
+                WHERE s.changed = 1
+            ''', (int(time.time()),))
+            
+            cursor.execute('DELETE FROM temp.scan_results')
+            conn.commit()
+            return codes
+        except sqlite3.Error:
+            conn.rollback()
+            raise
     
-    def get_available_domains(self, limit=100):
-        """Get available domains"""
+    def get_cached_verdicts(self, domains):
+        if not domains:
+            return {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(domains))
+        cursor.execute(f'''
+            SELECT domain, available, next_check FROM domains
+            WHERE domain IN ({placeholders}) AND next_check IS NOT NULL
+        ''', list(domains))
+        verdicts = {row['domain']: (row['available'], row['next_check']) for row in cursor.fetchall()}
+        return verdicts
+    
+    def get_registry_records(self, domains):
+        if not domains:
+            return {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(domains))
+        cursor.execute(f'''
+            SELECT domain, expiration_date, registry_status FROM domains
+            WHERE domain IN ({placeholders}) AND registry_status IS NOT NULL
+        ''', list(domains))
+        return {row['domain']: (row['expiration_date'], row['registry_status'])
+                for row in cursor.fetchall()}
+    
+    def set_next_check(self, domain, next_check):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('UPDATE domains SET next_check = ? WHERE domain = ?', (next_check, domain))
+        conn.commit()
+    
+    def get_due_domains(self, cutoff, after_id=0, limit=1000):
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT d.*, k.keyword 
+            SELECT d.id, d.keyword_id, d.domain, k.keyword
             FROM domains d
             JOIN keywords k ON d.keyword_id = k.id
-            WHERE d.available = 1
-            ORDER BY d.checked_date DESC
+            WHERE d.next_check <= ? AND d.id > ? AND k.active = 1
+            ORDER BY d.id
             LIMIT ?
-        ''', (limit,))
+        ''', (cutoff, after_id, limit))
         domains = cursor.fetchall()
-        conn.close()
         return domains
     
-    def get_all_domains(self, limit=10000):
-        """Get all domains (both available and taken)"""
+    def claim_due_domains(self, cutoff, after_id=0, limit=1000, lease_seconds=60):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            domains = self.get_due_domains(cutoff, after_id, limit)
+            lease_until = datetime.fromtimestamp(time.time() + lease_seconds)
+            cursor.executemany('UPDATE domains SET next_check = ? WHERE id = ?',
+                               ((lease_until, row['id']) for row in domains))
+            conn.commit()
+            return domains
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    
+    def get_next_check_time(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(next_check) FROM domains')
+        result = cursor.fetchone()
+        return result[0]
+    
+    def get_domain_history(self, domain, since=None, until=None, limit=1000):
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
+            SELECT e.epoch, e.available
+            FROM domains d
+            JOIN domain_events e ON e.domain_id = d.id
+            WHERE d.domain = ? AND e.epoch >= ? AND e.epoch < ?
+            ORDER BY e.epoch DESC
+            LIMIT ?
+        ''', (domain, since or 0, until or 2 ** 62, limit))
+        return cursor.fetchall()
+    
+    def get_events(self, since, until=None, limit=1000):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT e.epoch, e.available, d.domain, k.keyword
+            FROM domain_events e
+            JOIN domains d ON d.id = e.domain_id
+            LEFT JOIN keywords k ON k.id = d.keyword_id
+            WHERE e.epoch >= ? AND e.epoch < ?
+            ORDER BY e.epoch
+            LIMIT ?
+        ''', (since, until or 2 ** 62, limit))
+        return cursor.fetchall()
+    
+    def get_events_after(self, after, limit=1000):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT e.epoch, e.available, e.domain_id, d.domain, k.keyword,
+                   (SELECT p.available FROM domain_events p
+                    WHERE p.domain_id = e.domain_id AND p.epoch < e.epoch
+                    ORDER BY p.epoch DESC LIMIT 1) AS previous
+            FROM domain_events e
+            JOIN domains d ON d.id = e.domain_id
+            LEFT JOIN keywords k ON k.id = d.keyword_id
+            WHERE (e.epoch, e.available, e.domain_id) > (?, ?, ?)
+            ORDER BY e.epoch, e.available, e.domain_id
+            LIMIT ?
+        ''', (*after, limit))
+        return cursor.fetchall()
+    
+    def compact_events(self, cutoff, batch_size=10000):
+        """
+        Also drops events of deleted domains. Works in domain id ranges so
+        the write lock is held briefly.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        bounds = cursor.execute('SELECT MIN(domain_id), MAX(domain_id) FROM domain_events').fetchone()
+        if bounds[0] is None:
+            return 0
+        
+        removed = 0
+        for start in range(bounds[0], bounds[1] + 1, batch_size):
+            end = start + batch_size
+            cursor.execute('''
+                DELETE FROM domain_events
+                WHERE domain_id >= ? AND domain_id < ? AND epoch < ?
+                  AND epoch < (SELECT MAX(e.epoch) FROM domain_events e
+                               WHERE e.domain_id = domain_events.domain_id AND e.epoch < ?)
+            ''', (start, end, cutoff, cutoff))
+            removed += cursor.rowcount
+            cursor.execute('''
+                DELETE FROM domain_events
+                WHERE domain_id >= ? AND domain_id < ?
+                  AND NOT EXISTS (SELECT 1 FROM domains d WHERE d.id = domain_events.domain_id)
+            ''', (start, end))
+            removed += cursor.rowcount
+            conn.commit()
+        return removed
+    
+    def get_available_domains(self, limit=100, cursor=None, tld=None, keyword=None):
+        """
+        Get available domains, most recently checked first.
+        Pass the page_cursor() of the last row as `cursor` for the next page.
+        """
+        where, params = _domain_filters(tld, keyword)
+        if cursor:
+            checked_date, domain_id = read_cursor('available', cursor)
+            where.append('(d.checked_date, d.id) < (?, ?)')
+            params += [checked_date, domain_id]
+        conn = self.get_connection()
+        domains = conn.execute(f'''
             SELECT d.*, k.keyword 
             FROM domains d
             JOIN keywords k ON d.keyword_id = k.id
+            WHERE d.available = 1 {''.join(' AND ' + clause for clause in where)}
+            ORDER BY d.checked_date DESC, d.id DESC
+            LIMIT ?
+        ''', params + [limit]).fetchall()
+        return domains
+    
+    def get_all_domains(self, limit=10000, cursor=None, tld=None, keyword=None, status=None):
+        """
+        Get all domains (both available and taken), by keyword then domain.
+        status narrows to 'available' or 'taken'; cursor works as in
+        get_available_domains.
+        """
+        where, params = _domain_filters(tld, keyword, status)
+        conn = self.get_connection()
+        # CROSS JOIN keeps keywords as the outer loop, walking both indexes
+        # in sort order; otherwise a status filter can plan a full sort
+        query = f'''
+            SELECT d.*, k.keyword 
+            FROM keywords k
+            CROSS JOIN domains d ON d.keyword_id = k.id
+            WHERE {{}} {''.join(' AND ' + clause for clause in where)}
             ORDER BY k.keyword, d.domain
             LIMIT ?
-        ''', (limit,))
-        domains = cursor.fetchall()
-        conn.close()
+        '''
+        if not cursor:
+            return conn.execute(query.format('1'), params + [limit]).fetchall()
+        
+        # Rest of the cursor's keyword, then the keywords after it; two
+        # index range scans instead of one that re-reads the whole keyword
+        last_keyword, last_domain = read_cursor('all', cursor)
+        domains = conn.execute(query.format('k.keyword = ? AND d.domain > ?'),
+                               [last_keyword, last_domain] + params + [limit]).fetchall()
+        if len(domains) < limit:
+            domains += conn.execute(query.format('k.keyword > ?'),
+                                    [last_keyword] + params + [limit - len(domains)]).fetchall()
         return domains
     
+    def iter_export_rows(self, tld=None, keyword=None, status=None, batch_size=5000):
+        """
+        Display values are formatted in SQL and rows fetched batch_size at a
+        time from one statement, so memory use does not grow with the table.
+        """
+        where, params = _domain_filters(tld, keyword, status)
+        # CROSS JOIN: see get_all_domains
+        cursor = self.get_connection().execute(f'''
+            SELECT d.domain, k.keyword,
+                   CASE WHEN d.available = 1 THEN 'Available' ELSE 'Taken' END AS status,
+                   strftime('%Y-%m-%d %H:%M:%S', d.checked_date) AS checked_date,
+                   CASE WHEN d.notified = 1 THEN 'Yes' ELSE 'No' END AS notified
+            FROM keywords k
+            CROSS JOIN domains d ON d.keyword_id = k.id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY k.keyword, d.domain
+        ''', params)
+        return _fetch_batches(cursor, batch_size)
+    
     def get_unnotified_domains(self):
         """Get available domains that haven't been notified yet"""
         conn = self.get_connection()
@@ -224,65 +461,576 @@ class Database:
             WHERE d.available = 1 AND d.notified = 0
         ''')
         domains = cursor.fetchall()
-        conn.close()
         return domains
     
-    def mark_domains_notified(self, domain_ids):
-        """Mark domains as notified"""
+    def queue_notifications(self, kind, domains):
         conn = self.get_connection()
         cursor = conn.cursor()
-        placeholders = ','.join('?' * len(domain_ids))
-        cursor.execute(f'UPDATE domains SET notified = 1 WHERE id IN ({placeholders})', domain_ids)
-        conn.commit()
-        conn.close()
+        try:
+            cursor.executemany('INSERT OR IGNORE INTO notifications (kind, domain, keyword) VALUES (?, ?, ?)',
+                               ((kind, domain, keyword) for domain, keyword in domains))
+            queued = max(cursor.rowcount, 0)
+            conn.commit()
+            return queued
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def get_due_notifications(self, now, limit=1000):
+        conn = self.get_connection()
+        return conn.execute('''
+            SELECT * FROM notifications
+            WHERE next_attempt <= ?
+            ORDER BY next_attempt, id
+            LIMIT ?
+        ''', (now, limit)).fetchall()
+
+    def complete_notifications(self, notification_ids):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(notification_ids), 500):
+                chunk = notification_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    UPDATE domains SET notified = 1
+                    WHERE domain IN (SELECT domain FROM notifications WHERE id IN ({placeholders}) AND kind = 'new')
+                ''', chunk)
+                cursor.execute(f'DELETE FROM notifications WHERE id IN ({placeholders})', chunk)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def defer_notifications(self, notification_ids, next_attempt, error):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                UPDATE notifications SET attempts = attempts + 1, next_attempt = ?, last_error = ?
+                WHERE id = ?
+            ''', ((next_attempt, error, notification_id) for notification_id in notification_ids))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
     
-    def add_scan_record(self, keywords_count, domains_found, status):
+    def add_scan_record(self, keywords_count, domains_found, status, cache_hits=0, cache_misses=0, elapsed_seconds=0,
+                        lookups=0):
         """Add a scan history record"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO scan_history (keywords_scanned, domains_found, status)
-            VALUES (?, ?, ?)
-        ''', (keywords_count, domains_found, status))
+            INSERT INTO scan_history (keywords_scanned, domains_found, status, cache_hits, cache_misses, lookups,
+                                      keywords_done, elapsed_seconds, finished_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (keywords_count, domains_found, status, cache_hits, cache_misses, lookups, keywords_count,
+              elapsed_seconds))
+        conn.commit()
+    
+    def get_scan_history(self, limit=10):
+        conn = self.get_connection()
+        return conn.execute('SELECT * FROM scan_history ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+
+    def start_scan(self, keyword_ids):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            running = cursor.execute(
+                "SELECT id FROM scan_history WHERE status IN ('Running', 'Partial') ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if running is not None:
+                conn.rollback()
+                return running['id']
+            cursor.execute('''
+                INSERT INTO scan_history (keywords_scanned, status, checkpoint_date)
+                VALUES (?, 'Running', CURRENT_TIMESTAMP)
+            ''', (len(keyword_ids),))
+            scan_id = cursor.lastrowid
+            cursor.executemany('INSERT OR IGNORE INTO scan_work (scan_id, keyword_id) VALUES (?, ?)',
+                               ((scan_id, keyword_id) for keyword_id in keyword_ids))
+            conn.commit()
+            return scan_id
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def join_scan(self, stale_after):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            scan = cursor.execute('''
+                SELECT id, status, checkpoint_date < datetime('now', ?) AS stale FROM scan_history
+                WHERE status IN ('Running', 'Partial')
+                ORDER BY id DESC LIMIT 1
+            ''', (f'-{int(stale_after)} seconds',)).fetchone()
+            if scan is None:
+                conn.rollback()
+                return None
+            if scan['status'] == 'Partial' or scan['stale']:
+                cursor.execute('''
+                    UPDATE scan_history SET status = 'Running', resumed = resumed + 1,
+                                            checkpoint_date = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (scan['id'],))
+            scan = cursor.execute('SELECT * FROM scan_history WHERE id = ?', (scan['id'],)).fetchone()
+            conn.commit()
+            return scan
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def get_scan(self, scan_id):
+        conn = self.get_connection()
+        return conn.execute('SELECT * FROM scan_history WHERE id = ?', (scan_id,)).fetchone()
+
+    def get_scan_work(self, scan_id):
+        conn = self.get_connection()
+        return dict(conn.execute('SELECT keyword_id, done FROM scan_work WHERE scan_id = ?', (scan_id,)).fetchall())
+
+    def claim_scan_work(self, scan_id, owner, limit, lease_seconds):
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            keyword_ids = [row[0] for row in cursor.execute('''
+                SELECT keyword_id FROM scan_work
+                WHERE scan_id = ? AND done = 0 AND lease_expires < ?
+                LIMIT ?
+            ''', (scan_id, now, limit)).fetchall()]
+            cursor.executemany('UPDATE scan_work SET owner = ?, lease_expires = ? WHERE scan_id = ? AND keyword_id = ?',
+                               ((owner, now + lease_seconds, scan_id, keyword_id) for keyword_id in keyword_ids))
+            conn.commit()
+            return keyword_ids
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def renew_scan_work(self, scan_id, owner, keyword_ids, lease_seconds):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                UPDATE scan_work SET lease_expires = ?
+                WHERE scan_id = ? AND keyword_id = ? AND owner = ? AND done = 0
+            ''', ((time.time() + lease_seconds, scan_id, keyword_id, owner) for keyword_id in keyword_ids))
+            held = max(cursor.rowcount, 0)
+            conn.commit()
+            return held
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def release_scan_work(self, scan_id, owner, keyword_ids):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                UPDATE scan_work SET owner = NULL, lease_expires = 0
+                WHERE scan_id = ? AND keyword_id = ? AND owner = ? AND done = 0
+            ''', ((scan_id, keyword_id, owner) for keyword_id in keyword_ids))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def checkpoint_scan(self, scan_id, keyword_ids, domains_found, cache_hits, cache_misses, lookups, elapsed_seconds,
+                        status='Running'):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('UPDATE scan_work SET done = 1 WHERE scan_id = ? AND keyword_id = ? AND done = 0',
+                               ((scan_id, keyword_id) for keyword_id in keyword_ids))
+            newly_done = max(cursor.rowcount, 0)
+            cursor.execute('''
+                UPDATE scan_history
+                SET keywords_done = keywords_done + ?, domains_found = domains_found + ?,
+                    cache_hits = cache_hits + ?, cache_misses = cache_misses + ?, lookups = lookups + ?,
+                    elapsed_seconds = elapsed_seconds + ?, status = ?, checkpoint_date = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (newly_done, domains_found, cache_hits, cache_misses, lookups, elapsed_seconds, status, scan_id))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def finish_scan(self, scan_id, status='Success'):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE scan_history
+                SET keywords_done = keywords_scanned, status = ?, checkpoint_date = CURRENT_TIMESTAMP,
+                    finished_date = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, scan_id))
+            cursor.execute('DELETE FROM scan_work WHERE scan_id = ?', (scan_id,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def acquire_lease(self, name, owner, lease_seconds):
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE leases.owner = excluded.owner OR leases.expires < ?
+            ''', (name, owner, now + lease_seconds, now))
+            acquired = cursor.rowcount == 1
+            conn.commit()
+            return acquired
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def release_lease(self, name, owner):
+        conn = self.get_connection()
+        conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
         conn.commit()
-        conn.close()
 
     def clear_all_data(self):
         """Clear all keywords and domains"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Disable foreign keys temporarily to avoid constraint issues if needed
-        # But here we probably want to just delete everything
-        cursor.execute('DELETE FROM domains')
-        cursor.execute('DELETE FROM keywords')
-        cursor.execute('DELETE FROM scan_history')
-        
-        # Reset auto-increment counters (optional but good for 'clean' state)
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="domains"')
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="keywords"')
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="scan_history"')
-        
-        conn.commit()
-        conn.close()
+        # One write transaction, so no other connection sees the tables half cleared
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('DELETE FROM domain_events')
+            cursor.execute('DELETE FROM domains')
+            cursor.execute('DELETE FROM keywords')
+            cursor.execute('DELETE FROM scan_history')
+            cursor.execute('DELETE FROM scan_work')
+            cursor.execute('DELETE FROM notifications')
+            # Leader and sender leases name scans and queued alerts that are gone now
+            cursor.execute('DELETE FROM leases')
+            # The stats triggers counted the deletes down; zero the row anyway
+            # so counts that drifted start over from the empty tables
+            cursor.execute('UPDATE stats SET keywords = 0, active_keywords = 0, domains = 0, available_domains = 0 '
+                           'WHERE id = 1')
+            
+            # Reset auto-increment counters (optional but good for 'clean' state)
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name="domains"')
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name="keywords"')
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name="scan_history"')
+            
+            # Tell other processes (the monitor's verdict cache) their copies are stale
+            cursor.execute('''
+                INSERT OR REPLACE INTO settings (key, value)
+                VALUES ('data_generation', COALESCE((SELECT value FROM settings WHERE key = 'data_generation'), 0) + 1)
+            ''')
+            
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        settings_cache(self.db_path).invalidate()
         return True
 
-    def get_setting(self, key, default=None):
-        """Get a setting value"""
+    def get_data_version(self):
+        """Changes when another connection (thread or process) commits; reads no tables"""
+        return self.get_connection().execute('PRAGMA data_version').fetchone()[0]
+    
+    def get_stats(self):
+        """Exact keyword and domain counts, from the trigger-maintained stats row"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        result = cursor.fetchone()
-        conn.close()
-        return result['value'] if result else default
+        return conn.execute(
+            'SELECT keywords, active_keywords, domains, available_domains FROM stats WHERE id = 1').fetchone()
+    
+    def get_setting(self, key, default=None):
+        """Get a setting value (from the process-wide settings cache)"""
+        return settings_cache(self.db_path).get(key, default)
+    
+    def get_settings(self):
+        """Get every setting as a dict (from the process-wide settings cache)"""
+        return dict(settings_cache(self.db_path).get_all())
 
-    def save_setting(self, key, value):
-        """Save a setting value"""
+    def save_settings(self, settings):
+        """Save several settings in one transaction"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.executemany('''
             INSERT OR REPLACE INTO settings (key, value)
             VALUES (?, ?)
-        ''', (key, str(value)))
+        ''', [(key, str(value)) for key, value in settings.items()])
         conn.commit()
-        conn.close()
+        settings_cache(self.db_path).invalidate()
+
+
+def _fetch_batches(cursor, batch_size):
+    """Yield a cursor's rows, fetching batch_size at a time"""
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        # Ends the read if the consumer stops early (client disconnected)
+        cursor.close()
+
+
+def _domain_filters(tld=None, keyword=None, status=None):
+    """WHERE clauses and parameters for the result listing filters"""
+    tld, keyword, status = normalize_filters(tld, keyword, status)
+    where, params = [], []
+    if tld:
+        where.append('d.domain LIKE ?')
+        params.append(f'%.{tld}')
+    if keyword:
+        where.append('k.keyword = ?')
+        params.append(keyword)
+    if status:
+        where.append('d.available = ?')
+        params.append(1 if status == 'available' else 0)
+    return where, params
+
+
+def _column_names(cursor, table):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [row['name'] for row in cursor.fetchall()]
+
+
+def _initial_schema(cursor):
+    """Schema as it stood before versioning, including columns added ad hoc"""
+    # Keywords table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS keywords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT UNIQUE NOT NULL,
+            added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            active INTEGER DEFAULT 1
+        )
+    ''')
+    
+    # Domains table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS domains (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword_id INTEGER,
+            domain TEXT UNIQUE NOT NULL,
+            available INTEGER DEFAULT 0,
+            checked_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notified INTEGER DEFAULT 0,
+            FOREIGN KEY (keyword_id) REFERENCES keywords(id)
+        )
+    ''')
+    
+    # Scan history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            keywords_scanned INTEGER DEFAULT 0,
+            domains_found INTEGER DEFAULT 0,
+            status TEXT
+        )
+    ''')
+    
+    # Settings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    
+    # Unversioned databases may already have some of these columns
+    for table, column, definition in [
+        ('domains', 'next_check', 'TIMESTAMP'),
+        ('scan_history', 'cache_hits', 'INTEGER DEFAULT 0'),
+        ('scan_history', 'cache_misses', 'INTEGER DEFAULT 0'),
+        ('domains', 'expiration_date', 'TIMESTAMP'),
+        ('domains', 'registry_status', 'TEXT'),
+    ]:
+        if column not in _column_names(cursor, table):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    # The expiry scheduler pops due domains in next_check order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_domains_next_check ON domains(next_check)')
+
+
+def _query_indexes(cursor):
+    """Indexes for the dashboard, notification and keyword access paths"""
+    # Keyword JOINs and the keyword/domain ordered listing
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_domains_keyword ON domains(keyword_id, domain)')
+    # Newest available domains first, without sorting the table
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_domains_available_checked
+        ON domains(checked_date) WHERE available = 1
+    ''')
+    # Pending notifications are a handful of rows among millions
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_domains_unnotified
+        ON domains(keyword_id) WHERE available = 1 AND notified = 0
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_active ON keywords(id) WHERE active = 1')
+
+
+def _domain_events(cursor):
+    """Availability transitions, clustered by domain then time"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS domain_events (
+            domain_id INTEGER NOT NULL,
+            epoch INTEGER NOT NULL,
+            available INTEGER NOT NULL,
+            PRIMARY KEY (domain_id, epoch)
+        ) WITHOUT ROWID
+    ''')
+    # Time-window queries across all domains
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_domain_events_epoch ON domain_events(epoch, available)')
+
+
+# Keep the stats row's counts; IS 1 counts NULL as 0, and updates only fire
+# when the counted flag flips
+_STATS_TRIGGERS = {
+    'stats_keyword_insert': '''AFTER INSERT ON keywords BEGIN
+        UPDATE stats SET keywords = keywords + 1,
+                         active_keywords = active_keywords + (NEW.active IS 1) WHERE id = 1;
+    END''',
+    'stats_keyword_delete': '''AFTER DELETE ON keywords BEGIN
+        UPDATE stats SET keywords = keywords - 1,
+                         active_keywords = active_keywords - (OLD.active IS 1) WHERE id = 1;
+    END''',
+    'stats_keyword_active': '''AFTER UPDATE OF active ON keywords
+    WHEN (OLD.active IS 1) != (NEW.active IS 1) BEGIN
+        UPDATE stats SET active_keywords = active_keywords + (NEW.active IS 1) - (OLD.active IS 1) WHERE id = 1;
+    END''',
+    'stats_domain_insert': '''AFTER INSERT ON domains BEGIN
+        UPDATE stats SET domains = domains + 1,
+                         available_domains = available_domains + (NEW.available IS 1) WHERE id = 1;
+    END''',
+    'stats_domain_delete': '''AFTER DELETE ON domains BEGIN
+        UPDATE stats SET domains = domains - 1,
+                         available_domains = available_domains - (OLD.available IS 1) WHERE id = 1;
+    END''',
+    'stats_domain_available': '''AFTER UPDATE OF available ON domains
+    WHEN (OLD.available IS 1) != (NEW.available IS 1) BEGIN
+        UPDATE stats SET available_domains = available_domains + (NEW.available IS 1) - (OLD.available IS 1) WHERE id = 1;
+    END''',
+}
+
+
+def _stats_counters(cursor):
+    """Row counts kept up to date by triggers, so status reads one row"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            keywords INTEGER NOT NULL,
+            active_keywords INTEGER NOT NULL,
+            domains INTEGER NOT NULL,
+            available_domains INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO stats (id, keywords, active_keywords, domains, available_domains)
+        SELECT 1,
+               (SELECT COUNT(*) FROM keywords),
+               (SELECT COUNT(*) FROM keywords WHERE active = 1),
+               (SELECT COUNT(*) FROM domains),
+               (SELECT COUNT(*) FROM domains WHERE available = 1)
+    ''')
+    for name, body in _STATS_TRIGGERS.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+
+def _settings_version(cursor):
+    """Counter bumped by every settings write, polled by the settings cache"""
+    cursor.execute('ALTER TABLE stats ADD COLUMN settings_version INTEGER NOT NULL DEFAULT 0')
+    # INSERT OR REPLACE fires the insert trigger; that is all save_setting does
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()} AFTER {event} ON settings BEGIN
+                UPDATE stats SET settings_version = settings_version + 1 WHERE id = 1;
+            END
+        ''')
+
+
+def _scan_checkpoints(cursor):
+    """Work lists and progress of full scans, so an interrupted scan resumes"""
+    for column, definition in [
+        ('keywords_done', 'INTEGER DEFAULT 0'),
+        ('resumed', 'INTEGER DEFAULT 0'),  # times picked up again after stopping
+        ('elapsed_seconds', 'REAL DEFAULT 0'),  # time spent scanning, over every run
+        ('checkpoint_date', 'TIMESTAMP'),  # last progress; a Running scan long past it has died
+        ('finished_date', 'TIMESTAMP'),
+    ]:
+        cursor.execute(f'ALTER TABLE scan_history ADD COLUMN {column} {definition}')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_work (
+            scan_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scan_id, keyword_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scan_history_unfinished
+        ON scan_history(id) WHERE status IN ('Running', 'Partial')
+    ''')
+
+
+def _work_leases(cursor):
+    """Leases on scan work and named leader leases, shared by monitor nodes"""
+    cursor.execute('ALTER TABLE scan_work ADD COLUMN owner TEXT')
+    # Epoch seconds; 0 means never claimed
+    cursor.execute('ALTER TABLE scan_work ADD COLUMN lease_expires REAL NOT NULL DEFAULT 0')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scan_work_claimable
+        ON scan_work(scan_id, lease_expires) WHERE done = 0
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        )
+    ''')
+
+
+def _notification_queue(cursor):
+    """Alerts waiting for the background sender, kept until their email is delivered"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,  -- 'new' (available or regained) or 'lost'
+            domain TEXT NOT NULL,
+            keyword TEXT,
+            queued_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0,  -- epoch seconds
+            last_error TEXT,
+            UNIQUE (kind, domain)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications(next_attempt)')
+
+
+def _scan_lookups(cursor):
+    """Domains each scan sent to DNS/WHOIS, apart from its verdict cache misses"""
+    cursor.execute('ALTER TABLE scan_history ADD COLUMN lookups INTEGER DEFAULT 0')
+    # Until now cache_misses held the lookups; scheduled re-checks skip the cache and have no misses
+    cursor.execute('UPDATE scan_history SET lookups = cache_misses')
+    cursor.execute("UPDATE scan_history SET cache_misses = 0 WHERE status = 'Scheduled'")
+
+
+# Schema migrations; PRAGMA user_version holds how many have been applied.
+# Append new steps, never edit or reorder released ones.
+MIGRATIONS = [
+    _initial_schema,
+    _query_indexes,
+    _domain_events,
+    _stats_counters,
+    _settings_version,
+    _scan_checkpoints,
+    _work_leases,
+    _notification_queue,
+    _scan_lookups,
+]
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import random
+import socket
+import struct
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Query types and response codes used by the pre-filter
+QTYPE_A = 1
+QTYPE_NS = 2
+QTYPE_SOA = 6
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+_HEADER = struct.Struct('!HHHHHH')
+_FLAG_RD = 0x0100
+_FLAG_TC = 0x0200
+
+
+class DnsError(Exception):
+    """Raised when a DNS query gets no usable answer"""
+
+
+def encode_name(name):
+    """Encode a domain name in DNS wire format"""
+    wire = b''
+    for label in name.rstrip('.').split('.'):
+        raw = label.encode('idna')
+        if not raw or len(raw) > 63:
+            raise DnsError(f"Invalid label in {name!r}")
+        wire += bytes([len(raw)]) + raw
+    return wire + b'\x00'
+
+
+def build_query(query_id, name, qtype):
+    """Build a recursive query packet for a single question"""
+    header = _HEADER.pack(query_id, _FLAG_RD, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('!HH', qtype, 1)
+
+
+def _read_name(data, offset):
+    """Read an uncompressed question name, returning (name, next offset)"""
+    labels = []
+    while True:
+        length = data[offset]
+        if length == 0:
+            return '.'.join(labels), offset + 1
+        if length & 0xC0:
+            raise DnsError("Compressed name in question section")
+        labels.append(data[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+        offset += 1 + length
+
+
+def parse_response(data):
+    """
+    Parse the parts of a response the resolver needs.
+    Returns dict with id, rcode, truncated, answer_count, name and qtype.
+    """
+    if len(data) < _HEADER.size:
+        raise DnsError("Short DNS response")
+    query_id, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data)
+    name, qtype = None, None
+    if qdcount:
+        name, offset = _read_name(data, _HEADER.size)
+        qtype = struct.unpack_from('!H', data, offset)[0]
+    return {
+        'id': query_id,
+        'rcode': flags & 0x000F,
+        'truncated': bool(flags & _FLAG_TC),
+        'answer_count': ancount,
+        'name': name,
+        'qtype': qtype,
+    }
+
+
+def default_upstream():
+    """First nameserver from /etc/resolv.conf, or a public resolver"""
+    try:
+        with open('/etc/resolv.conf', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1]
+    except OSError:
+        pass
+    return '8.8.8.8'
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    """Routes UDP replies to the pending query with the same ID"""
+
+    def __init__(self, pending):
+        self.pending = pending
+
+    def datagram_received(self, data, addr):
+        try:
+            response = parse_response(data)
+        except (DnsError, IndexError, struct.error):
+            return
+        future = self.pending.get(response['id'])
+        if future is not None and not future.done():
+            future.set_result((response, data))
+
+    def error_received(self, exc):
+        logger.debug(f"DNS socket error: {exc}")
+
+
+class AsyncDnsResolver:
+    """
+    Pipelined DNS client.
+    All queries share one UDP socket and replies are matched by query ID,
+    so thousands of lookups can be in flight at once. Truncated replies
+    are retried over TCP.
+    """
+
+    def __init__(self, upstream=None, port=53, timeout=None, retries=None, max_in_flight=None):
+        self.upstream = upstream or Config.DNS_UPSTREAM or default_upstream()
+        self.port = port
+        self.timeout = timeout or Config.DNS_TIMEOUT
+        self.retries = Config.DNS_RETRIES if retries is None else retries
+        self.max_in_flight = max_in_flight or Config.DNS_MAX_IN_FLIGHT
+        self._slots = None
+        self._pending = {}
+        self._transport = None
+        self._connecting = None
+        self._loop = None
+
+    async def _get_transport(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Each scan runs its own event loop, so rebind when it changes
+            self.close()
+            self._pending = {}
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._connecting = None
+            self._loop = loop
+        if self._transport is None or self._transport.is_closing():
+            if self._connecting is None or self._connecting.done():
+                self._connecting = loop.create_task(self._connect())
+            # Concurrent first queries all wait on the same socket
+            await asyncio.shield(self._connecting)
+        return self._transport
+
+    async def _connect(self):
+        family = socket.AF_INET6 if ':' in self.upstream else socket.AF_INET
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DnsProtocol(self._pending),
+            remote_addr=(self.upstream, self.port),
+            family=family
+        )
+
+    def _next_id(self):
+        while True:
+            query_id = random.getrandbits(16)
+            if query_id not in self._pending:
+                return query_id
+
+    async def _query_tcp(self, packet):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.upstream, self.port), self.timeout
+        )
+        try:
+            writer.write(struct.pack('!H', len(packet)) + packet)
+            await writer.drain()
+            length = struct.unpack('!H', await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            data = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+            return parse_response(data)
+        finally:
+            writer.close()
+
+    async def query(self, name, qtype=QTYPE_A):
+        """Send one query and return the parsed response"""
+        name = name.rstrip('.').lower()
+        transport = await self._get_transport()
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.retries + 1):
+            query_id = self._next_id()
+            packet = build_query(query_id, name, qtype)
+            future = loop.create_future()
+            # Cap outstanding packets so bursts do not overflow socket buffers
+            async with self._slots:
+                self._pending[query_id] = future
+                try:
+                    transport.sendto(packet)
+                    response, _ = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    continue
+                finally:
+                    self._pending.pop(query_id, None)
+
+            # Ignore replies that do not belong to this question
+            if response['name'] is not None and (response['name'].lower() != name or response['qtype'] != qtype):
+                continue
+            if response['truncated']:
+                response = await self._query_tcp(build_query(query_id, name, qtype))
+            return response
+
+        raise DnsError(f"DNS query for {name} timed out after {self.retries + 1} attempt(s)")
+
+    async def domain_exists(self, domain):
+        """
+        Returns: True if the name is delegated (taken), False on NXDOMAIN,
+        None if DNS could not decide
+        """
+        for qtype in (QTYPE_NS, QTYPE_SOA, QTYPE_A):
+            try:
+                response = await self.query(domain, qtype)
+            except (DnsError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                logger.debug(f"DNS {qtype} lookup failed for {domain}: {e}")
+                continue
+            if response['rcode'] == RCODE_NOERROR:
+                return True
+            if response['rcode'] == RCODE_NXDOMAIN:
+                return False
+            # SERVFAIL/REFUSED: try the next record type
+        return None
+
+    def close(self):
+        if self._transport is not None:
+            try:
+                self._transport.close()
+            except RuntimeError:
+                # The loop that owned the socket is already closed
+                pass
+            self._transport = None
+
+
+class SystemResolver:
+    """Resolver using the libc stub resolver (A records only)"""
+
+    def _resolves(self, domain):
+        try:
+            socket.gethostbyname(domain)
+            return True
+        except socket.gaierror:
+            return False
+
+    async def domain_exists(self, domain):
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self._resolves, domain):
+            return True
+        # No A record does not prove the name is unregistered
+        return None
+
+    def close(self):
+        pass
+
+
+def get_resolver():
+    """Create the resolver selected by Config.DNS_RESOLVER"""
+    if Config.DNS_RESOLVER == 'system':
+        return SystemResolver()
+    return AsyncDnsResolver()
@@ -1,7 +1,19 @@
 import whois
-import socket
+import asyncio
 import logging
 from config import Config
+from dns_resolver import get_resolver
+from zone_index import ZoneIndexSet
+from whois_client import WhoisClient, WhoisNoServer, WhoisRateLimited
+
+try:
+    from whois.exceptions import WhoisDomainNotFoundError, WhoisQuotaExceededError
+except ImportError:
+    # Older python-whois only has PywhoisError, raised for unregistered names
+    from whois.parser import PywhoisError as WhoisDomainNotFoundError
+
+    class WhoisQuotaExceededError(Exception):
+        pass
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,6 +21,9 @@ logger = logging.getLogger(__name__)
 class DomainChecker:
     def __init__(self):
         self.extensions = Config.DOMAIN_EXTENSIONS
+        self.resolver = get_resolver()
+        self.whois_client = WhoisClient()
+        self.zone_index = ZoneIndexSet()
     
     def generate_domain_variations(self, keyword):
         """Generate domain name variations from keyword"""
@@ -21,37 +36,117 @@ class DomainChecker:
         
         return domains
     
+    def zone_registered(self, domain):
+        """Return True if an offline zone index lists the domain"""
+        return bool(self.zone_index.is_registered(domain))
+    
+    def dns_resolves(self, domain):
+        """
+        Return True if DNS shows the domain is delegated: the NS/SOA/A check
+        of the scan engine, on an event loop and resolver of its own
+        """
+        async def lookup():
+            resolver = get_resolver()
+            try:
+                return await resolver.domain_exists(domain)
+            finally:
+                resolver.close()
+        
+        return bool(asyncio.run(lookup()))
+    
+    def whois_record(self, domain):
+        """
+        Look up a domain's registration record
+        Returns dict with registered, expiration_date and statuses
+        """
+        try:
+            return self.whois_client.lookup(domain)
+        except WhoisNoServer:
+            pass
+        
+        # No known registry server; fall back to python-whois discovery
+        try:
+            w = whois.whois(domain)
+        except WhoisDomainNotFoundError:
+            return {'registered': False, 'expiration_date': None, 'statuses': []}
+        except WhoisQuotaExceededError as e:
+            raise WhoisRateLimited(str(e))
+        
+        expiration_date = w.expiration_date
+        if isinstance(expiration_date, list):
+            expiration_date = min(expiration_date)
+        statuses = w.status or []
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        return {
+            # If whois returns data, domain is likely registered
+            'registered': bool(w.domain_name),
+            'expiration_date': expiration_date,
+            'statuses': [status.split()[0] for status in statuses if status]
+        }
+    
+    def whois_registered(self, domain):
+        """Return True if WHOIS reports the domain as registered"""
+        return self.whois_record(domain)['registered']
+    
+    def whois_available(self, domain):
+        """
+        WHOIS half of the availability check
+        Returns: True if available, False if taken, None if check failed
+        """
+        try:
+            if self.whois_registered(domain):
+                return False
+            return True
+        except Exception as whois_error:
+            # A failed or refused lookup says nothing about availability;
+            # reporting it as available produced false alerts
+            logger.warning(f"WHOIS check failed for {domain}: {whois_error}")
+            return None
+    
     def is_domain_available(self, domain):
         """
         Check if a domain is available
         Returns: True if available, False if taken, None if check failed
         """
         try:
+            # Method 0: Zone files we hold answer without any network call
+            if self.zone_registered(domain):
+                return False
+            
             # Method 1: Try DNS lookup first (faster)
-            try:
-                socket.gethostbyname(domain)
+            if self.dns_resolves(domain):
                 # If we get here, domain resolves (likely taken)
                 return False
-            except socket.gaierror:
-                # Domain doesn't resolve, might be available
-                pass
             
             # Method 2: Try WHOIS lookup
-            try:
-                w = whois.whois(domain)
-                # If whois returns data, domain is likely registered
-                if w.domain_name:
-                    return False
-                return True
-            except Exception as whois_error:
-                # WHOIS lookup failed, assume available
-                logger.warning(f"WHOIS check failed for {domain}: {whois_error}")
-                return True
+            return self.whois_available(domain)
                 
         except Exception as e:
             logger.error(f"Error checking domain {domain}: {e}")
             return None
     
+    async def dns_taken(self, domain):
+        """Return True if DNS shows the domain is delegated"""
+        return bool(await self.resolver.domain_exists(domain))
+    
+    async def check_domain(self, domain):
+        """
+        Async variant of is_domain_available used by the scan engine.
+        Any NS/SOA/A answer marks the domain taken without touching WHOIS;
+        only names DNS cannot place go on to the blocking WHOIS lookup.
+        """
+        try:
+            if self.zone_registered(domain) or await self.dns_taken(domain):
+                return False
+            
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.whois_available, domain)
+            
+        except Exception as e:
+            logger.error(f"Error checking domain {domain}: {e}")
+            return None
+    
     def check_keyword_domains(self, keyword):
         """
         Check all domain variations for a keyword
@@ -1,4 +1,6 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
@@ -8,104 +10,114 @@ from config import Config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SECURITY_MODES = ('starttls', 'ssl', 'none')
+
+
+def connect(config):
+    """Open an SMTP connection secured as config['smtp_security'] says, and log in"""
+    security = config.get('smtp_security', 'starttls')
+    if security not in SECURITY_MODES:
+        raise ValueError(f"smtp_security must be one of {', '.join(SECURITY_MODES)}, not '{security}'")
+    smtp = smtplib.SMTP_SSL if security == 'ssl' else smtplib.SMTP
+    server = smtp(config['smtp_server'], config['smtp_port'], timeout=Config.SMTP_TIMEOUT)
+    try:
+        if security == 'starttls':
+            server.starttls()
+        if config['smtp_username']:
+            server.login(config['smtp_username'], config['smtp_password'])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
 class EmailNotifier:
     def __init__(self):
-        # We fetch config on demand now
-        pass
+        # Config is fetched on demand; the logged-in session is kept for the next email
+        self._lock = threading.Lock()
+        self._server = None
+        self._session = None
+        self._last_used = 0.0
     
-    def send_domain_alert(self, domains):
+    def send_digest(self, new_domains, lost_domains, config=None):
         """
-        Send email alert for newly discovered domains
-        domains: list of domain dictionaries with 'domain' and 'keyword' keys
+        Send one email about newly available and lost domains (lists of
+        dicts with 'domain' and 'keyword' keys). Raises if it could not be
+        delivered, so the caller can retry.
         """
-        if not Config.is_email_configured():
-            logger.warning("Email not configured. Skipping notification.")
-            return False
-        
-        config = Config.get_email_config()
-        
-        if not domains:
-            logger.info("No domains to notify about.")
-            return True
-        
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f'🔔 Domain Alert: {len(domains)} New Domain(s) Found'
-            msg['From'] = config['smtp_from']
-            msg['To'] = config['smtp_to']
-            
-            # Create HTML content
-            html_content = self._create_html_email(domains)
-            
-            # Create plain text version
-            text_content = self._create_text_email(domains)
-            
-            # Attach both versions
-            part1 = MIMEText(text_content, 'plain')
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part1)
-            msg.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP(config['smtp_server'], config['smtp_port']) as server:
-                server.starttls()
-                server.login(config['smtp_username'], config['smtp_password'])
-                server.send_message(msg)
-            
-            logger.info(f"Email notification sent for {len(domains)} domain(s)")
-            return True
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email notification: {e}")
-            return False
+        config = config or Config.get_email_config()
+        self._send(self._create_message(new_domains, lost_domains, config), config)
+        logger.info(f"Email notification sent for {len(new_domains)} new and {len(lost_domains)} lost domain(s)")
+    
+    def close(self):
+        """Log out of the SMTP session, if one is open"""
+        with self._lock:
+            self._close()
 
-    def send_lost_domain_alert(self, domains):
-        """
-        Send email alert for lost domains (Available -> Taken)
-        """
-        if not Config.is_email_configured():
-            logger.warning("Email not configured. Skipping notification.")
-            return False
-        
-        config = Config.get_email_config()
+    def close_idle(self):
+        """Close the session if it has not been used for SMTP_IDLE_TIMEOUT seconds"""
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > Config.SMTP_IDLE_TIMEOUT:
+                self._close()
+
+    def _close(self):
+        server, self._server, self._session = self._server, None, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                # Already dropped by the server
+                server.close()
+
+    def _send(self, msg, config):
+        session = tuple(config.get(key) for key in
+                        ('smtp_server', 'smtp_port', 'smtp_security', 'smtp_username', 'smtp_password'))
+        with self._lock:
+            if self._server is not None and (self._session != session or
+                                             time.monotonic() - self._last_used > Config.SMTP_IDLE_TIMEOUT):
+                self._close()
+            reused = self._server is not None
+            try:
+                if not reused:
+                    self._server, self._session = connect(config), session
+                try:
+                    self._server.send_message(msg)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    if not reused:
+                        raise
+                    # The server dropped the kept session; log in again once
+                    self._close()
+                    self._server, self._session = connect(config), session
+                    self._server.send_message(msg)
+            except Exception:
+                # Don't reuse a session left in an unknown state
+                self._close()
+                raise
+            self._last_used = time.monotonic()
+
+    def _create_message(self, new_domains, lost_domains, config):
+        msg = MIMEMultipart('alternative')
+        if new_domains and lost_domains:
+            msg['Subject'] = (f'🔔 Domain Alert: {len(new_domains)} New Domain(s) Found, '
+                              f'{len(lost_domains)} Taken')
+        elif new_domains:
+            msg['Subject'] = f'🔔 Domain Alert: {len(new_domains)} New Domain(s) Found'
+        else:
+            msg['Subject'] = f'⚠️ Domain Status Alert: {len(lost_domains)} Domain(s) Taken'
+        msg['From'] = config['smtp_from']
+        msg['To'] = config['smtp_to']
         
-        if not domains:
-            return True
+        if new_domains:
+            html_content = self._create_html_email(new_domains, lost_domains)
+            text_content = self._create_text_email(new_domains, lost_domains)
+        else:
+            html_content = self._create_lost_html_email(lost_domains)
+            text_content = self._create_lost_text_email(lost_domains)
         
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f'⚠️ Domain Status Alert: {len(domains)} Domain(s) Taken'
-            msg['From'] = config['smtp_from']
-            msg['To'] = config['smtp_to']
-            
-            # Create HTML content
-            html_content = self._create_lost_html_email(domains)
-            
-            # Create plain text version
-            text_content = self._create_lost_text_email(domains)
-            
-            # Attach both versions
-            part1 = MIMEText(text_content, 'plain')
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part1)
-            msg.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP(config['smtp_server'], config['smtp_port']) as server:
-                server.starttls()
-                server.login(config['smtp_username'], config['smtp_password'])
-                server.send_message(msg)
-            
-            logger.info(f"LOST Domain notification sent for {len(domains)} domain(s)")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send LOST domain notification: {e}")
-            return False
+        # Attach both versions
+        msg.attach(MIMEText(text_content, 'plain'))
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
 
     def _create_lost_html_email(self, domains):
         """Create HTML email content for lost domains"""
@@ -171,8 +183,8 @@ class EmailNotifier:
         
         return text
     
-    def _create_html_email(self, domains):
-        """Create HTML email content"""
+    def _create_html_email(self, domains, lost_domains=()):
+        """Create HTML email content (with a section for lost domains, if any)"""
         html = f"""
         <html>
         <head>
@@ -188,6 +200,8 @@ class EmailNotifier:
                     border-radius: 4px;
                 }}
                 .domain-name {{ font-size: 18px; font-weight: bold; color: #2196F3; }}
+                .lost {{ background-color: #ffebee; border-left-color: #F44336; }}
+                .lost .domain-name {{ color: #D32F2F; }}
                 .keyword {{ color: #666; font-style: italic; }}
                 .footer {{ padding: 20px; text-align: center; color: #666; font-size: 12px; }}
             </style>
@@ -209,6 +223,18 @@ class EmailNotifier:
                 </div>
             """
         
+        if lost_domains:
+            html += f"""
+                <p>The following <strong>{len(lost_domains)}</strong> domain(s) have been taken:</p>
+            """
+            for domain in lost_domains:
+                html += f"""
+                <div class="domain-card lost">
+                    <div class="domain-name">{domain['domain']}</div>
+                    <div class="keyword">Based on keyword: {domain['keyword']}</div>
+                </div>
+            """
+        
         html += f"""
             </div>
             <div class="footer">
@@ -220,8 +246,8 @@ class EmailNotifier:
         """
         return html
     
-    def _create_text_email(self, domains):
-        """Create plain text email content"""
+    def _create_text_email(self, domains, lost_domains=()):
+        """Create plain text email content (with a section for lost domains, if any)"""
         text = f"Domain Monitor Alert\n"
         text += f"=" * 50 + "\n\n"
         text += f"New available domains detected: {len(domains)}\n\n"
@@ -230,6 +256,12 @@ class EmailNotifier:
             text += f"{i}. {domain['domain']}\n"
             text += f"   Keyword: {domain['keyword']}\n\n"
         
+        if lost_domains:
+            text += f"No longer available (Taken): {len(lost_domains)}\n\n"
+            for i, domain in enumerate(lost_domains, 1):
+                text += f"{i}. {domain['domain']}\n"
+                text += f"   Keyword: {domain['keyword']}\n\n"
+        
         text += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         text += "Domain Monitor System\n"
         
@@ -0,0 +1,47 @@
+import logging
+import threading
+import time
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EventCompactor:
+    """
+    Background thread that applies the domain_events retention policy.
+    Runs Database.compact_events every EVENT_COMPACT_INTERVAL seconds;
+    EVENT_RETENTION_DAYS = 0 keeps history forever.
+    """
+
+    def __init__(self, db, retention_days=None, interval=None):
+        self.db = db
+        self.retention_days = Config.EVENT_RETENTION_DAYS if retention_days is None else retention_days
+        self.interval = interval or Config.EVENT_COMPACT_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Compact now; returns the number of events removed"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = int(time.time()) - self.retention_days * 86400
+        started = time.time()
+        removed = self.db.compact_events(cutoff)
+        logger.info(f"Compacted domain history: removed {removed} event(s) in {time.time() - started:.1f}s")
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Domain history compaction failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='event-compactor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
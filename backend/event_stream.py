@@ -0,0 +1,187 @@
+"""
+Dashboard push channel.
+An EventStream fans events out to Server-Sent Events clients. While at
+least one client is connected, one thread asks the storage for its data
+version every STREAM_CHECK_INTERVAL seconds, which reads no tables. Only
+when it moved (the monitor or another request wrote) does it read the
+stats row, the domain transitions since the last look and the latest scan,
+and push what changed. Scan jobs of this process are pushed from memory.
+With no clients connected the thread stops.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Events held for a client that stops reading before it is resynced
+_CLIENT_BACKLOG = 1000
+
+# Transitions read per query
+_FEED_PAGE = 1000
+
+_SCAN_FIELDS = ('id', 'status', 'keywords_scanned', 'keywords_done', 'domains_found', 'scan_date', 'finished_date')
+
+
+def format_event(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def status_counts(stats):
+    """The /api/status counters from a get_stats() row"""
+    return {
+        'keywords_count': stats['active_keywords'],
+        'domains_found': stats['available_domains'],
+        'domains_checked': stats['domains'],
+    }
+
+
+def change_of(row):
+    """'new', 'regained', 'lost' or None (a new taken domain) for a transition"""
+    if row['previous'] is None:
+        return 'new' if row['available'] else None
+    if row['available'] and not row['previous']:
+        return 'regained'
+    if not row['available'] and row['previous']:
+        return 'lost'
+    return None
+
+
+class EventStream:
+    """Pushes status counters, domain changes and scan progress to subscribers"""
+
+    def __init__(self, db, jobs=None, interval=None):
+        self.db = db
+        # Callable returning this process's scan jobs (ScanManager.jobs)
+        self.jobs = jobs
+        self.interval = Config.STREAM_CHECK_INTERVAL if interval is None else interval
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._thread = None
+        self._version = None
+        self._stats = None
+        self._scan = None
+        self._job_states = {}
+        # Feed position: the last second read, and the domains already sent for it
+        self._epoch = 0
+        self._sent = set()
+
+    def subscribe(self):
+        """A queue of (event, data) for a new client, starting the watcher if needed"""
+        client = queue.Queue(_CLIENT_BACKLOG)
+        with self._lock:
+            self._clients.add(client)
+            if self._thread is None:
+                self._version = None
+                self._epoch, self._sent = int(time.time()), set()
+                self._thread = threading.Thread(target=self._watch, name='event-stream', daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def snapshot(self):
+        """Events that bring a new client up to date"""
+        events = [('status', status_counts(self.db.get_stats()))]
+        scans = self.db.get_scan_history(1)
+        if scans:
+            events.append(('scan', {field: scans[0][field] for field in _SCAN_FIELDS}))
+        for job in self.jobs() if self.jobs else []:
+            events.append(('job', job.as_dict()))
+        return events
+
+    def publish(self, event, data):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait((event, data))
+            except queue.Full:
+                # The client fell behind; drop its backlog and have it reload instead
+                self._drain(client)
+                client.put_nowait(('reset', {}))
+
+    @staticmethod
+    def _drain(client):
+        try:
+            while True:
+                client.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                if not self._clients:
+                    self._thread = None
+                    return
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Event stream check failed: {e}")
+            time.sleep(self.interval)
+
+    def check(self):
+        """Push whatever changed since the last check"""
+        version = self.db.get_data_version()
+        if version != self._version:
+            self._version = version
+            self._check_stats()
+            self._check_events()
+            self._check_scan()
+        self._check_jobs()
+
+    def _check_stats(self):
+        stats = dict(self.db.get_stats())
+        if stats == self._stats:
+            return
+        if self._stats is not None and stats['domains'] < self._stats['domains']:
+            # Domains were deleted (data cleared): shown rows are gone
+            self.publish('reset', {})
+        self._stats = stats
+        self.publish('status', status_counts(stats))
+
+    def _check_events(self):
+        # The last second is read again: another node may commit into it later
+        after = (self._epoch, -1, -1)
+        while True:
+            rows = self.db.get_events_after(after, _FEED_PAGE)
+            for row in rows:
+                if row['epoch'] == self._epoch and row['domain_id'] in self._sent:
+                    continue
+                if row['epoch'] > self._epoch:
+                    self._epoch, self._sent = row['epoch'], set()
+                self._sent.add(row['domain_id'])
+                change = change_of(row)
+                if change:
+                    self.publish('domain', {'domain': row['domain'], 'keyword': row['keyword'],
+                                            'change': change, 'epoch': row['epoch']})
+            if len(rows) < _FEED_PAGE:
+                return
+            last = rows[-1]
+            after = (last['epoch'], last['available'], last['domain_id'])
+
+    def _check_scan(self):
+        scans = self.db.get_scan_history(1)
+        scan = {field: scans[0][field] for field in _SCAN_FIELDS} if scans else None
+        if scan != self._scan:
+            self._scan = scan
+            if scan:
+                self.publish('scan', scan)
+
+    def _check_jobs(self):
+        if self.jobs is None:
+            return
+        states = {}
+        for job in self.jobs():
+            states[job.id] = (job.status, job.checked)
+            if self._job_states.get(job.id) != states[job.id]:
+                self.publish('job', job.as_dict())
+        self._job_states = states
@@ -0,0 +1,115 @@
+import calendar
+import logging
+import time
+from datetime import datetime
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# EPP statuses of a domain on its way to being deleted
+REDEMPTION_STATUSES = {'redemptionperiod', 'pendingrestore', 'autorenewperiod'}
+PENDING_DELETE_STATUSES = {'pendingdelete'}
+
+
+def _utc_epoch(value):
+    """Epoch seconds for a (naive UTC or aware) datetime"""
+    return calendar.timegm(value.utctimetuple())
+
+
+def registry_due(record, now):
+    """
+    Whether a domain the zone index or DNS shows as taken needs a WHOIS
+    lookup before it is scheduled: its registry data was never read, it is
+    in a drop status, or its expiry is within SCHEDULE_LEAD_DAYS.
+    record is the stored registry data in parsed WHOIS form, or None.
+    """
+    if not record:
+        return True
+    statuses = {status.lower() for status in record.get('statuses') or []}
+    if statuses & (PENDING_DELETE_STATUSES | REDEMPTION_STATUSES):
+        return True
+    expiration_date = record.get('expiration_date')
+    if not isinstance(expiration_date, datetime):
+        # The registry publishes no expiry; another lookup would not find one
+        return False
+    return _utc_epoch(expiration_date) - now <= Config.SCHEDULE_LEAD_DAYS * DAY
+
+
+class ExpiryScheduler:
+    """
+    Decides when each domain is checked next.
+    Taken domains far from expiry are checked rarely; checks tighten as
+    the expiry date approaches and become frequent through the grace,
+    redemption and pending-delete windows when a name can drop.
+    The domains table (indexed on next_check) is the priority queue.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def next_check(self, available, record=None, now=None):
+        """Return the datetime a verdict recorded now should be refreshed"""
+        now = now or time.time()
+        return datetime.fromtimestamp(now + self.interval_for(available, record, now))
+
+    def interval_for(self, available, record, now):
+        """Seconds until the next check"""
+        if available is None:
+            return Config.CACHE_TTL_FAILED
+        if available:
+            # Available names can be registered at any moment
+            return Config.CACHE_TTL_AVAILABLE
+        if not record:
+            # Taken according to DNS; no registry data to plan with
+            return Config.CACHE_TTL_TAKEN
+
+        statuses = {status.lower() for status in record.get('statuses') or []}
+        if statuses & PENDING_DELETE_STATUSES:
+            return Config.SCHEDULE_DROP_INTERVAL
+        if statuses & REDEMPTION_STATUSES:
+            return Config.SCHEDULE_GRACE_INTERVAL
+
+        expiration_date = record.get('expiration_date')
+        if not isinstance(expiration_date, datetime):
+            return Config.CACHE_TTL_TAKEN
+
+        until_expiry = _utc_epoch(expiration_date) - now
+        lead = Config.SCHEDULE_LEAD_DAYS * DAY
+        if until_expiry > lead:
+            # Sleep until the lead window opens, but re-read the record
+            # now and then in case the registration changes hands
+            return min(until_expiry - lead, Config.SCHEDULE_MAX_INTERVAL)
+        if until_expiry > 0:
+            return Config.SCHEDULE_NEAR_INTERVAL
+        if -until_expiry < Config.SCHEDULE_DROP_WINDOW_DAYS * DAY:
+            # Past expiry: auto-renew grace, redemption and pending delete
+            return Config.SCHEDULE_GRACE_INTERVAL
+        # Long expired but still registered; the record is probably stale
+        return Config.CACHE_TTL_TAKEN
+
+    def next_wakeup(self, latest):
+        """Epoch time of the earliest due domain, no later than `latest`"""
+        next_check = self.db.get_next_check_time()
+        if next_check is None:
+            return latest
+        due = datetime.fromisoformat(str(next_check)).timestamp()
+        return min(latest, max(due, time.time() + Config.SCHEDULE_MIN_SLEEP))
+
+    def due_candidates(self, now=None, batch_size=1000):
+        """
+        Yield (keyword_id, keyword, domain) for every domain that is due.
+        Each page is claimed, so monitor nodes sharing the database split them.
+        """
+        cutoff = datetime.fromtimestamp(now or time.time())
+        last_id = 0
+        while True:
+            # Page by id so rows re-scheduled mid-scan are not picked up twice
+            rows = self.db.claim_due_domains(cutoff, last_id, batch_size, Config.SCAN_LEASE_SECONDS)
+            if not rows:
+                return
+            for row in rows:
+                yield row['keyword_id'], row['keyword'], row['domain']
+            last_id = rows[-1]['id']
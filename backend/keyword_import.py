@@ -0,0 +1,107 @@
+"""
+Streaming keyword import.
+Keywords are parsed, normalized and deduplicated a chunk at a time and each
+chunk is inserted in one transaction, so memory use does not depend on the
+size of the upload.
+"""
+import csv
+import io
+import logging
+import time
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest keyword that still fits in a DNS label once spaces are removed
+MAX_KEYWORD_LENGTH = 63
+
+
+def iter_csv_keywords(binary_stream, encoding='utf-8-sig'):
+    """
+    Yield the first column of each CSV row from a binary stream, decoding
+    incrementally. Blank rows and '#' comment lines are skipped.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, errors='replace', newline='')
+    try:
+        for row in csv.reader(text):
+            if not row:
+                continue
+            keyword = row[0].strip()
+            if keyword and not keyword.startswith('#'):
+                yield keyword
+    finally:
+        # Leave the underlying upload open for its owner
+        text.detach()
+
+
+def normalize_keyword(keyword):
+    """Return the stored form of a keyword, or None if it cannot be monitored"""
+    if not isinstance(keyword, str):
+        return None
+    keyword = keyword.lower().strip()
+    compact = keyword.replace(' ', '')
+    if not compact or len(compact) > MAX_KEYWORD_LENGTH:
+        return None
+    # Spaces are dropped from the checked label; '.' and '_' would end up in it
+    if not all(ch.isalnum() or ch in ' -' for ch in keyword):
+        return None
+    return keyword
+
+
+class ImportResult:
+    """Counts for one import; rows = inserted + duplicates + invalid"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+        }
+
+
+def import_keywords(db, keywords, chunk_size=None, progress=None):
+    """
+    Import an iterable of raw keywords.
+    progress(result) is called after every chunk. Returns an ImportResult.
+    """
+    chunk_size = chunk_size or Config.KEYWORD_IMPORT_CHUNK
+    result = ImportResult()
+    started = time.time()
+    chunk = {}
+
+    def flush():
+        inserted = db.insert_keywords(list(chunk))
+        result.inserted += inserted
+        # Rows deduplicated within the chunk were counted already
+        result.duplicates += len(chunk) - inserted
+        chunk.clear()
+        logger.info(f"Keyword import: {result.rows} row(s) read, {result.inserted} inserted, "
+                    f"{result.duplicates} duplicate(s), {result.invalid} invalid "
+                    f"({time.time() - started:.1f}s)")
+        if progress:
+            progress(result)
+
+    for raw in keywords:
+        result.rows += 1
+        keyword = normalize_keyword(raw)
+        if keyword is None:
+            result.invalid += 1
+            continue
+        if keyword in chunk:
+            result.duplicates += 1
+            continue
+        chunk[keyword] = None
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+    return result
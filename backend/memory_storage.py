@@ -0,0 +1,593 @@
+"""
+In-memory storage engine.
+Implements StorageBackend with plain Python structures and no file I/O, for
+benchmarks, one-shot scans and tests. Domains are slotted records in a list
+indexed by id, with a sorted (keyword, domain) list for the ordered listing.
+Data lives only as long as the process and other processes (the dashboard
+vs. the monitor) cannot see it.
+"""
+import bisect
+import functools
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from storage import StorageBackend, normalize_filters, page_cursor, read_cursor
+
+_DOMAIN_COLUMNS = ('id', 'keyword_id', 'domain', 'available', 'checked_date', 'notified',
+                   'next_check', 'expiration_date', 'registry_status')
+
+
+def _timestamp(value):
+    """Stored form of a datetime: str(), as sqlite3 stores it, so it sorts by time"""
+    return None if value is None else str(value)
+
+
+def _utc_now():
+    # Same format as SQLite's CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _writes(method):
+    """Mark a method that changes data the dashboard shows (see get_data_version)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._version += 1
+    return wrapper
+
+
+class _Domain:
+    __slots__ = _DOMAIN_COLUMNS
+
+    def __init__(self, domain_id, keyword_id, domain):
+        self.id = domain_id
+        self.keyword_id = keyword_id
+        self.domain = domain
+        self.available = 0
+        self.checked_date = None
+        self.notified = 0
+        self.next_check = None
+        self.expiration_date = None
+        self.registry_status = None
+
+
+class MemoryStorage(StorageBackend):
+    """Storage engine that keeps everything in this process's memory"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._settings = {}
+        self._version = 0
+        self._last_notification_id = 0
+        self._reset()
+
+    def _reset(self):
+        self._keywords = []     # id - 1 -> keyword row
+        self._keyword_ids = {}  # keyword -> id
+        self._domains = []      # id - 1 -> _Domain
+        self._domain_ids = {}   # domain -> id
+        self._ordered = []      # sorted (keyword, domain), for get_all_domains
+        self._events = {}       # domain id -> {epoch: available}
+        self._scans = []
+        self._scan_work = {}    # scan id -> {keyword id: done}
+        self._leases = {}       # name -> (owner, expires epoch)
+        self._notifications = {}  # id -> queued alert row
+        self._queued = {}       # (kind, domain) -> notification id
+        self._available = 0
+
+    # Keywords
+
+    @_writes
+    def add_keyword(self, keyword):
+        keyword = keyword.lower().strip()
+        with self._lock:
+            if keyword not in self._keyword_ids:
+                self._insert_keyword(keyword)
+            return self._keyword_ids[keyword]
+
+    @_writes
+    def insert_keywords(self, keywords):
+        with self._lock:
+            before = len(self._keywords)
+            for keyword in keywords:
+                if keyword not in self._keyword_ids:
+                    self._insert_keyword(keyword)
+            return len(self._keywords) - before
+
+    def _insert_keyword(self, keyword):
+        keyword_id = len(self._keywords) + 1
+        self._keywords.append({'id': keyword_id, 'keyword': keyword, 'added_date': _utc_now(), 'active': 1})
+        self._keyword_ids[keyword] = keyword_id
+
+    def _keyword_row(self, keyword_id):
+        if keyword_id and 0 < keyword_id <= len(self._keywords):
+            return self._keywords[keyword_id - 1]
+        return None
+
+    def get_all_keywords(self):
+        with self._lock:
+            return [dict(row) for row in self._keywords if row['active'] == 1]
+
+    # Domain state
+
+    def _row(self, record, keyword):
+        row = {column: getattr(record, column) for column in _DOMAIN_COLUMNS}
+        row['keyword'] = keyword
+        return row
+
+    @_writes
+    def apply_scan_results(self, rows):
+        # As with the SQLite staging table, the last row for a domain wins
+        latest = {}
+        for keyword_id, domain, available, next_check, expiration_date, registry_status in rows:
+            latest[domain] = (keyword_id, None if available is None else int(bool(available)),
+                              next_check, expiration_date, registry_status)
+
+        codes = {}
+        checked_date = _timestamp(datetime.now())
+        epoch = int(time.time())
+        with self._lock:
+            for domain, (keyword_id, available, next_check, expiration_date, registry_status) in latest.items():
+                domain_id = self._domain_ids.get(domain)
+                record = self._domains[domain_id - 1] if domain_id else None
+                if available is None:
+                    # Failed checks: only reschedule domains we already know
+                    if record is not None:
+                        record.next_check = _timestamp(next_check)
+                    continue
+
+                if record is None:
+                    record = self._insert_domain(keyword_id, domain)
+                    codes[domain] = available
+                    changed = True
+                else:
+                    if available == 1 and record.available == 0:
+                        codes[domain] = 2
+                        # Alert the user again
+                        record.notified = 0
+                    elif available == 0 and record.available == 1:
+                        codes[domain] = 3
+                    else:
+                        codes[domain] = 0
+                    changed = record.available != available
+
+                self._available += (available == 1) - (record.available == 1)
+                record.available = available
+                record.checked_date = checked_date
+                record.next_check = _timestamp(next_check)
+                # Registry data is kept when only DNS answered this time
+                if expiration_date is not None:
+                    record.expiration_date = _timestamp(expiration_date)
+                if registry_status is not None:
+                    record.registry_status = registry_status
+                if changed:
+                    self._events.setdefault(record.id, {})[epoch] = available
+        return codes
+
+    def _insert_domain(self, keyword_id, domain):
+        record = _Domain(len(self._domains) + 1, keyword_id, domain)
+        self._domains.append(record)
+        self._domain_ids[domain] = record.id
+        keyword = self._keyword_row(keyword_id)
+        if keyword is not None:
+            bisect.insort(self._ordered, (keyword['keyword'], domain))
+        return record
+
+    def get_cached_verdicts(self, domains):
+        verdicts = {}
+        with self._lock:
+            for domain in domains:
+                domain_id = self._domain_ids.get(domain)
+                if domain_id:
+                    record = self._domains[domain_id - 1]
+                    if record.next_check is not None:
+                        verdicts[domain] = (record.available, record.next_check)
+        return verdicts
+
+    def get_registry_records(self, domains):
+        records = {}
+        with self._lock:
+            for domain in domains:
+                domain_id = self._domain_ids.get(domain)
+                if domain_id:
+                    record = self._domains[domain_id - 1]
+                    if record.registry_status is not None:
+                        records[domain] = (record.expiration_date, record.registry_status)
+        return records
+
+    def set_next_check(self, domain, next_check):
+        with self._lock:
+            domain_id = self._domain_ids.get(domain)
+            if domain_id:
+                self._domains[domain_id - 1].next_check = _timestamp(next_check)
+
+    def get_due_domains(self, cutoff, after_id=0, limit=1000):
+        cutoff = _timestamp(cutoff)
+        rows = []
+        with self._lock:
+            # Ids are list positions + 1, so the scan starts right after after_id
+            for record in self._domains[after_id:]:
+                if record.next_check is None or record.next_check > cutoff:
+                    continue
+                keyword = self._keyword_row(record.keyword_id)
+                if keyword is None or keyword['active'] != 1:
+                    continue
+                rows.append({'id': record.id, 'keyword_id': record.keyword_id,
+                             'domain': record.domain, 'keyword': keyword['keyword']})
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def claim_due_domains(self, cutoff, after_id=0, limit=1000, lease_seconds=60):
+        with self._lock:
+            rows = self.get_due_domains(cutoff, after_id, limit)
+            lease_until = _timestamp(datetime.fromtimestamp(time.time() + lease_seconds))
+            for row in rows:
+                self._domains[row['id'] - 1].next_check = lease_until
+        return rows
+
+    def get_next_check_time(self):
+        with self._lock:
+            return min((record.next_check for record in self._domains if record.next_check is not None),
+                       default=None)
+
+    @staticmethod
+    def _matches(record, keyword_text, tld, keyword, status):
+        if tld and not record.domain.endswith('.' + tld):
+            return False
+        if keyword and keyword_text != keyword:
+            return False
+        if status and record.available != (1 if status == 'available' else 0):
+            return False
+        return True
+
+    def get_available_domains(self, limit=100, cursor=None, tld=None, keyword=None):
+        tld, keyword, _ = normalize_filters(tld, keyword)
+        after = tuple(read_cursor('available', cursor)) if cursor else None
+        with self._lock:
+            matches = []
+            for record in self._domains:
+                if record.available != 1:
+                    continue
+                keyword_row = self._keyword_row(record.keyword_id)
+                if keyword_row is None or not self._matches(record, keyword_row['keyword'], tld, keyword, None):
+                    continue
+                if after and not (record.checked_date, record.id) < after:
+                    continue
+                matches.append((record, keyword_row['keyword']))
+            newest = heapq.nlargest(limit, matches, key=lambda match: (match[0].checked_date, match[0].id))
+            return [self._row(record, keyword_text) for record, keyword_text in newest]
+
+    def get_all_domains(self, limit=10000, cursor=None, tld=None, keyword=None, status=None):
+        tld, keyword, status = normalize_filters(tld, keyword, status)
+        with self._lock:
+            start = bisect.bisect_left(self._ordered, (keyword,)) if keyword else 0
+            if cursor:
+                start = max(start, bisect.bisect_right(self._ordered, tuple(read_cursor('all', cursor))))
+            rows = []
+            for index in range(start, len(self._ordered)):
+                keyword_text, domain = self._ordered[index]
+                if keyword and keyword_text != keyword:
+                    break
+                record = self._domains[self._domain_ids[domain] - 1]
+                if self._matches(record, keyword_text, tld, None, status):
+                    rows.append(self._row(record, keyword_text))
+                    if len(rows) >= limit:
+                        break
+            return rows
+
+    def iter_export_rows(self, tld=None, keyword=None, status=None, batch_size=5000):
+        return self._export_rows(*normalize_filters(tld, keyword, status), batch_size)
+
+    def _export_rows(self, tld, keyword, status, batch_size):
+        # Paged, so the lock is not held while the consumer works
+        cursor = None
+        while True:
+            rows = self.get_all_domains(batch_size, cursor, tld, keyword, status)
+            for row in rows:
+                yield {
+                    'domain': row['domain'],
+                    'keyword': row['keyword'],
+                    'status': 'Available' if row['available'] == 1 else 'Taken',
+                    'checked_date': row['checked_date'][:19] if row['checked_date'] else None,
+                    'notified': 'Yes' if row['notified'] == 1 else 'No'
+                }
+            if len(rows) < batch_size:
+                return
+            cursor = page_cursor('all', rows[-1])
+
+    def get_unnotified_domains(self):
+        with self._lock:
+            rows = []
+            for record in self._domains:
+                if record.available == 1 and record.notified == 0:
+                    keyword = self._keyword_row(record.keyword_id)
+                    if keyword is not None:
+                        rows.append(self._row(record, keyword['keyword']))
+            return rows
+
+    # Notification queue
+
+    @_writes
+    def queue_notifications(self, kind, domains):
+        queued = 0
+        with self._lock:
+            for domain, keyword in domains:
+                if (kind, domain) in self._queued:
+                    continue
+                self._last_notification_id += 1
+                notification_id = self._last_notification_id
+                self._notifications[notification_id] = {
+                    'id': notification_id, 'kind': kind, 'domain': domain, 'keyword': keyword,
+                    'queued_date': _utc_now(), 'attempts': 0, 'next_attempt': 0, 'last_error': None,
+                }
+                self._queued[(kind, domain)] = notification_id
+                queued += 1
+        return queued
+
+    def get_due_notifications(self, now, limit=1000):
+        with self._lock:
+            due = [row for row in self._notifications.values() if row['next_attempt'] <= now]
+            return [dict(row) for row in heapq.nsmallest(limit, due, key=lambda row: (row['next_attempt'], row['id']))]
+
+    @_writes
+    def complete_notifications(self, notification_ids):
+        with self._lock:
+            for notification_id in notification_ids:
+                row = self._notifications.pop(notification_id, None)
+                if row is None:
+                    continue
+                del self._queued[(row['kind'], row['domain'])]
+                domain_id = self._domain_ids.get(row['domain'])
+                if row['kind'] == 'new' and domain_id is not None:
+                    self._domains[domain_id - 1].notified = 1
+
+    @_writes
+    def defer_notifications(self, notification_ids, next_attempt, error):
+        with self._lock:
+            for notification_id in notification_ids:
+                row = self._notifications.get(notification_id)
+                if row is not None:
+                    row.update(attempts=row['attempts'] + 1, next_attempt=next_attempt, last_error=error)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'keywords': len(self._keywords),
+                'active_keywords': sum(1 for row in self._keywords if row['active'] == 1),
+                'domains': len(self._domains),
+                'available_domains': self._available,
+            }
+
+    @_writes
+    def clear_all_data(self):
+        with self._lock:
+            self._reset()
+            # Tell the verdict cache its copies are stale, as Database does
+            self._settings['data_generation'] = str(int(self._settings.get('data_generation', 0)) + 1)
+        return True
+
+    def get_data_version(self):
+        # Every write counts: there are no other processes to tell apart
+        return self._version
+
+    # Domain history
+
+    def get_domain_history(self, domain, since=None, until=None, limit=1000):
+        since, until = since or 0, until or 2 ** 62
+        with self._lock:
+            events = self._events.get(self._domain_ids.get(domain), {})
+            epochs = sorted((epoch for epoch in events if since <= epoch < until), reverse=True)[:limit]
+            return [{'epoch': epoch, 'available': events[epoch]} for epoch in epochs]
+
+    def get_events(self, since, until=None, limit=1000):
+        until = until or 2 ** 62
+        with self._lock:
+            matches = [
+                (epoch, available, domain_id)
+                for domain_id, events in self._events.items()
+                for epoch, available in events.items()
+                if since <= epoch < until
+            ]
+            rows = []
+            for epoch, available, domain_id in heapq.nsmallest(limit, matches):
+                record = self._domains[domain_id - 1]
+                keyword = self._keyword_row(record.keyword_id)
+                rows.append({'epoch': epoch, 'available': available, 'domain': record.domain,
+                             'keyword': keyword['keyword'] if keyword else None})
+            return rows
+
+    def get_events_after(self, after, limit=1000):
+        after = tuple(after)
+        with self._lock:
+            matches = [
+                (epoch, available, domain_id)
+                for domain_id, events in self._events.items()
+                for epoch, available in events.items()
+                if (epoch, available, domain_id) > after
+            ]
+            rows = []
+            for epoch, available, domain_id in heapq.nsmallest(limit, matches):
+                record = self._domains[domain_id - 1]
+                keyword = self._keyword_row(record.keyword_id)
+                earlier = [when for when in self._events[domain_id] if when < epoch]
+                rows.append({'epoch': epoch, 'available': available, 'domain_id': domain_id,
+                             'domain': record.domain, 'keyword': keyword['keyword'] if keyword else None,
+                             'previous': self._events[domain_id][max(earlier)] if earlier else None})
+            return rows
+
+    @_writes
+    def compact_events(self, cutoff, batch_size=10000):
+        removed = 0
+        with self._lock:
+            for events in self._events.values():
+                old = [epoch for epoch in events if epoch < cutoff]
+                # Keep the last transition before the cutoff
+                for epoch in sorted(old)[:-1]:
+                    del events[epoch]
+                    removed += 1
+        return removed
+
+    # Scan history
+
+    def _add_scan(self, keywords_count, status, **values):
+        now = _utc_now()
+        scan = {
+            'id': len(self._scans) + 1,
+            'scan_date': now,
+            'keywords_scanned': keywords_count,
+            'domains_found': 0,
+            'status': status,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'keywords_done': 0,
+            'resumed': 0,
+            'elapsed_seconds': 0,
+            'checkpoint_date': None,
+            'finished_date': None,
+            'lookups': 0,
+        }
+        scan.update(values)
+        self._scans.append(scan)
+        return scan
+
+    @_writes
+    def add_scan_record(self, keywords_count, domains_found, status, cache_hits=0, cache_misses=0, elapsed_seconds=0,
+                        lookups=0):
+        with self._lock:
+            self._add_scan(keywords_count, status, domains_found=domains_found, cache_hits=cache_hits,
+                           cache_misses=cache_misses, lookups=lookups, keywords_done=keywords_count,
+                           elapsed_seconds=elapsed_seconds, finished_date=_utc_now())
+
+    def get_scan_history(self, limit=10):
+        with self._lock:
+            return [dict(scan) for scan in reversed(self._scans[-limit:])] if limit > 0 else []
+
+    @_writes
+    def start_scan(self, keyword_ids):
+        with self._lock:
+            for scan in reversed(self._scans):
+                if scan['status'] in ('Running', 'Partial'):
+                    return scan['id']
+            # keyword id -> [done, owner, lease_expires]
+            work = {keyword_id: [0, None, 0] for keyword_id in keyword_ids}
+            scan = self._add_scan(len(work), 'Running', checkpoint_date=_utc_now())
+            self._scan_work[scan['id']] = work
+            return scan['id']
+
+    @_writes
+    def join_scan(self, stale_after):
+        stale_before = (datetime.now(timezone.utc) - timedelta(seconds=int(stale_after))).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            for scan in reversed(self._scans):
+                if scan['status'] not in ('Running', 'Partial'):
+                    continue
+                if scan['status'] == 'Partial' or scan['checkpoint_date'] < stale_before:
+                    scan.update(status='Running', resumed=scan['resumed'] + 1, checkpoint_date=_utc_now())
+                return dict(scan)
+            return None
+
+    def _scan(self, scan_id):
+        return self._scans[scan_id - 1] if 0 < scan_id <= len(self._scans) else None
+
+    def get_scan(self, scan_id):
+        with self._lock:
+            scan = self._scan(scan_id)
+            return dict(scan) if scan is not None else None
+
+    def get_scan_work(self, scan_id):
+        with self._lock:
+            return {keyword_id: entry[0] for keyword_id, entry in self._scan_work.get(scan_id, {}).items()}
+
+    def claim_scan_work(self, scan_id, owner, limit, lease_seconds):
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for keyword_id, entry in self._scan_work.get(scan_id, {}).items():
+                if len(claimed) >= limit:
+                    break
+                if entry[0] == 0 and entry[2] < now:
+                    entry[1:] = [owner, now + lease_seconds]
+                    claimed.append(keyword_id)
+        return claimed
+
+    def _held_work(self, scan_id, owner, keyword_ids):
+        work = self._scan_work.get(scan_id, {})
+        for keyword_id in keyword_ids:
+            entry = work.get(keyword_id)
+            if entry is not None and entry[0] == 0 and entry[1] == owner:
+                yield entry
+
+    def renew_scan_work(self, scan_id, owner, keyword_ids, lease_seconds):
+        held = 0
+        with self._lock:
+            for entry in self._held_work(scan_id, owner, keyword_ids):
+                entry[2] = time.time() + lease_seconds
+                held += 1
+        return held
+
+    def release_scan_work(self, scan_id, owner, keyword_ids):
+        with self._lock:
+            for entry in self._held_work(scan_id, owner, keyword_ids):
+                entry[1:] = [None, 0]
+
+    @_writes
+    def checkpoint_scan(self, scan_id, keyword_ids, domains_found, cache_hits, cache_misses, lookups, elapsed_seconds,
+                        status='Running'):
+        with self._lock:
+            scan = self._scan(scan_id)
+            if scan is None:
+                return
+            work = self._scan_work.get(scan_id, {})
+            for keyword_id in keyword_ids:
+                entry = work.get(keyword_id)
+                if entry is not None and entry[0] == 0:
+                    entry[0] = 1
+                    scan['keywords_done'] += 1
+            scan.update(domains_found=scan['domains_found'] + domains_found,
+                        cache_hits=scan['cache_hits'] + cache_hits,
+                        cache_misses=scan['cache_misses'] + cache_misses,
+                        lookups=scan['lookups'] + lookups,
+                        elapsed_seconds=scan['elapsed_seconds'] + elapsed_seconds,
+                        status=status, checkpoint_date=_utc_now())
+
+    @_writes
+    def finish_scan(self, scan_id, status='Success'):
+        with self._lock:
+            scan = self._scan(scan_id)
+            if scan is None:
+                return
+            now = _utc_now()
+            scan.update(keywords_done=scan['keywords_scanned'], status=status, checkpoint_date=now, finished_date=now)
+            self._scan_work.pop(scan_id, None)
+
+    def acquire_lease(self, name, owner, lease_seconds):
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder is None or holder[0] == owner or holder[1] < now:
+                self._leases[name] = (owner, now + lease_seconds)
+                return True
+            return False
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+    # Settings
+
+    def get_setting(self, key, default=None):
+        return self._settings.get(key, default)
+
+    def get_settings(self):
+        return dict(self._settings)
+
+    @_writes
+    def save_settings(self, settings):
+        with self._lock:
+            self._settings.update((key, str(value)) for key, value in settings.items())
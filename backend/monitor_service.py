@@ -1,5 +1,6 @@
 import time
 import logging
+import argparse
 import sys
 import os
 from datetime import datetime
@@ -8,9 +9,16 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from database import Database
+from storage import ENGINES, get_storage, page_cursor
 from domain_checker import DomainChecker
+from scan_engine import ScanEngine
+from sharded_scan import ShardedScanEngine
+from verdict_cache import VerdictCache
+from expiry_scheduler import ExpiryScheduler
+from event_compactor import EventCompactor
 from email_notifier import EmailNotifier
+from notification_sender import NotificationSender
+from scan_checkpoint import ScanCheckpoint, node_id
 
 
 # Configure logging to file AND stdout
@@ -25,49 +33,203 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds before a partial batch of scan results is written anyway
+_FLUSH_INTERVAL = 5
+
+
+class ScanCancelled(Exception):
+    """A scan job was cancelled; results stored so far are kept"""
+
+
 class MonitorService:
-    def __init__(self):
-        self.db = Database()
-        self.checker = DomainChecker()
+    def __init__(self, workers=None, storage=None):
+        self.db = get_storage(storage)
+        self.workers = workers or Config.SCAN_WORKERS
+        if self.workers > 1:
+            # Lookups run in worker processes; this process only stores results.
+            # Workers can only read registry data from storage they can open too
+            engine = storage or Config.STORAGE_ENGINE
+            self.checker = None
+            self.engine = ShardedScanEngine(self.workers, storage=engine if engine == 'sqlite' else None)
+        else:
+            self.checker = DomainChecker()
+            self.engine = ScanEngine(self.checker, registry=self.db)
+        self.cache = VerdictCache(self.db)
+        self.scheduler = ExpiryScheduler(self.db)
+        self.compactor = EventCompactor(self.db)
         self.notifier = EmailNotifier()
         self.interval = Config.MONITOR_INTERVAL
+        # Name of this process in the leases it shares with other monitor nodes
+        self.node_id = node_id()
+        # Alerts are queued in the database and emailed from a background thread
+        self.sender = NotificationSender(self.db, self.notifier, self.node_id)
         logger.info(f"Monitor Service initialized. Check interval: {self.interval} seconds")
     
-    def run_scan(self):
-        """Run a single scan of all keywords"""
+    def run_scan(self, job=None):
+        """
+        Run a full scan of all keywords, sharing it with any other monitor
+        nodes. A ScanManager job, if given, is told the progress and can
+        cancel the scan (ScanCancelled); the scan then resumes next time.
+        """
         logger.info("=" * 60)
-        logger.info("Starting domain scan...")
         
-        # Get all active keywords
-        keywords = self.db.get_all_keywords()
-        
-        if not keywords:
-            logger.info("No keywords to monitor. Waiting for keywords...")
-            self.db.add_scan_record(0, 0, "No keywords")
-            return
+        scan = self.db.join_scan(Config.SCAN_LEASE_SECONDS)
+        if scan is not None:
+            scan_id = scan['id']
+            work = self.db.get_scan_work(scan_id)
+            left = sum(1 for finished in work.values() if not finished)
+            logger.info(f"Joining scan #{scan_id}: {left} of {scan['keywords_scanned']} keyword(s) left")
+        else:
+            logger.info("Starting domain scan...")
+            
+            # Get all active keywords
+            keywords = self.db.get_all_keywords()
+            
+            if not keywords:
+                logger.info("No keywords to monitor. Waiting for keywords...")
+                self.db.add_scan_record(0, 0, "No keywords")
+                return
+            
+            # Returns the scan another node started first, if there is one
+            scan_id = self.db.start_scan([row['id'] for row in keywords])
+            work = self.db.get_scan_work(scan_id)
+            logger.info(f"Scanning {len(work)} keyword(s) as scan #{scan_id}")
         
-        logger.info(f"Scanning {len(keywords)} keyword(s)")
-        total_domains_found = 0
-        lost_domains = []
+        # Keywords deleted or deactivated since the scan started are dropped
+        keywords = [row for row in self.db.get_all_keywords() if row['id'] in work]
+        if job is not None:
+            # Other nodes may take part of it; the estimate is for all that is left
+            job.expect(self.engine.generator.estimate(keywords, [row for row in keywords if not work[row['id']]]))
         
-        # Check each keyword
-        for keyword_row in keywords:
-            keyword_id = keyword_row['id']
-            keyword = keyword_row['keyword']
+        checkpoint = ScanCheckpoint(self.db, scan_id, self.node_id)
+        checkpoint.start()
+        total_found, lost_domains = 0, []
+        try:
+            while True:
+                # Claim keyword batches until none are left, then see who finishes
+                checkpoint.start_pass()
+                candidates = checkpoint.track(self.engine.iter_candidates(keywords, checkpoint.claim(keywords)))
+                found, lost = self._check_candidates(candidates, checkpoint=checkpoint, job=job)
+                total_found += found['cached'] + found['checked']
+                lost_domains.extend(lost)
+                
+                if not checkpoint.elect():
+                    logger.info(f"No work left to claim; another node finishes scan #{scan_id}")
+                    break
+                if checkpoint.wait_for_others():
+                    break
+                logger.info(f"Reclaimed keywords of scan #{scan_id} from a node that stopped")
             
-            logger.info(f"\nChecking keyword: '{keyword}'")
+            logger.info(f"\nScan share complete. Found {total_found} available domain(s)")
             
-            # Get domain variations and check availability
-            results = self.checker.check_keyword_domains(keyword)
+            # Lost domains are only known to the node that checked them
+            if lost_domains:
+                self.send_lost_notifications(lost_domains)
             
-            # Store results in database
-            for domain, available in results:
-                # status_code: 1=New, 2=Regained, 3=Lost, 0=No Change
-                status_code = self.db.add_domain(keyword_id, domain, 1 if available else 0)
+            if checkpoint.leader:
+                # Queue email notifications for new/regained domains
+                self.send_notifications()
+                checkpoint.finish()
+                logger.info(f"Scan #{scan_id} finished")
+        finally:
+            checkpoint.close()
+        logger.info("=" * 60)
+    
+    def run_due_scan(self):
+        """Re-check only the domains whose scheduled check time has passed"""
+        logger.info("=" * 60)
+        logger.info("Checking domains that are due...")
+        started = time.monotonic()
+        # The schedule in the database is authoritative here, so skip the cache
+        found, lost_domains = self._check_candidates(self.scheduler.due_candidates(), use_cache=False)
+        if not found['lookups']:
+            # Woken early or beaten to them by another node; not worth a history row
+            logger.info("No domains were due.")
+            logger.info("=" * 60)
+            return
+        self._record_scan(0, found, lost_domains, "Scheduled", started)
+    
+    def run_keyword_scan(self, keyword_ids, job=None):
+        """
+        Scan only the given keywords, outside the shared full scan. A
+        cancelled job (ScanCancelled) keeps its stored results but is not
+        recorded in the scan history.
+        """
+        logger.info("=" * 60)
+        wanted = set(keyword_ids)
+        keywords = [row for row in self.db.get_all_keywords() if row['id'] in wanted]
+        logger.info(f"Scanning {len(keywords)} selected keyword(s)...")
+        started = time.monotonic()
+        if job is not None:
+            job.expect(self.engine.generator.estimate(keywords))
+        found, lost_domains = self._check_candidates(self.engine.iter_candidates(keywords), job=job)
+        self._record_scan(len(keywords), found, lost_domains, "Manual", started)
+    
+    def _record_scan(self, keywords_count, found, lost_domains, status, started):
+        """Notify about a scan that is not shared between nodes and add it to the history"""
+        total_domains_found = found['cached'] + found['checked']
+        logger.info(f"\nScan complete. Found {total_domains_found} available domain(s)")
+        
+        # Queue email notifications for new/regained domains
+        self.send_notifications()
+        
+        # Queue email notifications for lost domains
+        if lost_domains:
+            self.send_lost_notifications(lost_domains)
+        
+        # Record scan in history
+        self.db.add_scan_record(keywords_count, total_domains_found, status, self.cache.hits, self.cache.misses,
+                                round(time.monotonic() - started, 3), lookups=found['lookups'])
+        logger.info("=" * 60)
+    
+    def _check_candidates(self, candidates, use_cache=True, checkpoint=None, job=None):
+        """
+        Check candidates and store results; returns the available counts and
+        the lost domains. A full scan passes its checkpoint, which is saved
+        with every batch; a ScanManager job counts resolved candidates.
+        """
+        lost_domains = []
+        # Cached available verdicts are counted from the loop thread
+        found = {'cached': 0, 'checked': 0, 'lookups': 0}
+        
+        def on_cache_hit(candidate, verdict):
+            if verdict:
+                found['cached'] += 1
+            if checkpoint is not None:
+                checkpoint.resolved(candidate[0])
+            if job is not None:
+                job.advance()
+        
+        # Only candidates whose cached verdict expired go to the network
+        self.cache.start_scan()
+        if use_cache:
+            candidates = self.cache.filter_candidates(candidates, on_cache_hit)
+        
+        # Check all keyword/extension candidates concurrently; results
+        # arrive in completion order rather than keyword order
+        logger.info(f"Checking candidates with concurrency {self.engine.concurrency}"
+                    f"{f' across {self.workers} processes' if self.workers > 1 else ''}")
+        
+        # Results are stored in batches, one transaction each
+        batch = []
+        last_flush = time.time()
+        
+        def save():
+            if checkpoint is not None:
+                checkpoint.save(found['cached'] + found['checked'], self.cache.hits, self.cache.misses, found['lookups'])
+        
+        def flush():
+            codes = self.db.apply_scan_results([row for row, keyword in batch])
+            for (keyword_id, domain, available, *_), keyword in batch:
+                status_code = codes.get(domain)
+                if status_code is None:
+                    # Failed check; only its next_check was stored
+                    continue
                 
                 if available:
-                    total_domains_found += 1
+                    found['checked'] += 1
                 
+                # status_code: 1=New, 2=Regained, 3=Lost, 0=No Change
                 if status_code == 3: # Lost
                     logger.info(f"⚠️  Domain LOST: {domain}")
                     lost_domains.append({
@@ -76,53 +238,75 @@ class MonitorService:
                     })
                 elif status_code == 2:
                     logger.info(f"♻️  Domain REGAINED: {domain}")
+            
+            # Queued as soon as they are stored, so a crash later in the scan can't lose them
+            lost = [(domain, keyword) for (keyword_id, domain, *_), keyword in batch if codes.get(domain) == 3]
+            if lost:
+                self.db.queue_notifications('lost', lost)
+            
+            if checkpoint is not None:
+                for (keyword_id, *_), keyword in batch:
+                    checkpoint.resolved(keyword_id)
+                save()
+            batch.clear()
         
-        logger.info(f"\nScan complete. Found {total_domains_found} available domain(s)")
-        
-        # Send email notifications for new/regained domains
-        self.send_notifications()
-        
-        # Send email notifications for lost domains
-        if lost_domains:
-            self.send_lost_notifications(lost_domains)
+        try:
+            for keyword_id, keyword, domain, available, record in self.engine.scan_candidates(candidates):
+                found['lookups'] += 1
+                next_check = self.cache.put(domain, available, self.scheduler.next_check(available, record),
+                                            write_through=False)
+                
+                expiration_date, registry_status = None, None
+                if record:
+                    expiration_date = record['expiration_date']
+                    registry_status = ','.join(record['statuses'])
+                
+                # Failed checks (available is None) only reschedule a known domain
+                batch.append(((keyword_id, domain, None if available is None else (1 if available else 0),
+                               next_check, expiration_date, registry_status), keyword))
+                
+                if len(batch) >= Config.DB_WRITE_BATCH or time.time() - last_flush > _FLUSH_INTERVAL:
+                    flush()
+                    last_flush = time.time()
+                
+                if job is not None:
+                    job.advance()
+                    if job.cancel_requested:
+                        # Keep what was checked; the rest is left to the next scan
+                        flush()
+                        raise ScanCancelled()
+            
+            if batch:
+                flush()
+            # Keywords answered entirely from the cache close after the last batch
+            save()
+        except BaseException:
+            # Stopped (Ctrl+C, app quit) or failed: keep the work list for next time
+            if checkpoint is not None:
+                checkpoint.stop(found['cached'] + found['checked'], self.cache.hits, self.cache.misses,
+                                found['lookups'])
+            raise
         
-        # Record scan in history
-        self.db.add_scan_record(len(keywords), total_domains_found, "Success")
-        logger.info("=" * 60)
+        logger.info(f"Verdict cache: {self.cache.hits} hit(s), {found['lookups']} lookup(s)")
+        return found, lost_domains
     
     def send_notifications(self):
-        """Send email notifications for unnotified domains"""
+        """Queue email notifications for unnotified domains and wake the sender"""
         unnotified = self.db.get_unnotified_domains()
         
         if not unnotified:
             logger.info("No new domains to notify about.")
             return
         
-        logger.info(f"Preparing to notify about {len(unnotified)} domain(s)")
-        
-        # Convert to list of dicts for email
-        domains_to_notify = []
-        domain_ids = []
-        
-        for domain_row in unnotified:
-            domains_to_notify.append({
-                'domain': domain_row['domain'],
-                'keyword': domain_row['keyword']
-            })
-            domain_ids.append(domain_row['id'])
-        
-        # Send notification
-        if self.notifier.send_domain_alert(domains_to_notify):
-            # Mark as notified
-            self.db.mark_domains_notified(domain_ids)
-            logger.info("Domains marked as notified")
+        # Domains still queued from an earlier scan are not queued twice
+        queued = self.db.queue_notifications('new', [(row['domain'], row['keyword']) for row in unnotified])
+        logger.info(f"Queued notifications for {queued} new domain(s)")
+        self.sender.wake()
 
     def send_lost_notifications(self, lost_domains):
-        """Send email notifications for lost domains"""
+        """Wake the sender for lost domains (queued as their batch was stored)"""
         logger.info(f"Preparing to notify about {len(lost_domains)} LOST domain(s)")
-        
-        if self.notifier.send_lost_domain_alert(lost_domains):
-            logger.info("Lost domain notification sent")
+        self.sender.wake()
     
     def run_continuous(self):
         """Run the monitor service continuously"""
@@ -130,20 +314,65 @@ class MonitorService:
         logger.info(f"Monitoring interval: {self.interval} seconds ({self.interval // 60} minutes)")
         logger.info("Press Ctrl+C to stop\n")
         
+        # Old domain history is pruned in the background
+        self.compactor.start()
+        # Alerts queued before a restart (or by other nodes) are sent too
+        self.sender.start()
+        
         try:
+            next_full_scan = time.time()
             while True:
-                self.run_scan()
+                if time.time() >= next_full_scan:
+                    # Full pass picks up new keywords; cached verdicts are skipped
+                    self.run_scan()
+                    next_full_scan = time.time() + self.interval
+                else:
+                    self.run_due_scan()
                 
-                logger.info(f"\nNext scan in {self.interval} seconds...")
-                logger.info(f"Waiting until {datetime.fromtimestamp(time.time() + self.interval).strftime('%Y-%m-%d %H:%M:%S')}\n")
+                # Sleep until the next domain is due or the next full pass
+                wake_at = self.scheduler.next_wakeup(next_full_scan)
+                logger.info(f"\nNext check in {int(max(0, wake_at - time.time()))} seconds...")
+                logger.info(f"Waiting until {datetime.fromtimestamp(wake_at).strftime('%Y-%m-%d %H:%M:%S')}\n")
                 
-                time.sleep(self.interval)
+                time.sleep(max(0, wake_at - time.time()))
                 
         except KeyboardInterrupt:
             logger.info("\n\nMonitor Service stopped by user")
         except Exception as e:
             logger.error(f"Monitor Service error: {e}", exc_info=True)
+        finally:
+            self.sender.close()
 
 if __name__ == '__main__':
-    service = MonitorService()
-    service.run_continuous()
+    parser = argparse.ArgumentParser(description='Domain monitor service')
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'Scan worker processes (default: SCAN_WORKERS={Config.SCAN_WORKERS})')
+    parser.add_argument('--storage', choices=ENGINES, default=None,
+                        help=f'Storage engine (default: STORAGE_ENGINE={Config.STORAGE_ENGINE})')
+    parser.add_argument('--keywords', metavar='CSV',
+                        help='Import keywords from a CSV file (first column) before scanning')
+    parser.add_argument('--once', action='store_true',
+                        help='Run one scan, print the available domains and exit')
+    args = parser.parse_args()
+    
+    service = MonitorService(workers=args.workers, storage=args.storage)
+    if args.keywords:
+        from keyword_import import import_keywords, iter_csv_keywords
+        with open(args.keywords, 'rb') as f:
+            result = import_keywords(service.db, iter_csv_keywords(f))
+        logger.info(f"Imported keywords: {result.as_dict()}")
+    
+    if args.once:
+        service.run_scan()
+        cursor = None
+        while True:
+            domains = service.db.get_available_domains(1000, cursor)
+            for row in domains:
+                print(row['domain'])
+            if len(domains) < 1000:
+                break
+            cursor = page_cursor('available', domains[-1])
+        # Deliver the scan's alerts before exiting; undelivered ones stay queued
+        service.sender.close()
+    else:
+        service.run_continuous()
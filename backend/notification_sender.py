@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from config import Config
+from email_notifier import EmailNotifier
+from scan_checkpoint import node_id
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class NotificationSender:
+    """
+    Background thread that emails the alerts queued in the notifications
+    table. Scans only queue alerts and wake the sender, so a slow or down
+    mail server never holds up a scan. Alerts due together go out as one
+    digest over a kept SMTP session; a failed email stays queued and is
+    retried with exponential backoff. Domains are marked notified only once
+    their email was delivered. One process sends at a time (the
+    'notifications' lease); any other picks up what is left.
+    """
+
+    def __init__(self, db, notifier=None, owner=None):
+        self.db = db
+        self.notifier = notifier or EmailNotifier()
+        self.owner = owner or node_id()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._unconfigured = False
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='notification-sender', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Alerts were queued; send them after NOTIFY_DIGEST_DELAY"""
+        self.start()
+        self._wake.set()
+
+    def close(self):
+        """Stop the thread, send what is due now and log out of SMTP"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+        try:
+            self.send_pending()
+        finally:
+            self.notifier.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(Config.NOTIFY_POLL_INTERVAL):
+                self._wake.clear()
+                # Let the rest of a scan's alerts arrive, so they share one email
+                if self._stop.wait(Config.NOTIFY_DIGEST_DELAY):
+                    break
+            try:
+                self.send_pending()
+            except Exception as e:
+                logger.error(f"Sending notifications failed: {e}")
+            self.notifier.close_idle()
+
+    def send_pending(self):
+        """Email every queued alert that is due; returns how many domains were reported"""
+        # Looked at first, so an idle poll writes nothing (not even the lease)
+        if not self.db.get_due_notifications(time.time(), 1):
+            return 0
+        config = Config.get_email_config()
+        if not Config.is_email_configured(config):
+            if not self._unconfigured:
+                logger.warning("Email not configured. Alerts stay queued until it is.")
+            self._unconfigured = True
+            return 0
+        self._unconfigured = False
+        if not self.db.acquire_lease('notifications', self.owner, Config.SCAN_LEASE_SECONDS):
+            logger.info("Another node is sending notifications.")
+            return 0
+        reported = 0
+        try:
+            while True:
+                rows = self.db.get_due_notifications(time.time(), Config.NOTIFY_DIGEST_MAX)
+                if not rows:
+                    break
+                sent = self._send_digest(rows, config)
+                if sent is None:
+                    # Don't try the next digest against a server that just failed
+                    break
+                reported += sent
+                if not self.db.acquire_lease('notifications', self.owner, Config.SCAN_LEASE_SECONDS):
+                    break
+        finally:
+            self.db.release_lease('notifications', self.owner)
+        return reported
+
+    def _send_digest(self, rows, config):
+        """Email one digest; returns how many domains it reported, or None if it failed"""
+        # A domain queued more than once (lost, then regained) is reported as it is now
+        latest = {}
+        for row in sorted(rows, key=lambda row: row['id']):
+            latest[row['domain']] = row
+        new, lost = [], []
+        for row in latest.values():
+            (new if row['kind'] == 'new' else lost).append({'domain': row['domain'], 'keyword': row['keyword']})
+        ids = [row['id'] for row in rows]
+        try:
+            self.notifier.send_digest(new, lost, config)
+        except Exception as e:
+            attempts = max(row['attempts'] for row in rows) + 1
+            delay = min(Config.NOTIFY_BASE_BACKOFF * 2 ** (attempts - 1), Config.NOTIFY_MAX_BACKOFF)
+            self.db.defer_notifications(ids, time.time() + delay, str(e))
+            logger.error(f"Failed to send email notification (attempt {attempts}), retrying in {delay:g}s: {e}")
+            return None
+        self.db.complete_notifications(ids)
+        return len(latest)
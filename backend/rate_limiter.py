@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import random
+import socket
+import time
+from datetime import datetime
+from config import Config
+from expiry_scheduler import registry_due
+from whois_client import WhoisError, WhoisNoServer, WhoisRateLimited
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LookupDeferred(Exception):
+    """Raised when a lookup was throttled and should be retried later"""
+
+    def __init__(self, server, retry_after, reason):
+        super().__init__(f"{server}: {reason}")
+        self.server = server
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket; tokens refill continuously at `rate` per second"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token if one is available, otherwise return seconds to wait"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket for one WHOIS server whose rate adapts to feedback.
+    Additive increase while lookups succeed quickly, multiplicative
+    decrease on slow answers, errors and rate-limit refusals.
+    """
+
+    def __init__(self, server, rate=None, min_rate=None, max_rate=None):
+        self.server = server
+        self.min_rate = min_rate or Config.WHOIS_MIN_RATE
+        self.max_rate = max_rate or Config.WHOIS_MAX_RATE
+        rate = rate or Config.WHOIS_RATE
+        self.bucket = TokenBucket(rate, burst=max(1, rate))
+        self.blocked_until = 0
+        self.throttle_count = 0
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def _set_rate(self, rate):
+        rate = min(self.max_rate, max(self.min_rate, rate))
+        self.bucket.rate = rate
+        self.bucket.burst = max(1, rate)
+
+    async def acquire(self):
+        """Wait until the server may receive another query"""
+        while True:
+            pause = self.blocked_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            wait = self.bucket.reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def on_success(self, latency):
+        if latency > Config.WHOIS_LATENCY_TARGET:
+            # Slow answers are the first sign of an overloaded registry
+            self._set_rate(self.rate * 0.9)
+        else:
+            self._set_rate(self.rate + Config.WHOIS_RATE_STEP / max(self.rate, 1))
+
+    def on_error(self):
+        self._set_rate(self.rate * 0.75)
+
+    def on_throttle(self, cooldown):
+        self.throttle_count += 1
+        self._set_rate(self.rate * 0.5)
+        # Stop sending entirely for a while; refusals usually come in bursts
+        self.blocked_until = max(self.blocked_until, time.monotonic() + cooldown)
+        logger.warning(f"WHOIS server {self.server} throttled us; rate now {self.rate:.2f}/s")
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for the given retry attempt"""
+    delay = min(Config.LOOKUP_MAX_BACKOFF, Config.LOOKUP_BASE_BACKOFF * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class LookupScheduler:
+    """
+    Scheduling layer between the scan engine and DomainChecker.
+    Keeps one adaptive limiter per WHOIS server and raises LookupDeferred
+    for throttled or failed WHOIS queries so the engine can retry them
+    from its delay queue instead of guessing a verdict.
+    registry is the storage engine holding registry data from earlier scans,
+    so domains DNS shows as taken are only looked up when that data is
+    missing or their expiry is near.
+    """
+
+    def __init__(self, checker, rate=None, min_rate=None, max_rate=None, registry=None):
+        self.checker = checker
+        self.registry = registry
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.limiters = {}
+
+    def limiter_for(self, server):
+        limiter = self.limiters.get(server)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(server, self.rate, self.min_rate, self.max_rate)
+            self.limiters[server] = limiter
+        return limiter
+
+    def _server_for(self, domain):
+        try:
+            return self.checker.whois_client.server_for(domain)
+        except WhoisNoServer:
+            return 'python-whois'
+
+    async def _resolve_server(self, domain, attempt):
+        """The WHOIS server for a domain; discovering one is throttled like a lookup at IANA"""
+        whois_client = self.checker.whois_client
+        server = whois_client.known_server(domain)
+        if server is not None:
+            return server
+        limiter = self.limiter_for(whois_client.iana_server)
+        await limiter.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._server_for, domain)
+        except (WhoisError, OSError, socket.timeout) as e:
+            limiter.on_error()
+            raise LookupDeferred(limiter.server, backoff_delay(attempt), e)
+
+    def _stored_record(self, domain):
+        """Registry data stored by an earlier scan, in parsed WHOIS form, or None"""
+        if self.registry is None:
+            return None
+        stored = self.registry.get_registry_records([domain]).get(domain)
+        if stored is None:
+            return None
+        expiration_date, registry_status = stored
+        return {
+            'registered': True,
+            'expiration_date': datetime.fromisoformat(str(expiration_date)) if expiration_date else None,
+            'statuses': registry_status.split(',') if registry_status else [],
+        }
+
+    async def _whois_record(self, domain, attempt):
+        """
+        One throttled WHOIS lookup. Returns the parsed record, or None when
+        it failed for good; raises LookupDeferred when it should be retried.
+        """
+        loop = asyncio.get_running_loop()
+        server = await self._resolve_server(domain, attempt)
+        limiter = self.limiter_for(server)
+        await limiter.acquire()
+
+        start = time.monotonic()
+        try:
+            record = await loop.run_in_executor(None, self.checker.whois_record, domain)
+        except WhoisRateLimited as e:
+            delay = backoff_delay(attempt)
+            limiter.on_throttle(delay)
+            raise LookupDeferred(server, delay, e)
+        except (WhoisError, OSError, socket.timeout) as e:
+            # Timeouts and refused connections are how many registries
+            # enforce limits, so back off rather than trust the silence
+            limiter.on_error()
+            raise LookupDeferred(server, backoff_delay(attempt), e)
+        except Exception as e:
+            logger.warning(f"WHOIS check failed for {domain}: {e}")
+            return None
+
+        limiter.on_success(time.monotonic() - start)
+        return record
+
+    async def _taken_record(self, domain):
+        """
+        Registry data to schedule a domain the zone index or DNS shows as
+        taken: the stored record while its expiry is far off, otherwise one
+        WHOIS lookup. The verdict is already known, so a throttled or failed
+        lookup is not retried; the stored record (if any) stands.
+        """
+        stored = self._stored_record(domain)
+        if not registry_due(stored, time.time()):
+            return stored
+        try:
+            record = await self._whois_record(domain, 0)
+        except LookupDeferred:
+            return stored
+        if record is None or not record['registered']:
+            # DNS decided; a WHOIS miss does not make the name available
+            return stored
+        return record
+
+    async def check(self, domain, attempt=0):
+        """
+        Returns (available, record): available is True/False/None (failed),
+        record is the parsed WHOIS record (or the stored one when DNS
+        decided and the expiry is far off, None if there is none).
+        Raises LookupDeferred when the lookup should be retried later;
+        a retry (attempt > 0) already passed the zone index and DNS, so
+        only its WHOIS step runs again.
+        """
+        # Offline zone index first, then DNS; only the rest need WHOIS for a verdict
+        if attempt == 0 and (self.checker.zone_registered(domain) or await self.checker.dns_taken(domain)):
+            return False, await self._taken_record(domain)
+
+        record = await self._whois_record(domain, attempt)
+        if record is None:
+            return None, None
+        return not record['registered'], record
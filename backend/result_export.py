@@ -0,0 +1,70 @@
+"""
+Streaming result export.
+Rows from Database.iter_export_rows are encoded as CSV or NDJSON a chunk at
+a time and optionally gzipped on the fly, so an export of any size is sent
+without holding it in memory.
+"""
+import csv
+import io
+import json
+import zlib
+
+FORMATS = {
+    # format: (mimetype, file extension)
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+CSV_HEADER = ['Domain', 'Keyword', 'Status', 'Checked Date', 'Email Notified']
+
+# Rows encoded per chunk sent to the client
+_CHUNK_ROWS = 1000
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for row in rows:
+        writer.writerow((row['domain'], row['keyword'], row['status'], row['checked_date'], row['notified']))
+        count += 1
+        if count % _CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({
+            'domain': row['domain'],
+            'keyword': row['keyword'],
+            'status': row['status'],
+            'checked_date': row['checked_date'],
+            'notified': row['notified'] == 'Yes'
+        }))
+        if len(lines) >= _CHUNK_ROWS:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def _gzip_chunks(chunks):
+    # wbits 31: gzip container, readable by gunzip and spreadsheet tools
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(rows, fmt='csv', compress=False):
+    """Yield the encoded export of `rows` as byte chunks"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    chunks = _csv_chunks(rows) if fmt == 'csv' else _ndjson_chunks(rows)
+    return _gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,183 @@
+"""
+Scan checkpoints and work leases.
+A full scan's work list is its keyword ids (see Database.start_scan). Every
+monitor node taking part claims keywords from it in batches under a lease,
+which a heartbeat thread keeps renewing. A keyword is checkpointed as done
+once the generator has moved past it and each of its candidates is stored
+or was answered by the verdict cache.
+If a node dies, its leases run out and the keywords it had not finished
+are claimed again, by another node or by the next run; a keyword that was
+partly checked is checked again, which is safe because storing a result
+twice changes nothing. One elected node waits for the rest and finishes
+the scan.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def node_id():
+    """Name of this monitor process in leases"""
+    return Config.NODE_ID or f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ScanCheckpoint:
+    """This node's share of one full scan"""
+
+    def __init__(self, db, scan_id, owner=None):
+        self.db = db
+        self.scan_id = scan_id
+        self.owner = owner or node_id()
+        self.lease_seconds = Config.SCAN_LEASE_SECONDS
+        self.leader = False
+        self._lock = threading.Lock()
+        self._open = {}  # keyword_id -> candidates neither stored nor cached yet
+        self._generating = None
+        self._done = []
+        self._held = set()  # claimed and not yet checkpointed as done
+        self._reclaimed = []
+        self._saved = (0, 0, 0, 0)
+        self._saved_at = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def start(self):
+        """Start renewing this node's leases"""
+        self._heartbeat = threading.Thread(target=self._beat, name='scan-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def close(self):
+        """Stop the heartbeat and hand back whatever this node still holds"""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            held, self._held = list(self._held), set()
+        if held:
+            self.db.release_scan_work(self.scan_id, self.owner, held)
+        if self.leader:
+            self.db.release_lease(self._leader_lease, self.owner)
+            self.leader = False
+
+    @property
+    def _leader_lease(self):
+        return f'scan:{self.scan_id}'
+
+    def _beat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                held = list(self._held)
+            try:
+                if held and self.db.renew_scan_work(self.scan_id, self.owner, held, self.lease_seconds) < len(held):
+                    logger.warning(f"Some keywords of scan #{self.scan_id} were claimed by another node")
+                if self.leader:
+                    self.leader = self.db.acquire_lease(self._leader_lease, self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Scan heartbeat failed: {e}")
+
+    # Work
+
+    def claim(self, keywords):
+        """
+        Yield the rows of keywords claimed from the work list, a batch at a
+        time, until nothing is left to claim. `keywords` are the scan's rows.
+        """
+        rows = {row['id']: row for row in keywords}
+        while True:
+            claimed, self._reclaimed = self._reclaimed, []
+            claimed = claimed or self.db.claim_scan_work(self.scan_id, self.owner, Config.SCAN_CLAIM_BATCH,
+                                                         self.lease_seconds)
+            if not claimed:
+                break
+            with self._lock:
+                self._held.update(claimed)
+            for keyword_id in claimed:
+                # Asked for the next row: the previous keyword has all its candidates out
+                with self._lock:
+                    self._generated(self._generating)
+                    self._generating = keyword_id
+                    self._open.setdefault(keyword_id, 0)
+                # Keywords deactivated since the scan started have nothing to check
+                if keyword_id in rows:
+                    yield rows[keyword_id]
+        with self._lock:
+            self._generated(self._generating)
+            self._generating = None
+
+    def track(self, candidates):
+        """Pass the claimed keywords' candidates through, counting them per keyword"""
+        for candidate in candidates:
+            with self._lock:
+                self._open[candidate[0]] += 1
+            yield candidate
+
+    def _generated(self, keyword_id):
+        # Lock held; the keyword has produced all of its candidates
+        if keyword_id is not None and self._open.get(keyword_id) == 0:
+            del self._open[keyword_id]
+            self._done.append(keyword_id)
+
+    def resolved(self, keyword_id):
+        """One of the keyword's candidates was stored or answered from the cache"""
+        with self._lock:
+            left = self._open[keyword_id] = self._open[keyword_id] - 1
+            if left == 0 and keyword_id != self._generating:
+                del self._open[keyword_id]
+                self._done.append(keyword_id)
+
+    # Progress
+
+    def start_pass(self):
+        """A new pass over claimed work begins; its counters start from zero"""
+        self._saved = (0, 0, 0, 0)
+        self._saved_at = time.monotonic()
+
+    def save(self, domains_found, cache_hits, cache_misses, lookups, status='Running'):
+        """Checkpoint the keywords done and the pass's counters since the last save"""
+        with self._lock:
+            done, self._done = self._done, []
+            self._held.difference_update(done)
+        totals = (domains_found, cache_hits, cache_misses, lookups)
+        now = time.monotonic()
+        self.db.checkpoint_scan(self.scan_id, done, *(total - saved for total, saved in zip(totals, self._saved)),
+                                round(now - self._saved_at, 3), status=status)
+        self._saved, self._saved_at = totals, now
+
+    def stop(self, domains_found, cache_hits, cache_misses, lookups):
+        """This node stopped before running out of work; the scan is kept for resuming"""
+        self.save(domains_found, cache_hits, cache_misses, lookups, status='Partial')
+        logger.info(f"Scan #{self.scan_id} stopped early; it resumes on the next full scan")
+
+    # Finishing
+
+    def elect(self):
+        """Try to become the node that finishes the scan"""
+        self.leader = self.db.acquire_lease(self._leader_lease, self.owner, self.lease_seconds)
+        return self.leader
+
+    def wait_for_others(self, poll_interval=1.0):
+        """
+        As the elected node, wait until every keyword is done (True), or
+        until keywords can be claimed again because their node stopped
+        renewing them (False; the next claim() pass checks them).
+        """
+        while True:
+            scan = self.db.get_scan(self.scan_id)
+            if scan is None or scan['keywords_done'] >= scan['keywords_scanned']:
+                # Done, or the data was cleared under us
+                return True
+            self._reclaimed = self.db.claim_scan_work(self.scan_id, self.owner, Config.SCAN_CLAIM_BATCH,
+                                                      self.lease_seconds)
+            if self._reclaimed:
+                return False
+            time.sleep(poll_interval)
+
+    def finish(self):
+        """Every keyword was scanned"""
+        self.db.finish_scan(self.scan_id)
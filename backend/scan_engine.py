@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from domain_checker import DomainChecker
+from candidate_generator import CandidateGenerator
+from rate_limiter import LookupScheduler, LookupDeferred
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Marker put on the result queue once every candidate has been checked
+_DONE = object()
+
+
+class ScanEngine:
+    """
+    Concurrent scan engine.
+    Checks every keyword x extension candidate at once, bounded by a global
+    concurrency limit, and hands results back as soon as each check completes.
+    registry (a storage engine) lets the default LookupScheduler schedule
+    DNS-taken domains from stored registry data (see LookupScheduler).
+    """
+
+    def __init__(self, checker=None, concurrency=None, scheduler=None, generator=None, registry=None):
+        self.checker = checker or DomainChecker()
+        self.concurrency = max(1, concurrency or Config.SCAN_CONCURRENCY)
+        self.scheduler = scheduler or LookupScheduler(self.checker, registry=registry)
+        self.generator = generator or CandidateGenerator(self.checker.extensions)
+
+    def iter_candidates(self, keywords, rows=None):
+        """Yield (keyword_id, keyword, domain) for every keyword row (or those in rows), lazily"""
+        return self.generator.generate(keywords, rows)
+
+    async def _worker(self, state, emit, stop):
+        """
+        Take the next lookup: a due retry from the delay queue first,
+        otherwise a fresh candidate from the shared iterator.
+        """
+        delayed = state['delayed']
+        while not stop.is_set():
+            if delayed and delayed[0][0] <= time.monotonic():
+                _, _, attempt, candidate = heapq.heappop(delayed)
+            elif not state['exhausted']:
+                candidate = next(state['candidates'], None)
+                if candidate is None:
+                    state['exhausted'] = True
+                    continue
+                attempt = 0
+            elif delayed or state['in_flight']:
+                # Only retries are left; wait for the earliest to come due
+                wait = delayed[0][0] - time.monotonic() if delayed else 0.05
+                await asyncio.sleep(min(max(wait, 0), 0.5))
+                continue
+            else:
+                return
+
+            keyword_id, keyword, domain = candidate
+            record = None
+            state['in_flight'] += 1
+            try:
+                available, record = await self.scheduler.check(domain, attempt)
+            except LookupDeferred as deferred:
+                if attempt < Config.LOOKUP_MAX_RETRIES:
+                    # Requeue rather than guess; other registries keep going. The
+                    # retry's attempt > 0 tells check() the zone index and DNS already passed it
+                    ready_at = time.monotonic() + deferred.retry_after
+                    heapq.heappush(delayed, (ready_at, next(state['sequence']), attempt + 1, candidate))
+                    continue
+                logger.warning(f"Giving up on {domain} after {attempt + 1} attempt(s): {deferred}")
+                available = None
+            except Exception as e:
+                logger.error(f"Error checking domain {domain}: {e}")
+                available = None
+            finally:
+                state['in_flight'] -= 1
+
+            if available:
+                logger.info(f"✓ Domain available: {domain}")
+            elif available is False:
+                logger.info(f"✗ Domain taken: {domain}")
+
+            emit((keyword_id, keyword, domain, available, record))
+
+    async def scan_async(self, candidates, emit, stop=None):
+        """
+        Check all candidates with at most `concurrency` lookups in flight.
+        emit is called with (keyword_id, keyword, domain, available, record)
+        per result, where record is the WHOIS record if one was fetched.
+        """
+        stop = stop or threading.Event()
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='scan')
+        loop.set_default_executor(executor)
+
+        # Workers share one iterator so candidates are generated lazily,
+        # and one delay queue of (ready_at, seq, attempt, candidate) retries
+        state = {
+            'candidates': iter(candidates),
+            'exhausted': False,
+            'delayed': [],
+            'sequence': itertools.count(),
+            'in_flight': 0,
+        }
+        workers = [
+            asyncio.create_task(self._worker(state, emit, stop))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def scan(self, keywords):
+        """
+        Scan all domain variations of the given keyword rows.
+        Yields (keyword_id, keyword, domain, available, record) as checks complete.
+        """
+        return self.scan_candidates(self.iter_candidates(keywords))
+
+    def scan_candidates(self, candidates):
+        """
+        Scan (keyword_id, keyword, domain) candidates.
+        The event loop runs on a background thread so the caller can consume
+        results (and write them to the database) while lookups continue.
+        """
+        results = queue.Queue(maxsize=self.concurrency * 4)
+        stop = threading.Event()
+
+        def emit(item):
+            # Block the loop thread rather than buffer unbounded results
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def run_loop():
+            try:
+                asyncio.run(self.scan_async(candidates, emit, stop))
+                emit(_DONE)
+            except Exception as e:
+                emit(e)
+
+        thread = threading.Thread(target=run_loop, name='scan-engine', daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Consumer finished or bailed out early; stop outstanding workers
+            stop.set()
+            thread.join()
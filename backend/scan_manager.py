@@ -0,0 +1,196 @@
+"""
+Scans started from the dashboard.
+The API process has one ScanManager. It runs triggered scans on a
+background thread with a single MonitorService, so the verdict cache and
+settings are loaded once rather than per click. A trigger for the keywords
+a queued or running job already covers returns that job instead of
+starting a second scan; any other trigger is rejected with ScanBusy (the
+API answers 409) rather than waiting. Jobs report live progress and can
+be cancelled.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for /api/scans
+_KEEP_JOBS = 20
+
+ACTIVE = ('queued', 'running', 'cancelling')
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def scan_manager():
+    """The process-wide scan manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ScanManager()
+        return _manager
+
+
+class ScanBusy(Exception):
+    """A different scan is queued or running; it is in .job"""
+
+    def __init__(self, job):
+        super().__init__(f"Scan {job.id} is already {job.status}")
+        self.job = job
+
+
+class ScanJob:
+    """One triggered scan and its progress"""
+
+    def __init__(self, keyword_ids=None):
+        self.id = uuid.uuid4().hex[:12]
+        # Sorted ids of the keywords to scan; None means a full scan
+        self.keyword_ids = keyword_ids
+        self.status = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.expected = 0
+        self.checked = 0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    # Called by MonitorService while it scans
+
+    def expect(self, candidates):
+        """More candidates are to be checked (an estimate)"""
+        with self._lock:
+            self.expected += candidates
+
+    def advance(self, count=1):
+        """Candidates were checked or answered from the cache"""
+        with self._lock:
+            self.checked += count
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def as_dict(self):
+        with self._lock:
+            checked, expected = self.checked, self.expected
+        running = self.status in ACTIVE
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        rate = checked / elapsed if elapsed > 0 else 0.0
+        remaining = max(expected - checked, 0) if running else 0
+        return {
+            'id': self.id,
+            'status': self.status,
+            'keyword_ids': self.keyword_ids,
+            'checked': checked,
+            'expected': expected,
+            'remaining': remaining,
+            'rate': round(rate, 1),
+            'eta_seconds': round(remaining / rate) if running and rate else None,
+            'elapsed_seconds': round(elapsed, 1),
+            'created': _iso(self.created),
+            'started': _iso(self.started),
+            'finished': _iso(self.finished),
+            'error': self.error,
+        }
+
+
+def _iso(epoch):
+    return None if epoch is None else datetime.fromtimestamp(epoch).isoformat(timespec='seconds')
+
+
+class ScanManager:
+    """Runs one scan job at a time in this process"""
+
+    def __init__(self, service_factory=None):
+        self._service_factory = service_factory
+        self._service = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._current = None
+
+    def start(self, keyword_ids=None):
+        """
+        Start a scan of keyword_ids (None: every keyword). Returns (job,
+        created); created is False when an active job already covers the
+        same keywords. Raises ScanBusy if another scan is active.
+        """
+        keyword_ids = None if keyword_ids is None else sorted(set(keyword_ids))
+        with self._lock:
+            current = self._current
+            if current is not None and current.status in ACTIVE:
+                if current.keyword_ids == keyword_ids and not current.cancel_requested:
+                    return current, False
+                raise ScanBusy(current)
+
+            job = self._current = ScanJob(keyword_ids)
+            self._jobs[job.id] = job
+            for old_id in [job_id for job_id, old in self._jobs.items() if old.status not in ACTIVE]:
+                if len(self._jobs) <= _KEEP_JOBS:
+                    break
+                del self._jobs[old_id]
+            threading.Thread(target=self._run, args=(job,), name=f'scan-job-{job.id}', daemon=True).start()
+        logger.info(f"Scan job {job.id} started "
+                    f"({'all keywords' if keyword_ids is None else f'{len(keyword_ids)} keyword(s)'})")
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Known jobs, newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Ask a job to stop; returns it, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE:
+                return job
+            job._cancel.set()
+            job.status = 'cancelling'
+        logger.info(f"Scan job {job.id} cancelling")
+        return job
+
+    def _monitor_service(self):
+        # Created on first use, on the job thread, and kept for later jobs
+        if self._service is None:
+            if self._service_factory is not None:
+                self._service = self._service_factory()
+            else:
+                from monitor_service import MonitorService
+                self._service = MonitorService()
+        return self._service
+
+    def _run(self, job):
+        from monitor_service import ScanCancelled
+        job.started = time.time()
+        try:
+            with self._lock:
+                if not job.cancel_requested:
+                    job.status = 'running'
+            if job.cancel_requested:
+                raise ScanCancelled()
+            service = self._monitor_service()
+            if job.keyword_ids is None:
+                service.run_scan(job=job)
+            else:
+                service.run_keyword_scan(job.keyword_ids, job=job)
+            job.status = 'finished'
+        except ScanCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            logger.error(f"Scan job {job.id} failed: {e}", exc_info=True)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+            logger.info(f"Scan job {job.id} {job.status}: {job.checked} candidate(s) checked")
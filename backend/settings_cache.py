@@ -0,0 +1,85 @@
+"""
+Process-wide settings cache.
+Every setting is loaded with one query and served from memory. Saving a
+setting in this process drops the copy. Changes made by other processes
+(the dashboard vs. the monitor) are picked up within
+SETTINGS_CHECK_INTERVAL seconds. PRAGMA data_version says whether anything
+was committed, and the trigger-maintained settings_version says whether a
+setting was among the changes.
+"""
+import sqlite3
+import threading
+import time
+from config import Config
+
+# One cache per database file
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def settings_cache(db_path):
+    """The shared cache for a database file"""
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = _caches[db_path] = SettingsCache(db_path)
+        return cache
+
+
+class SettingsCache:
+    def __init__(self, db_path, check_interval=None):
+        self.db_path = db_path
+        self.check_interval = Config.SETTINGS_CHECK_INTERVAL if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        # Own connection: data_version only moves for commits made by other connections
+        self._conn = None
+        self._values = None
+        self._data_version = None
+        self._settings_version = None
+        self._checked = 0.0
+
+    def get_all(self):
+        """Dict of every setting; do not modify it"""
+        values = self._values
+        if values is not None and time.monotonic() - self._checked < self.check_interval:
+            return values
+        with self._lock:
+            if self._values is None or self._changed():
+                self._load()
+            self._checked = time.monotonic()
+            return self._values
+
+    def get(self, key, default=None):
+        return self.get_all().get(key, default)
+
+    def invalidate(self):
+        """Reload on next read; call after committing a settings change"""
+        # Under the lock so a load already running cannot put back older values
+        with self._lock:
+            self._values = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT, check_same_thread=False)
+        return self._conn
+
+    def _changed(self):
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return False
+        # Something was committed; usually scan results, not settings
+        self._data_version = data_version
+        version = conn.execute('SELECT settings_version FROM stats WHERE id = 1').fetchone()[0]
+        return version != self._settings_version
+
+    def _load(self):
+        conn = self._connection()
+        self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        # One read transaction so the values match the version
+        conn.execute('BEGIN')
+        try:
+            self._settings_version = conn.execute('SELECT settings_version FROM stats WHERE id = 1').fetchone()[0]
+            self._values = dict(conn.execute('SELECT key, value FROM settings').fetchall())
+        finally:
+            conn.rollback()
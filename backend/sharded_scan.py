@@ -0,0 +1,193 @@
+"""
+Multi-process scanning.
+Candidates are split into shards by keyword and checked by worker processes,
+each running its own DomainChecker and ScanEngine. Results stream back to the
+parent, which stays the only process that writes to SQLite. If a shard dies
+or candidate generation fails, the scan fails with ShardFailed: its
+candidates are lost, so the keywords they belong to are never done and must
+be handed back rather than left leased.
+"""
+import logging
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from config import Config
+from candidate_generator import CandidateGenerator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Candidates and results cross process boundaries in batches of this size
+_BATCH_SIZE = 100
+# Seconds a worker holds on to a partial result batch
+_FLUSH_INTERVAL = 0.5
+
+
+class ShardFailed(RuntimeError):
+    """A shard or the candidate feed stopped before every candidate was checked"""
+
+
+def _shard_worker(shard, inbox, results, concurrency, rate_share, checker_factory, storage):
+    """Worker process: check candidates from inbox, send result batches back"""
+    # Imported here so the parent never builds a checker it does not use
+    from domain_checker import DomainChecker
+    from rate_limiter import LookupScheduler
+    from scan_engine import ScanEngine
+    from storage import get_storage
+
+    checker = (checker_factory or DomainChecker)()
+    registry = get_storage(storage) if storage else None
+    # Every shard queries every registry, so each gets a share of the rate
+    scheduler = LookupScheduler(checker, Config.WHOIS_RATE * rate_share,
+                                Config.WHOIS_MIN_RATE * rate_share, Config.WHOIS_MAX_RATE * rate_share,
+                                registry)
+    engine = ScanEngine(checker, concurrency, scheduler)
+
+    def candidates():
+        while True:
+            batch = inbox.get()
+            if batch is None:
+                return
+            yield from batch
+
+    error = None
+    try:
+        batch = []
+        flushed = time.monotonic()
+        for result in engine.scan_candidates(candidates()):
+            batch.append(result)
+            if len(batch) >= _BATCH_SIZE or time.monotonic() - flushed > _FLUSH_INTERVAL:
+                results.put((shard, batch))
+                batch = []
+                flushed = time.monotonic()
+        if batch:
+            results.put((shard, batch))
+    except Exception as e:
+        logger.error(f"Scan shard {shard} failed: {e}", exc_info=True)
+        error = str(e) or type(e).__name__
+    finally:
+        # None when every candidate was checked; otherwise why not
+        results.put((shard, None if error is None else ('error', error)))
+
+
+class ShardedScanEngine:
+    """
+    Drop-in replacement for ScanEngine that spreads lookups over processes.
+    Workers are started per scan and shut down when it completes.
+    """
+
+    def __init__(self, workers, concurrency=None, generator=None, checker_factory=None, storage=None):
+        self.workers = max(1, workers)
+        # Picklable callable returning a checker in each worker (DomainChecker by default)
+        self.checker_factory = checker_factory
+        # Storage engine name workers read stored registry data from (see LookupScheduler)
+        self.storage = storage
+        self.concurrency = max(1, concurrency or Config.SCAN_CONCURRENCY)
+        self.generator = generator or CandidateGenerator()
+        # spawn: the parent may hold threads and SQLite handles that must not be forked
+        self.context = multiprocessing.get_context('spawn')
+
+    def iter_candidates(self, keywords, rows=None):
+        """Yield (keyword_id, keyword, domain) for every keyword row (or those in rows), lazily"""
+        return self.generator.generate(keywords, rows)
+
+    def scan(self, keywords):
+        return self.scan_candidates(self.iter_candidates(keywords))
+
+    def _feed(self, candidates, inboxes, processes, stop, errors):
+        """Parent thread: deal candidates to shards by keyword id; a failure goes in errors"""
+        buffers = [[] for _ in inboxes]
+
+        def put(shard, item):
+            # A dead shard's candidates are dropped rather than blocking the rest (the scan fails)
+            while not stop.is_set() and processes[shard].is_alive():
+                try:
+                    inboxes[shard].put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        try:
+            for candidate in candidates:
+                if stop.is_set():
+                    return
+                shard = candidate[0] % len(inboxes)
+                buffers[shard].append(candidate)
+                if len(buffers[shard]) >= _BATCH_SIZE:
+                    put(shard, buffers[shard])
+                    buffers[shard] = []
+        except Exception as e:
+            logger.error(f"Candidate generation failed: {e}", exc_info=True)
+            errors.append(f"candidate generation failed: {e}")
+        finally:
+            for shard, buffer in enumerate(buffers):
+                if buffer:
+                    put(shard, buffer)
+                put(shard, None)
+
+    def scan_candidates(self, candidates):
+        """
+        Scan (keyword_id, keyword, domain) candidates across worker processes.
+        Yields (keyword_id, keyword, domain, available, record) as results arrive.
+        Raises ShardFailed once a shard dies or candidate generation fails.
+        """
+        per_worker = math.ceil(self.concurrency / self.workers)
+        inboxes = [self.context.Queue(maxsize=8) for _ in range(self.workers)]
+        results = self.context.Queue(maxsize=self.workers * 8)
+        processes = [
+            self.context.Process(target=_shard_worker, name=f'scan-shard-{shard}',
+                                 args=(shard, inboxes[shard], results, per_worker, 1 / self.workers,
+                                       self.checker_factory, self.storage),
+                                 daemon=True)
+            for shard in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        logger.info(f"Started {self.workers} scan worker process(es), concurrency {per_worker} each")
+
+        stop = threading.Event()
+        errors = []
+        feeder = threading.Thread(target=self._feed, args=(candidates, inboxes, processes, stop, errors),
+                                  name='scan-feeder', daemon=True)
+        feeder.start()
+
+        finished = set()
+        checked_at = time.monotonic()
+        try:
+            while len(finished) < self.workers:
+                try:
+                    shard, batch = results.get(timeout=1)
+                except queue.Empty:
+                    batch = ()
+                if time.monotonic() - checked_at >= 1:
+                    # Also while the other shards keep results coming
+                    checked_at = time.monotonic()
+                    for dead, process in enumerate(processes):
+                        # A shard that exits cleanly has reported back; wait for that to arrive
+                        if dead not in finished and not process.is_alive() and (process.exitcode
+                                                                                 or results.empty()):
+                            # Died without reporting back (killed, out of memory)
+                            raise ShardFailed(f"scan shard {dead} exited with code {process.exitcode}")
+                if batch is None:
+                    finished.add(shard)
+                elif isinstance(batch, tuple) and batch:
+                    raise ShardFailed(f"scan shard {shard} failed: {batch[1]}")
+                else:
+                    yield from batch
+            feeder.join()
+            if errors:
+                raise ShardFailed(errors[0])
+        finally:
+            stop.set()
+            feeder.join()
+            for inbox in inboxes:
+                inbox.cancel_join_thread()
+            for process in processes:
+                if len(finished) < self.workers:
+                    # Consumer stopped early; outstanding lookups are abandoned
+                    process.terminate()
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
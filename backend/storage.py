@@ -0,0 +1,372 @@
+"""
+Storage interface.
+The monitor, the API and Config use a StorageBackend and never a concrete
+engine. get_storage() returns the process-wide engine selected by
+STORAGE_ENGINE:
+- 'sqlite' (the default): Database, stored in DATABASE_PATH
+- 'memory': MemoryStorage, with nothing written to disk; for benchmarks,
+  one-shot scans and tests
+Rows returned by either engine support row['column'] access.
+"""
+import base64
+import json
+import re
+import threading
+from abc import ABC, abstractmethod
+from config import Config
+
+ENGINES = ('sqlite', 'memory')
+
+_storage = {}
+_storage_lock = threading.Lock()
+
+
+def get_storage(engine=None):
+    """The shared storage engine for this process"""
+    engine = engine or Config.STORAGE_ENGINE
+    with _storage_lock:
+        if engine not in _storage:
+            if engine == 'sqlite':
+                from database import Database
+                _storage[engine] = Database()
+            elif engine == 'memory':
+                from memory_storage import MemoryStorage
+                _storage[engine] = MemoryStorage()
+            else:
+                raise ValueError(f"Unknown storage engine '{engine}'. Choose from: {', '.join(ENGINES)}")
+        return _storage[engine]
+
+
+# Sort key of each paginated listing; page cursors encode the last row's key
+_CURSOR_KEYS = {
+    'available': ('checked_date', 'id'),
+    'all': ('keyword', 'domain'),
+}
+_TLD_RE = re.compile(r'^[a-z0-9-]+(\.[a-z0-9-]+)*$')
+
+
+def page_cursor(listing, row):
+    """Opaque token for the page after `row` of a listing ('available' or 'all')"""
+    values = [listing] + [row[key] for key in _CURSOR_KEYS[listing]]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def read_cursor(listing, token):
+    """Sort key from a page cursor; ValueError if it is not one for this listing"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != 3 or values[0] != listing:
+        raise ValueError('Invalid cursor')
+    return values[1:]
+
+
+def normalize_filters(tld=None, keyword=None, status=None):
+    """Checked (tld, keyword, status) result filters; ValueError if one is malformed"""
+    if tld:
+        tld = tld.lower().strip().lstrip('.')
+        if not _TLD_RE.match(tld):
+            raise ValueError(f"Invalid TLD '{tld}'")
+    if keyword:
+        keyword = keyword.lower().strip()
+    if status and status not in ('available', 'taken'):
+        raise ValueError(f"Invalid status '{status}'. Choose from: available, taken")
+    return tld or None, keyword or None, status or None
+
+
+class StorageBackend(ABC):
+    """
+    Keywords, domain state and history, scan history and settings.
+    Timestamps go in as datetimes and come back in a form
+    datetime.fromisoformat(str(value)) reads.
+    """
+
+    # Keywords
+
+    @abstractmethod
+    def add_keyword(self, keyword):
+        """Add a keyword to monitor; returns its id (also if it already existed)"""
+        raise NotImplementedError
+
+    def add_keywords_bulk(self, keywords):
+        """Add multiple keywords at once; returns how many were new"""
+        return self.insert_keywords([keyword.lower().strip() for keyword in keywords if keyword.strip()])
+
+    @abstractmethod
+    def insert_keywords(self, keywords):
+        """Insert already-normalized keywords, ignoring existing ones; returns how many were inserted"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_keywords(self):
+        """Get all active keywords"""
+        raise NotImplementedError
+
+    # Domain state
+
+    def add_domain(self, keyword_id, domain, available, next_check=None, expiration_date=None, registry_status=None):
+        """Store one scan result; returns its status code (see apply_scan_results)"""
+        codes = self.apply_scan_results([
+            (keyword_id, domain, available, next_check, expiration_date, registry_status)
+        ])
+        return codes.get(domain, 0)
+
+    @abstractmethod
+    def apply_scan_results(self, rows):
+        """
+        Store a batch of (keyword_id, domain, available, next_check,
+        expiration_date, registry_status) scan results at once. available is
+        1/0, or None for a failed check, which only moves next_check of a
+        known domain; if a domain appears twice the last row wins. New
+        domains and availability flips are recorded as events. Returns dict
+        of domain -> status code for successful rows: 0 no change, 1 new
+        available, 2 regained (Taken -> Available), 3 lost (Available -> Taken).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_cached_verdicts(self, domains):
+        """Get stored verdicts as dict of domain -> (available, next_check)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_registry_records(self, domains):
+        """
+        Get the registry data last read from WHOIS, as dict of
+        domain -> (expiration_date, registry_status). Domains never looked up
+        in WHOIS are left out.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_next_check(self, domain, next_check):
+        """Update when a domain's stored verdict expires"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_due_domains(self, cutoff, after_id=0, limit=1000):
+        """Get domains of active keywords whose next_check has passed, by id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_due_domains(self, cutoff, after_id=0, limit=1000, lease_seconds=60):
+        """
+        Get due domains like get_due_domains and push their next_check
+        lease_seconds ahead, so other monitor nodes skip them. The check's
+        result replaces that time; if the node dies first they fall due again.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_next_check_time(self):
+        """Get the earliest scheduled check, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_available_domains(self, limit=100, cursor=None, tld=None, keyword=None):
+        """Get available domains, most recently checked first, after a page_cursor()"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_domains(self, limit=10000, cursor=None, tld=None, keyword=None, status=None):
+        """Get all domains by keyword then domain, after a page_cursor()"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_export_rows(self, tld=None, keyword=None, status=None, batch_size=5000):
+        """
+        Iterate over (domain, keyword, status, checked_date, notified) display
+        rows by keyword then domain. Filters are checked on call.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_unnotified_domains(self):
+        """Get available domains that haven't been notified yet"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def queue_notifications(self, kind, domains):
+        """
+        Queue alerts of one kind ('new' for available or regained domains,
+        'lost' for taken ones) for (domain, keyword) pairs. A domain already
+        queued with that kind is skipped. Returns how many were queued.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_due_notifications(self, now, limit=1000):
+        """Queued alerts whose next attempt is due at epoch `now`, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete_notifications(self, notification_ids):
+        """Drop delivered alerts and mark the domains of their 'new' ones notified"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def defer_notifications(self, notification_ids, next_attempt, error):
+        """Count a failed delivery of alerts and retry them at epoch next_attempt"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_stats(self):
+        """Exact keywords, active_keywords, domains and available_domains counts"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_all_data(self):
+        """Clear all keywords, domains, history, scans, queued alerts and leases (settings are kept)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_data_version(self):
+        """
+        A value that changes when data was written by someone else since
+        the last call on this thread; cheap enough to poll every second.
+        """
+        raise NotImplementedError
+
+    # Domain history
+
+    @abstractmethod
+    def get_domain_history(self, domain, since=None, until=None, limit=1000):
+        """Get a domain's availability transitions, newest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_events(self, since, until=None, limit=1000):
+        """Get transitions of all domains in [since, until), oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_events_after(self, after, limit=1000):
+        """
+        Get transitions after the (epoch, available, domain_id) key `after`,
+        in that order, each with the domain's previous state (None if it is
+        new); a change feed that pages by the last row's key.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def compact_events(self, cutoff, batch_size=10000):
+        """
+        Drop transitions older than cutoff (epoch seconds), keeping each
+        domain's last one before it; returns the number removed.
+        """
+        raise NotImplementedError
+
+    # Scan history
+
+    @abstractmethod
+    def add_scan_record(self, keywords_count, domains_found, status, cache_hits=0, cache_misses=0, elapsed_seconds=0,
+                        lookups=0):
+        """
+        Add a scan history record for a finished scan. cache_hits and
+        cache_misses count verdict cache answers; lookups counts the domains
+        sent to DNS/WHOIS.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_scan_history(self, limit=10):
+        """Get the latest scan records, newest first"""
+        raise NotImplementedError
+
+    # Full scans shared by monitor nodes: a work list of keywords claimed
+    # under leases (status Running -> Partial when a node stops early -> Success)
+
+    @abstractmethod
+    def start_scan(self, keyword_ids):
+        """
+        Record a new full scan with its work list; returns the scan id.
+        If another node has started one meanwhile, returns that one's id.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def join_scan(self, stale_after):
+        """
+        Get the newest unfinished full scan, marked Running, or None. It
+        counts as resumed if it had stopped ('Partial') or had no checkpoint
+        for stale_after seconds.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_scan(self, scan_id):
+        """Get a scan's history row, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_scan_work(self, scan_id):
+        """Get a scan's work list as dict of keyword_id -> done (1/0)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_scan_work(self, scan_id, owner, limit, lease_seconds):
+        """
+        Lease up to `limit` keywords of a scan that are not done and not
+        leased (or whose lease expired); returns their ids.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew_scan_work(self, scan_id, owner, keyword_ids, lease_seconds):
+        """Extend this owner's leases on keywords; returns how many it still holds"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_scan_work(self, scan_id, owner, keyword_ids):
+        """Give up this owner's leases so other nodes can claim the keywords now"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def checkpoint_scan(self, scan_id, keyword_ids, domains_found, cache_hits, cache_misses, lookups, elapsed_seconds,
+                        status='Running'):
+        """
+        Mark keywords of a scan done and add a node's progress since its
+        last checkpoint. status 'Partial' records a node that stopped
+        early; the scan is kept for join_scan.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_scan(self, scan_id, status='Success'):
+        """Record the outcome of a full scan and drop its work list"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire_lease(self, name, owner, lease_seconds):
+        """
+        Take or renew the named lease (leader election between monitor
+        nodes); True if `owner` holds it for the next lease_seconds.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_lease(self, name, owner):
+        """Give up the named lease if `owner` holds it"""
+        raise NotImplementedError
+
+    # Settings (values are stored as strings)
+
+    @abstractmethod
+    def get_setting(self, key, default=None):
+        """Get a setting value"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_settings(self):
+        """Get every setting as a dict"""
+        raise NotImplementedError
+
+    def save_setting(self, key, value):
+        """Save a setting value"""
+        self.save_settings({key: value})
+
+    @abstractmethod
+    def save_settings(self, settings):
+        """Save several settings at once"""
+        raise NotImplementedError
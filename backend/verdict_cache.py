@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class VerdictCache:
+    """
+    TTL cache of availability verdicts in front of DomainChecker.
+    Entries live in an in-memory LRU capped at CACHE_MAX_ENTRIES and are
+    written through to domains.next_check, so verdicts survive restarts.
+    Taken, available and failed verdicts have separate lifetimes.
+    """
+
+    def __init__(self, db, max_entries=None):
+        self.db = db
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()  # domain -> (verdict, expires_at epoch)
+        self._lock = threading.Lock()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, verdict):
+        """Seconds a verdict stays fresh"""
+        if verdict is None:
+            return Config.CACHE_TTL_FAILED
+        if verdict:
+            return Config.CACHE_TTL_AVAILABLE
+        return Config.CACHE_TTL_TAKEN
+
+    def next_check(self, verdict):
+        """When a verdict recorded now should be checked again"""
+        return datetime.fromtimestamp(time.time() + self.ttl_for(verdict))
+
+    def _store(self, domain, verdict, expires_at):
+        self._entries[domain] = (verdict, expires_at)
+        self._entries.move_to_end(domain)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def start_scan(self):
+        """Reset per-scan counters and drop everything if the data was cleared"""
+        self.hits = 0
+        self.misses = 0
+        generation = self.db.get_setting('data_generation', '0')
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                logger.info("Stored data was cleared; dropping cached verdicts")
+                self._entries.clear()
+            self._generation = generation
+
+    def lookup_many(self, domains):
+        """
+        Return dict of domain -> verdict for domains with a fresh verdict.
+        Domains missing from memory are loaded from the database in one query.
+        """
+        now = time.time()
+        fresh = {}
+        missing = []
+        with self._lock:
+            for domain in domains:
+                entry = self._entries.get(domain)
+                if entry is None:
+                    missing.append(domain)
+                elif entry[1] > now:
+                    self._entries.move_to_end(domain)
+                    fresh[domain] = entry[0]
+
+        if missing:
+            stored = self.db.get_cached_verdicts(missing)
+            with self._lock:
+                for domain, (available, next_check) in stored.items():
+                    expires_at = datetime.fromisoformat(str(next_check)).timestamp()
+                    verdict = bool(available)
+                    self._store(domain, verdict, expires_at)
+                    if expires_at > now:
+                        fresh[domain] = verdict
+        return fresh
+
+    def put(self, domain, verdict, next_check=None, write_through=True):
+        """
+        Record a verdict in memory and return its next_check time.
+        next_check overrides the plain TTL (see ExpiryScheduler).
+        Successful verdicts are persisted by the caller in batches with
+        apply_scan_results; failed ones are written through here unless
+        write_through is False (the caller batches them the same way).
+        """
+        next_check = next_check or self.next_check(verdict)
+        with self._lock:
+            self._store(domain, verdict, next_check.timestamp())
+        if verdict is None and write_through:
+            # Only known domains have a row to hold the retry time
+            self.db.set_next_check(domain, next_check)
+        return next_check
+
+    def filter_candidates(self, candidates, on_hit, batch_size=500):
+        """
+        Yield only candidates without a fresh verdict.
+        on_hit(candidate, verdict) is called for the rest.
+        """
+        batch = []
+        for candidate in candidates:
+            batch.append(candidate)
+            if len(batch) >= batch_size:
+                yield from self._filter_batch(batch, on_hit)
+                batch = []
+        if batch:
+            yield from self._filter_batch(batch, on_hit)
+
+    def _filter_batch(self, batch, on_hit):
+        fresh = self.lookup_many([candidate[2] for candidate in batch])
+        for candidate in batch:
+            if candidate[2] in fresh:
+                self.hits += 1
+                on_hit(candidate, fresh[candidate[2]])
+            else:
+                self.misses += 1
+                yield candidate
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from datetime import datetime
+from config import Config
+from whois_servers import WHOIS_SERVERS, QUERY_FORMATS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WhoisError(Exception):
+    """Raised when a WHOIS lookup cannot produce a verdict"""
+
+
+class WhoisNoServer(WhoisError):
+    """Raised when no WHOIS server is known for a TLD"""
+
+
+class WhoisRateLimited(WhoisError):
+    """Raised when the registry refuses the query because of rate limits"""
+
+
+_DATE_FORMATS = (
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d-%b-%Y',
+    '%Y.%m.%d',
+    '%d/%m/%Y',
+)
+
+
+def parse_whois_date(value):
+    """Parse the date formats registries commonly use (returns naive UTC)"""
+    value = value.strip()
+    # Drop UTC offsets like +00:00 / +0000 that strptime handles unevenly
+    value = re.sub(r'([+-]\d\d:?\d\d|\s*UTC)$', '', value)
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class WhoisParser:
+    """
+    Regex-based parser for one registry's response format.
+    Each pattern list is compiled into a single alternation so a response
+    is scanned once per question.
+    """
+
+    RATE_LIMIT_PATTERNS = [
+        r'limit exceeded', r'exceeded .{0,20}(limit|quota|rate)',
+        r'too many (requests|queries|connections)', r'try again later',
+        r'query rate', r'access denied',
+    ]
+
+    def __init__(self, not_found, expiry_fields=(), status_fields=(), rate_limited=()):
+        self.not_found = re.compile('|'.join(not_found), re.IGNORECASE | re.MULTILINE)
+        self.rate_limited = re.compile(
+            '|'.join(list(rate_limited) + self.RATE_LIMIT_PATTERNS), re.IGNORECASE
+        )
+        self.expiry = self._field_regex(expiry_fields)
+        self.status = self._field_regex(status_fields)
+
+    @staticmethod
+    def _field_regex(fields):
+        if not fields:
+            return None
+        names = '|'.join(re.escape(field) for field in fields)
+        return re.compile(rf'^\s*(?:{names})\s*:\s*(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+
+    def parse(self, text):
+        """
+        Returns dict with registered, expiration_date and statuses.
+        Raises WhoisRateLimited/WhoisError when the response has no verdict.
+        """
+        if not text.strip():
+            raise WhoisError("Empty WHOIS response")
+        if self.not_found.search(text):
+            return {'registered': False, 'expiration_date': None, 'statuses': []}
+        # Refusals are short; registered records mention "limit" in legal text
+        if len(text) < 2000 and self.rate_limited.search(text):
+            raise WhoisRateLimited(text.strip().splitlines()[0][:200])
+
+        expiration_date = None
+        if self.expiry:
+            match = self.expiry.search(text)
+            if match:
+                expiration_date = parse_whois_date(match.group(1))
+
+        statuses = []
+        if self.status:
+            # "clientTransferProhibited https://icann.org/epp#..." -> first token
+            statuses = [match.group(1).split()[0] for match in self.status.finditer(text)]
+
+        return {'registered': True, 'expiration_date': expiration_date, 'statuses': statuses}
+
+
+_GTLD_EXPIRY = ('Registry Expiry Date', 'Registrar Registration Expiration Date')
+_GTLD_STATUS = ('Domain Status',)
+
+DEFAULT_PARSER = WhoisParser(
+    not_found=[
+        r'^No match for', r'^NOT FOUND', r'^No Data Found', r'^Domain not found',
+        r'^No entries found', r'^Status:\s*(free|available)', r'^% No entries found',
+        r'is available for registration', r'^The queried object does not exist',
+    ],
+    expiry_fields=_GTLD_EXPIRY + ('Expiration Date', 'Expiry Date', 'Expiry date', 'paid-till', 'expires'),
+    status_fields=_GTLD_STATUS + ('Status', 'state'),
+)
+
+# Registry-specific parsers keyed by WHOIS server
+PARSERS = {
+    'whois.verisign-grs.com': WhoisParser(
+        not_found=[r'^No match for "'],
+        expiry_fields=_GTLD_EXPIRY, status_fields=_GTLD_STATUS,
+    ),
+    'whois.publicinterestregistry.org': WhoisParser(
+        not_found=[r'^NOT FOUND', r'^Domain not found'],
+        expiry_fields=_GTLD_EXPIRY, status_fields=_GTLD_STATUS,
+    ),
+    'whois.nic.google': WhoisParser(
+        not_found=[r'^Domain not found'],
+        expiry_fields=_GTLD_EXPIRY, status_fields=_GTLD_STATUS,
+    ),
+    'whois.denic.de': WhoisParser(
+        not_found=[r'^Status:\s*free'],
+        status_fields=('Status',),
+        rate_limited=[r'^% Error: 55000000002'],
+    ),
+    'whois.nic.uk': WhoisParser(
+        not_found=[r'^\s*No match for'],
+        expiry_fields=('Expiry date',), status_fields=('Registration status',),
+    ),
+    'whois.eu': WhoisParser(
+        not_found=[r'^Status:\s*AVAILABLE'],
+    ),
+    'whois.registry.in': WhoisParser(
+        not_found=[r'^No Data Found', r'^NOT FOUND'],
+        expiry_fields=_GTLD_EXPIRY, status_fields=_GTLD_STATUS,
+    ),
+}
+
+
+def _split_host(server):
+    """Split 'host' or 'host:port' into (host, port)"""
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, 43
+
+
+class WhoisClient:
+    """
+    Port-43 WHOIS client with per-TLD server routing.
+    The TLD -> server map is seeded from whois_servers.py, extended through
+    IANA referrals and persisted to the data directory. Server addresses are
+    resolved once and cached for WHOIS_ADDRESS_TTL, and a semaphore caps the
+    open connections to each server at WHOIS_MAX_CONNECTIONS; every query
+    still opens its own connection (port 43 servers close it after one answer).
+    """
+
+    def __init__(self, servers=None, iana_server='whois.iana.org', timeout=None, cache_path=None):
+        self.iana_server = iana_server
+        self.timeout = timeout or Config.WHOIS_TIMEOUT
+        self.cache_path = cache_path or os.path.join(Config.DATA_DIR, 'whois_servers.json')
+        self.servers = {tld: {'server': server, 'updated': None} for tld, server in WHOIS_SERVERS.items()}
+        self.servers.update(self._load_cache())
+        if servers:
+            self.servers.update({tld: {'server': server, 'updated': None} for tld, server in servers.items()})
+        self._addresses = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        learned = {tld: entry for tld, entry in self.servers.items() if entry['updated']}
+        try:
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(learned, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save WHOIS server cache: {e}")
+
+    def _discover(self, tld):
+        """Ask IANA for the TLD's WHOIS server"""
+        text = self.query_raw(self.iana_server, tld)
+        match = re.search(r'^(?:whois|refer):\s*(\S+)', text, re.IGNORECASE | re.MULTILINE)
+        if not match:
+            raise WhoisNoServer(f"No WHOIS server for .{tld}")
+        with self._lock:
+            self.servers[tld] = {'server': match.group(1).lower(), 'updated': time.time()}
+            self._save_cache()
+        logger.info(f"Discovered WHOIS server for .{tld}: {match.group(1)}")
+        return match.group(1).lower()
+
+    def _stale(self, entry):
+        # Learned entries are refreshed lazily once they go stale
+        return entry['updated'] and time.time() - entry['updated'] > Config.WHOIS_SERVER_TTL * 86400
+
+    def known_server(self, domain):
+        """Return the WHOIS server for a domain's TLD if server_for needs no IANA query, else None"""
+        entry = self.servers.get(domain.rsplit('.', 1)[-1].lower())
+        if entry is None or self._stale(entry):
+            return None
+        return entry['server']
+
+    def server_for(self, domain):
+        """Return the WHOIS server for a domain's TLD"""
+        tld = domain.rsplit('.', 1)[-1].lower()
+        entry = self.servers.get(tld)
+        if entry is None:
+            return self._discover(tld)
+
+        if self._stale(entry):
+            try:
+                return self._discover(tld)
+            except (WhoisError, OSError) as e:
+                logger.warning(f"Keeping cached WHOIS server for .{tld}: {e}")
+        return entry['server']
+
+    def _address(self, server):
+        """Resolve a server once and reuse the address until it expires"""
+        cached = self._addresses.get(server)
+        if cached and cached[0] > time.time():
+            return cached[1]
+        host, port = _split_host(server)
+        family, socktype, proto, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        address = (family, socktype, proto, sockaddr)
+        self._addresses[server] = (time.time() + Config.WHOIS_ADDRESS_TTL, address)
+        return address
+
+    def _slot(self, server):
+        with self._lock:
+            if server not in self._slots:
+                self._slots[server] = threading.BoundedSemaphore(Config.WHOIS_MAX_CONNECTIONS)
+            return self._slots[server]
+
+    def query_raw(self, server, query):
+        """Send one query to a server and return the decoded response"""
+        with self._slot(server):
+            family, socktype, proto, sockaddr = self._address(server)
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(sockaddr)
+                sock.sendall(query.encode('ascii') + b'\r\n')
+                chunks = []
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            except OSError:
+                # The address may have changed; resolve again next time
+                self._addresses.pop(server, None)
+                raise
+            finally:
+                sock.close()
+        return b''.join(chunks).decode('utf-8', 'replace')
+
+    def lookup(self, domain):
+        """
+        Look up a domain on its registry's WHOIS server.
+        Returns dict with registered, expiration_date, statuses and server.
+        """
+        domain = domain.lower().encode('idna').decode('ascii')
+        server = self.server_for(domain)
+        query = QUERY_FORMATS.get(server, '{domain}').format(domain=domain)
+        text = self.query_raw(server, query)
+        record = PARSERS.get(server, DEFAULT_PARSER).parse(text)
+        record['server'] = server
+        return record
@@ -0,0 +1,37 @@
+"""
+Shipped TLD -> WHOIS server table.
+Seeds WhoisClient; unknown TLDs are looked up through IANA at runtime.
+"""
+
+WHOIS_SERVERS = {
+    'com': 'whois.verisign-grs.com',
+    'net': 'whois.verisign-grs.com',
+    'org': 'whois.publicinterestregistry.org',
+    'io': 'whois.nic.io',
+    'co': 'whois.nic.co',
+    'ai': 'whois.nic.ai',
+    'app': 'whois.nic.google',
+    'dev': 'whois.nic.google',
+    'store': 'whois.nic.store',
+    'biz': 'whois.nic.biz',
+    'info': 'whois.nic.info',
+    'me': 'whois.nic.me',
+    'tech': 'whois.nic.tech',
+    'xyz': 'whois.nic.xyz',
+    'online': 'whois.nic.online',
+    'in': 'whois.registry.in',
+    'us': 'whois.nic.us',
+    'uk': 'whois.nic.uk',
+    'de': 'whois.denic.de',
+    'eu': 'whois.eu',
+    'fr': 'whois.nic.fr',
+    'nl': 'whois.domain-registry.nl',
+    'ca': 'whois.cira.ca',
+    'au': 'whois.auda.org.au',
+}
+
+# Query formats for servers that need more than the bare domain name
+QUERY_FORMATS = {
+    'whois.verisign-grs.com': '={domain}',
+    'whois.denic.de': '-T dn,ace {domain}',
+}
@@ -0,0 +1,272 @@
+"""
+Offline zone-file index.
+Builds a sorted label file plus a Bloom filter from a gzip zone file so
+registered names can be answered without touching DNS or WHOIS.
+
+Usage: python zone_index.py <zone-file.gz> <tld> [output-dir]
+"""
+import argparse
+import gzip
+import hashlib
+import heapq
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_BLOOM_MAGIC = b'DMBLOOM1'
+_BLOOM_HEADER = struct.Struct('!8sQI')
+
+
+class BloomFilter:
+    """Bloom filter stored in a (memory-mapped) file"""
+
+    def __init__(self, bits, hashes, buffer):
+        self.bits = bits
+        self.hashes = hashes
+        self.buffer = buffer
+
+    @staticmethod
+    def size_for(count, false_positive_rate):
+        """Return (bits, hashes) for the expected item count"""
+        count = max(count, 1)
+        bits = int(-count * math.log(false_positive_rate) / (math.log(2) ** 2))
+        hashes = max(1, round(bits / count * math.log(2)))
+        return max(bits, 64), hashes
+
+    @classmethod
+    def create(cls, path, count, false_positive_rate):
+        bits, hashes = cls.size_for(count, false_positive_rate)
+        with open(path, 'wb') as f:
+            f.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, bits, hashes))
+            f.truncate(_BLOOM_HEADER.size + (bits + 7) // 8)
+        return cls.open(path, writable=True)
+
+    @classmethod
+    def in_memory(cls, count, false_positive_rate):
+        """Bloom filter backed by a bytearray instead of a file"""
+        bits, hashes = cls.size_for(count, false_positive_rate)
+        buffer = bytearray(_BLOOM_HEADER.size + (bits + 7) // 8)
+        _BLOOM_HEADER.pack_into(buffer, 0, _BLOOM_MAGIC, bits, hashes)
+        return cls(bits, hashes, buffer)
+
+    @classmethod
+    def open(cls, path, writable=False):
+        with open(path, 'r+b' if writable else 'rb') as f:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            buffer = mmap.mmap(f.fileno(), 0, access=access)
+        magic, bits, hashes = _BLOOM_HEADER.unpack_from(buffer)
+        if magic != _BLOOM_MAGIC:
+            raise ValueError(f"{path} is not a Bloom filter file")
+        return cls(bits, hashes, buffer)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, item):
+        offset = _BLOOM_HEADER.size
+        for position in self._positions(item):
+            index = offset + (position >> 3)
+            self.buffer[index] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        offset = _BLOOM_HEADER.size
+        buffer = self.buffer
+        for position in self._positions(item):
+            if not buffer[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class ZoneIndex:
+    """
+    Membership index for one TLD.
+    A Bloom filter rejects most non-members in microseconds; possible
+    members are confirmed by binary search over the sorted label file.
+    """
+
+    def __init__(self, labels_path, bloom_path):
+        with open(labels_path, 'rb') as f:
+            self.labels = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(labels_path) else b''
+        self.bloom = BloomFilter.open(bloom_path)
+
+    def _line_at(self, offset):
+        """Return (start, end) of the line containing offset"""
+        start = self.labels.rfind(b'\n', 0, offset) + 1
+        end = self.labels.find(b'\n', offset)
+        return start, len(self.labels) if end == -1 else end
+
+    def _search(self, label):
+        lo, hi = 0, len(self.labels)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = self._line_at(mid)
+            current = self.labels[start:end]
+            if current == label:
+                return True
+            if current < label:
+                lo = end + 1
+            else:
+                hi = start
+        return False
+
+    def __contains__(self, label):
+        if isinstance(label, str):
+            try:
+                label = label.encode('idna')
+            except UnicodeError:
+                return False
+        if label not in self.bloom:
+            return False
+        return self._search(label)
+
+    def close(self):
+        if isinstance(self.labels, mmap.mmap):
+            self.labels.close()
+        self.bloom.close()
+
+
+class ZoneIndexSet:
+    """All zone indexes found in Config.ZONE_INDEX_DIR, keyed by TLD"""
+
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir or Config.ZONE_INDEX_DIR
+        self.indexes = {}
+        if not os.path.isdir(self.index_dir):
+            return
+        for name in os.listdir(self.index_dir):
+            if not name.endswith('.labels'):
+                continue
+            tld = name[:-len('.labels')]
+            bloom_path = os.path.join(self.index_dir, f'{tld}.bloom')
+            if os.path.exists(bloom_path):
+                self.indexes[tld] = ZoneIndex(os.path.join(self.index_dir, name), bloom_path)
+                logger.info(f"Loaded zone index for .{tld}")
+
+    def is_registered(self, domain):
+        """True if the domain is in its TLD's zone, None if there is no index or no match"""
+        label, _, tld = domain.lower().rpartition('.')
+        index = self.indexes.get(tld)
+        if index is None or '.' in label:
+            return None
+        return True if label in index else None
+
+
+def iter_zone_labels(zone_path, tld):
+    """Stream second-level labels delegated in a (gzip) zone file"""
+    suffix = f'.{tld}.'.lower()
+    origin = f'{tld}.'.lower()
+    opener = gzip.open if zone_path.endswith('.gz') else open
+    previous = None
+    with opener(zone_path, 'rt', encoding='ascii', errors='replace') as f:
+        for line in f:
+            if not line or line[0] in ' \t;\n':
+                # Blank, comment, or continuation of the previous owner
+                continue
+            owner = line.split(None, 1)[0].lower()
+            if owner == '$origin':
+                origin = line.split()[1].lower()
+                continue
+            if owner.startswith('$'):
+                continue
+            if not owner.endswith('.'):
+                owner = f'{owner}.{origin}'
+            if not owner.endswith(suffix):
+                continue
+            label = owner[:-len(suffix)]
+            # Only direct children of the TLD; zone files are mostly sorted
+            # by owner so consecutive duplicates are dropped cheaply here
+            if label and '.' not in label and label != previous:
+                previous = label
+                yield label
+
+
+def _write_run(labels, directory):
+    run = tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.run', delete=False)
+    with run:
+        for label in sorted(labels):
+            run.write(label.encode('ascii', 'replace') + b'\n')
+    return run.name
+
+
+def build_zone_index(zone_path, tld, output_dir=None, chunk_size=None, false_positive_rate=None):
+    """
+    Build <tld>.labels and <tld>.bloom from a zone file.
+    Memory stays bounded: labels are sorted in chunks of chunk_size, written
+    to temporary runs and merged, and the Bloom filter lives in a mapped file.
+    Returns the number of distinct labels indexed.
+    """
+    tld = tld.lower().lstrip('.')
+    output_dir = output_dir or Config.ZONE_INDEX_DIR
+    chunk_size = chunk_size or Config.ZONE_BUILD_CHUNK
+    false_positive_rate = false_positive_rate or Config.ZONE_BLOOM_FP
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.time()
+
+    runs = []
+    chunk = set()
+    try:
+        for label in iter_zone_labels(zone_path, tld):
+            chunk.add(label)
+            if len(chunk) >= chunk_size:
+                runs.append(_write_run(chunk, output_dir))
+                chunk = set()
+        if chunk or not runs:
+            runs.append(_write_run(chunk, output_dir))
+        chunk = None
+
+        # Merge the sorted runs into the final label file, dropping duplicates
+        labels_path = os.path.join(output_dir, f'{tld}.labels')
+        count = 0
+        files = [open(run, 'rb') for run in runs]
+        try:
+            with open(labels_path + '.tmp', 'wb') as out:
+                previous = None
+                for line in heapq.merge(*files):
+                    if line != previous:
+                        out.write(line)
+                        previous = line
+                        count += 1
+        finally:
+            for f in files:
+                f.close()
+    finally:
+        for run in runs:
+            os.remove(run)
+
+    # Second streaming pass: size the Bloom filter for the exact count
+    bloom_path = os.path.join(output_dir, f'{tld}.bloom')
+    bloom = BloomFilter.create(bloom_path + '.tmp', count, false_positive_rate)
+    with open(labels_path + '.tmp', 'rb') as f:
+        for line in f:
+            bloom.add(line.rstrip(b'\n'))
+    bloom.buffer.flush()
+    bloom.close()
+
+    os.replace(labels_path + '.tmp', labels_path)
+    os.replace(bloom_path + '.tmp', bloom_path)
+    logger.info(f"Indexed {count} .{tld} name(s) from {len(runs)} run(s) in {time.time() - started:.1f}s")
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an offline zone-file index')
+    parser.add_argument('zone_file', help='Zone file (.gz or plain text)')
+    parser.add_argument('tld', help='TLD the zone file covers, e.g. com')
+    parser.add_argument('output_dir', nargs='?', default=None, help='Defaults to ZONE_INDEX_DIR')
+    args = parser.parse_args()
+    build_zone_index(args.zone_file, args.tld, args.output_dir)
@@ -15,6 +15,8 @@ const resultsBody = document.getElementById('results-body');
 const loading = document.getElementById('loading');
 const noResults = document.getElementById('no-results');
 const resultsTableWrapper = document.getElementById('results-table-wrapper');
+const loadMore = document.getElementById('load-more');
+const loadMoreBtn = document.getElementById('load-more-btn');
 const toast = document.getElementById('toast');
 
 // Status elements
@@ -45,13 +47,79 @@ const testEmailBtn = document.getElementById('test-email-btn');
 document.addEventListener('DOMContentLoaded', () => {
     loadStatus();
     loadResults();
+    connectStream();
+});
+
+// Live updates: the server pushes changes over /api/stream; polling is
+// only the fallback while the stream is down or unsupported
+let pollTimer = null;
+let streamConnected = false;
+let lastScan = null;
 
+function startPolling() {
+    if (pollTimer) return;
     // Auto-refresh every 30 seconds
-    setInterval(() => {
+    pollTimer = setInterval(() => {
         loadStatus();
         loadResults();
     }, 30000);
-});
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+function connectStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource(`${API_BASE}/api/stream`);
+    source.onopen = () => {
+        // Catch up on anything missed while disconnected
+        if (pollTimer) { loadResults(); }
+        streamConnected = true;
+        stopPolling();
+    };
+    source.onerror = () => {
+        streamConnected = false;
+        startPolling();
+        if (source.readyState === EventSource.CLOSED) {
+            // The browser gave up reconnecting; try again later
+            setTimeout(connectStream, 30000);
+        }
+    };
+    source.addEventListener('status', (e) => {
+        const status = JSON.parse(e.data);
+        keywordsCount.textContent = status.keywords_count;
+        domainsCount.textContent = status.domains_found;
+    });
+    source.addEventListener('domain', (e) => {
+        const change = JSON.parse(e.data);
+        if (change.change === 'lost') {
+            removeResult(change.domain);
+        } else {
+            prependResult({
+                domain: change.domain,
+                keyword: change.keyword,
+                checked_date: change.epoch * 1000,
+                notified: false
+            });
+        }
+    });
+    source.addEventListener('scan', (e) => {
+        const scan = JSON.parse(e.data);
+        // Alerts go out as a scan ends; reload once for the notified badges
+        const key = `${scan.id}:${scan.status}`;
+        if (lastScan && lastScan !== key && !['Running', 'Partial'].includes(scan.status)) {
+            loadResults();
+        }
+        lastScan = key;
+    });
+    source.addEventListener('job', (e) => showScanJob(JSON.parse(e.data)));
+    source.addEventListener('reset', () => { loadStatus(); loadResults(); });
+}
 
 // Keyword Form Submit
 keywordForm.addEventListener('submit', async (e) => {
@@ -155,16 +223,21 @@ async function loadStatus() {
 }
 
 // Load Results
+// Cursor for the next page of results; null once everything is shown
+let resultsCursor = null;
+
 async function loadResults() {
     loading.style.display = 'block';
     noResults.style.display = 'none';
     resultsTableWrapper.style.display = 'none';
+    resultsCursor = null;
     try {
         const response = await fetch(`${API_BASE}/api/results`);
         const data = await response.json();
         loading.style.display = 'none';
         if (data.success && data.results.length > 0) {
-            displayResults(data.results);
+            resultsBody.innerHTML = '';
+            displayResults(data.results, data.next_cursor);
         } else {
             noResults.style.display = 'block';
         }
@@ -174,25 +247,62 @@ async function loadResults() {
     }
 }
 
-function displayResults(results) {
-    resultsBody.innerHTML = '';
-    results.forEach(result => {
-        const row = document.createElement('tr');
-        const notifiedBadge = result.notified
-            ? '<span class="badge badge-success">✓ Sent</span>'
-            : '<span class="badge badge-pending">Pending</span>';
-
-        row.innerHTML = `
-            <td><strong>${result.domain}</strong></td>
-            <td>${result.keyword}</td>
-            <td>${new Date(result.checked_date).toLocaleString()}</td>
-            <td>${notifiedBadge}</td>
-        `;
-        resultsBody.appendChild(row);
-    });
+async function loadMoreResults() {
+    if (!resultsCursor) return;
+    loadMoreBtn.disabled = true;
+    try {
+        const response = await fetch(`${API_BASE}/api/results?cursor=${encodeURIComponent(resultsCursor)}`);
+        const data = await response.json();
+        if (data.success) {
+            displayResults(data.results, data.next_cursor);
+        } else {
+            showToast(data.error, 'error');
+        }
+    } catch (error) {
+        showToast('Error loading results: ' + error.message, 'error');
+    } finally {
+        loadMoreBtn.disabled = false;
+    }
+}
+
+function resultRow(result) {
+    const row = document.createElement('tr');
+    row.dataset.domain = result.domain;
+    const notifiedBadge = result.notified
+        ? '<span class="badge badge-success">✓ Sent</span>'
+        : '<span class="badge badge-pending">Pending</span>';
+
+    row.innerHTML = `
+        <td><strong>${result.domain}</strong></td>
+        <td>${result.keyword}</td>
+        <td>${new Date(result.checked_date).toLocaleString()}</td>
+        <td>${notifiedBadge}</td>
+    `;
+    return row;
+}
+
+function displayResults(results, nextCursor) {
+    results.forEach(result => resultsBody.appendChild(resultRow(result)));
+    resultsCursor = nextCursor;
+    loadMore.style.display = nextCursor ? 'block' : 'none';
     resultsTableWrapper.style.display = 'block';
 }
 
+// A domain that became available goes to the top (the list is newest first)
+function prependResult(result) {
+    removeResult(result.domain);
+    resultsBody.prepend(resultRow(result));
+    noResults.style.display = 'none';
+    resultsTableWrapper.style.display = 'block';
+}
+
+function removeResult(domain) {
+    const row = resultsBody.querySelector(`tr[data-domain="${CSS.escape(domain)}"]`);
+    if (row) row.remove();
+}
+
+loadMoreBtn.addEventListener('click', loadMoreResults);
+
 // Clear Data
 clearBtn.addEventListener('click', async () => {
     if (!confirm('Are you sure you want to clear ALL data?')) return;
@@ -226,17 +336,58 @@ scanNowBtn.addEventListener('click', async () => {
         const response = await fetch(`${API_BASE}/api/scan-now`, { method: 'POST' });
         const data = await response.json();
         if (data.success) {
-            showToast('Scan started!', 'success');
-            setTimeout(() => { loadStatus(); loadResults(); }, 5000);
-        } else {
-            showToast(data.error, 'error');
+            showToast(data.created ? 'Scan started!' : 'Scan already running', 'success');
+            showScanJob(data.job);
+            // Without the stream, ask for progress instead
+            if (!streamConnected) followScan(data.job.id);
+            return;
         }
+        showToast(data.error, 'error');
     } catch (e) { showToast(e.message, 'error'); }
-    finally {
-        setTimeout(() => { scanNowBtn.disabled = false; scanNowBtn.textContent = '⚡ Scan Now'; }, 3000);
-    }
+    resetScanButton();
 });
 
+function resetScanButton() {
+    scanNowBtn.disabled = false;
+    scanNowBtn.textContent = '⚡ Scan Now';
+}
+
+// Scan job shown on the button, from the stream or from polling
+let shownJob = null;
+
+function showScanJob(job) {
+    if (['queued', 'running', 'cancelling'].includes(job.status)) {
+        const percent = job.expected ? Math.min(99, Math.floor(100 * job.checked / job.expected)) : 0;
+        const eta = job.eta_seconds != null ? ` · ${Math.ceil(job.eta_seconds / 60)} min left` : '';
+        scanNowBtn.disabled = true;
+        scanNowBtn.textContent = `⏳ ${percent}%${eta}`;
+        shownJob = job.id;
+        return;
+    }
+    if (shownJob !== job.id) return;
+    shownJob = null;
+    showToast(job.status === 'failed' ? `Scan failed: ${job.error}` : `Scan ${job.status}`,
+        job.status === 'failed' ? 'error' : 'success');
+    resetScanButton();
+    if (!streamConnected) {
+        loadStatus();
+        loadResults();
+    }
+}
+
+async function followScan(jobId) {
+    try {
+        const response = await fetch(`${API_BASE}/api/scans/${jobId}`);
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error);
+        showScanJob(data.job);
+        if (shownJob === jobId && !streamConnected) setTimeout(() => followScan(jobId), 2000);
+    } catch (e) {
+        showToast(e.message, 'error');
+        resetScanButton();
+    }
+}
+
 // Refresh & Download
 refreshBtn.addEventListener('click', () => { loadStatus(); loadResults(); showToast('Refreshed', 'success'); });
 downloadBtn.addEventListener('click', () => { window.location.href = `${API_BASE}/api/download-csv`; showToast('Downloading...', 'success'); });
@@ -321,6 +472,7 @@ async function loadSettings() {
             const s = data.settings;
             document.getElementById('smtp-server').value = s.smtp_server || '';
             document.getElementById('smtp-port').value = s.smtp_port || '';
+            document.getElementById('smtp-security').value = s.smtp_security || 'starttls';
             document.getElementById('smtp-username').value = s.smtp_username || '';
             document.getElementById('smtp-password').value = s.smtp_password || '';
             document.getElementById('smtp-from').value = s.smtp_from || '';
@@ -335,6 +487,7 @@ settingsForm.addEventListener('submit', async (e) => {
     const settings = {
         smtp_server: document.getElementById('smtp-server').value,
         smtp_port: parseInt(document.getElementById('smtp-port').value),
+        smtp_security: document.getElementById('smtp-security').value,
         smtp_username: document.getElementById('smtp-username').value,
         smtp_password: document.getElementById('smtp-password').value,
         smtp_from: document.getElementById('smtp-from').value,
@@ -360,6 +513,7 @@ testEmailBtn.addEventListener('click', async () => {
     const settings = {
         smtp_server: document.getElementById('smtp-server').value,
         smtp_port: parseInt(document.getElementById('smtp-port').value),
+        smtp_security: document.getElementById('smtp-security').value,
         smtp_username: document.getElementById('smtp-username').value,
         smtp_password: document.getElementById('smtp-password').value,
         smtp_from: document.getElementById('smtp-from').value,
@@ -0,0 +1,68 @@
+"""
+Compare the serial keyword-by-keyword scan with the concurrent scan engine.
+Uses fake DNS/WHOIS backends that only add latency.
+
+Usage: python scripts/benchmark_scan_engine.py [--keywords N] [--concurrency N]
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from scan_engine import ScanEngine
+from fake_backends import FakeChecker
+
+
+def make_keywords(count):
+    return [{'id': i, 'keyword': f'benchkeyword{i}'} for i in range(1, count + 1)]
+
+
+def bench_serial(checker, keywords):
+    start = time.perf_counter()
+    checked = 0
+    for keyword_row in keywords:
+        checked += len(checker.check_keyword_domains(keyword_row['keyword']))
+    return checked, time.perf_counter() - start
+
+
+def bench_engine(checker, keywords, concurrency):
+    engine = ScanEngine(checker, concurrency=concurrency)
+    start = time.perf_counter()
+    checked = sum(1 for _ in engine.scan(keywords))
+    return checked, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the serial scan with the concurrent scan engine')
+    parser.add_argument('--keywords', type=int, default=5, help='Number of keywords to scan')
+    parser.add_argument('--concurrency', type=int, default=100, help='Concurrent lookups in the engine')
+    options = parser.parse_args()
+    keyword_count = options.keywords
+    concurrency = options.concurrency
+
+    import logging
+    logging.disable(logging.INFO)
+
+    checker = FakeChecker(dns_latency=0.02, whois_latency=0.2)
+    keywords = make_keywords(keyword_count)
+
+    print("=" * 60)
+    print(f"Benchmark: {keyword_count} keyword(s) x {len(checker.extensions)} extension(s)")
+    print("=" * 60)
+
+    checked, elapsed = bench_serial(checker, keywords)
+    serial_rate = checked / elapsed
+    print(f"Serial:             {checked} domains in {elapsed:.2f}s ({serial_rate:.1f} domains/sec)")
+
+    checked, elapsed = bench_engine(checker, keywords, concurrency)
+    engine_rate = checked / elapsed
+    print(f"Engine (c={concurrency}): {checked} domains in {elapsed:.2f}s ({engine_rate:.1f} domains/sec)")
+
+    print(f"Speedup: {engine_rate / serial_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
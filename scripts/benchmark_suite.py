@@ -0,0 +1,206 @@
+"""
+End-to-end scan benchmark.
+Runs MonitorService.run_scan against fake DNS, WHOIS and SMTP backends and a
+temporary SQLite database (or the in-memory storage engine), for one or more
+keyword counts, and prints the results as JSON. Each size runs in a fresh
+process so peak RSS is per size.
+
+Usage:
+    python scripts/benchmark_suite.py --sizes 100,1000,10000,100000
+    python scripts/benchmark_suite.py --output results.json
+    python scripts/benchmark_suite.py --baseline results.json   # fail on regressions
+    python scripts/benchmark_suite.py --failure-rate 0.01 --throttle-rate 0.005
+    python scripts/benchmark_suite.py --storage memory   # no database I/O
+"""
+import sys
+import os
+import argparse
+import json
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_size(keyword_count, options, results):
+    """Child process: benchmark one keyword count against a fresh database"""
+    workdir = tempfile.mkdtemp(prefix='domain-bench-')
+    # Config reads the environment at import time, so set it up first
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'bench.db'),
+        'STORAGE_ENGINE': options.storage,
+        'ZONE_INDEX_DIR': os.path.join(workdir, 'zones'),
+        'SCAN_CONCURRENCY': str(options.concurrency),
+        'SCAN_WORKERS': '1',
+        'WHOIS_RATE': str(options.whois_rate),
+        'WHOIS_MAX_RATE': str(options.whois_rate),
+        'LOOKUP_BASE_BACKOFF': str(options.backoff),
+        'LOOKUP_MAX_BACKOFF': str(options.backoff * 8),
+        'SMTP_SERVER': 'localhost',
+        'SMTP_USERNAME': 'bench',
+        'SMTP_PASSWORD': 'bench',
+        'SMTP_FROM': 'bench@localhost',
+        'SMTP_TO': 'bench@localhost',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import logging
+    from fake_backends import FakeChecker, FakeSMTP
+    import email_notifier
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    logging.disable(logging.WARNING)
+    email_notifier.smtplib.SMTP = FakeSMTP
+    FakeSMTP.latency = options.smtp_latency
+
+    try:
+        service = MonitorService()
+        service.checker = FakeChecker(
+            dns_latency=options.dns_latency, whois_latency=options.whois_latency,
+            taken_ratio=options.taken_ratio, jitter=options.jitter,
+            distribution=options.distribution, failure_rate=options.failure_rate,
+            throttle_rate=options.throttle_rate,
+        )
+        service.engine = ScanEngine(service.checker, options.concurrency, registry=service.db)
+
+        # Per-lookup latency, measured around the whole DNS -> WHOIS check
+        latencies = []
+        check = service.engine.scheduler.check
+
+        async def timed_check(domain, attempt=0):
+            start = time.perf_counter()
+            try:
+                return await check(domain, attempt)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        service.engine.scheduler.check = timed_check
+
+        # Time spent in database writes during the scan
+        writes = {'seconds': 0.0, 'count': 0}
+
+        def timed_write(method):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    writes['seconds'] += time.perf_counter() - start
+                    writes['count'] += 1
+            return wrapper
+
+        for name in ('apply_scan_results', 'add_domain', 'set_next_check', 'queue_notifications', 'add_scan_record',
+                     'start_scan', 'claim_scan_work', 'checkpoint_scan', 'finish_scan', 'acquire_lease'):
+            setattr(service.db, name, timed_write(getattr(service.db, name)))
+
+        service.db.add_keywords_bulk([f'benchkw{i}' for i in range(keyword_count)])
+
+        start = time.perf_counter()
+        service.run_scan()
+        elapsed = time.perf_counter() - start
+        # Alerts are emailed in the background, outside the scan's time
+        service.sender.close()
+
+        scan = service.db.get_scan_history(1)[0]
+        results.put({
+            'keywords': keyword_count,
+            'domains_checked': scan['lookups'],
+            'domains_available': scan['domains_found'],
+            'elapsed_sec': round(elapsed, 3),
+            'domains_per_sec': round(scan['lookups'] / elapsed, 1) if elapsed else 0.0,
+            'lookup_latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+                'max': round(max(latencies, default=0) * 1000, 2),
+            },
+            'lookup_attempts': len(latencies),
+            'db_write_sec': round(writes['seconds'], 3),
+            'db_writes': writes['count'],
+            'emails_sent': len(FakeSMTP.sent),
+            # ru_maxrss is in kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+    except Exception as e:
+        results.put({'keywords': keyword_count, 'error': repr(e)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of regressions against a previous report"""
+    previous = {run['keywords']: run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in report['runs']:
+        old = previous.get(run['keywords'])
+        if not old or 'error' in run or 'error' in old:
+            continue
+        if run['domains_per_sec'] < old['domains_per_sec'] * (1 - tolerance):
+            regressions.append(f"{run['keywords']} keywords: {old['domains_per_sec']} -> "
+                               f"{run['domains_per_sec']} domains/sec")
+        if run['lookup_latency_ms']['p99'] > old['lookup_latency_ms']['p99'] * (1 + tolerance):
+            regressions.append(f"{run['keywords']} keywords: p99 {old['lookup_latency_ms']['p99']} -> "
+                               f"{run['lookup_latency_ms']['p99']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end scan benchmark with simulated network latency')
+    parser.add_argument('--sizes', default='100,1000', help='Comma-separated keyword counts (e.g. 100,1000,10000,100000)')
+    parser.add_argument('--storage', choices=['sqlite', 'memory'], default='sqlite', help='Storage engine')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--dns-latency', type=float, default=0.01, help='Seconds per DNS lookup')
+    parser.add_argument('--whois-latency', type=float, default=0.05, help='Seconds per WHOIS lookup')
+    parser.add_argument('--smtp-latency', type=float, default=0.01, help='Seconds per SMTP command')
+    parser.add_argument('--distribution', choices=['uniform', 'lognormal'], default='lognormal')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Latency spread (see fake_backends.sample_latency)')
+    parser.add_argument('--taken-ratio', type=float, default=0.7)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of WHOIS lookups that time out')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of WHOIS lookups refused for rate limits')
+    parser.add_argument('--whois-rate', type=float, default=1000.0, help='Per-registry queries/sec allowed')
+    parser.add_argument('--backoff', type=float, default=0.05, help='Base retry backoff in seconds')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Previous JSON report; exit 1 if this run regressed')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression vs baseline (0.2 = 20%%)')
+    options = parser.parse_args()
+
+    # spawn: every size starts from a clean interpreter and its own RSS
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for size in [int(size) for size in options.sizes.split(',') if size.strip()]:
+        results = context.Queue()
+        process = context.Process(target=run_size, args=(size, options, results))
+        process.start()
+        runs.append(results.get())
+        process.join()
+        print(f"{size} keywords done", file=sys.stderr)
+
+    report = {
+        'settings': {key: value for key, value in vars(options).items() if key not in ('output', 'baseline')},
+        'runs': runs,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = compare(report, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark building and querying the offline zone index.
+Generates a synthetic gzip zone file, builds the index with a small sort
+chunk to exercise the external merge, then times membership tests.
+
+Usage: python scripts/benchmark_zone_index.py [--names N] [--chunk-size N]
+"""
+import sys
+import os
+import argparse
+import gzip
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from zone_index import build_zone_index, ZoneIndex
+
+
+def write_zone(path, count):
+    """Write a zone file with two NS records per name, in shuffled blocks"""
+    names = [f'name{i:09d}x' for i in range(count)]
+    random.shuffle(names)
+    with gzip.open(path, 'wt', compresslevel=1) as f:
+        f.write('$ORIGIN com.\n$TTL 172800\n; synthetic zone\n')
+        for name in names:
+            f.write(f'{name} NS ns1.example.net.\n')
+            f.write(f'{name}.com. 172800 IN NS ns2.example.net.\n')
+    return names
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def time_lookups(index, labels):
+    timings = []
+    for label in labels:
+        start = time.perf_counter()
+        label in index
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark building and querying the zone index')
+    parser.add_argument('--names', type=int, default=1000000, help='Names in the synthetic zone file')
+    parser.add_argument('--chunk-size', type=int, help='Names per sorted chunk (default: a tenth of --names)')
+    options = parser.parse_args()
+    count = options.names
+    chunk_size = options.chunk_size or max(1000, count // 10)
+
+    import logging
+    logging.disable(logging.INFO)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        zone_path = os.path.join(workdir, 'com.zone.gz')
+        names = write_zone(zone_path, count)
+
+        print("=" * 60)
+        print(f"Zone index benchmark: {count} names, sort chunk {chunk_size}")
+        print("=" * 60)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        indexed = build_zone_index(zone_path, 'com', workdir, chunk_size=chunk_size)
+        build_time = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"Build: {indexed} labels in {build_time:.1f}s ({indexed / build_time:,.0f} names/sec)")
+        print(f"Peak RSS growth during build: {(rss_after - rss_before) / 1024:.1f} MB")
+
+        index = ZoneIndex(os.path.join(workdir, 'com.labels'), os.path.join(workdir, 'com.bloom'))
+        members = random.sample(names, min(20000, count))
+        non_members = [f'missing{i}' for i in range(20000)]
+
+        hits = time_lookups(index, members)
+        misses = time_lookups(index, non_members)
+        false_positives = sum(1 for label in non_members if label.encode() in index.bloom)
+
+        print(f"Member lookups:     p50 {percentile(hits, 50):.1f}us  p99 {percentile(hits, 99):.1f}us")
+        print(f"Non-member lookups: p50 {percentile(misses, 50):.1f}us  p99 {percentile(misses, 99):.1f}us")
+        print(f"Bloom false-positive rate: {false_positives / len(non_members):.3%}")
+
+        if all(label in index for label in members[:1000]) and not any(label in index for label in non_members):
+            print("✅ PASS: Index answers match the zone file")
+        else:
+            print("❌ FAIL: Index answers do not match the zone file")
+        index.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
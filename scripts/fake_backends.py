@@ -0,0 +1,123 @@
+"""
+Fake lookup backends for benchmarks and verification scripts.
+They add configurable latency instead of touching real DNS/WHOIS/SMTP servers.
+"""
+import sys
+import os
+import time
+import asyncio
+import random
+import zlib
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from domain_checker import DomainChecker
+from whois_client import WhoisError, WhoisRateLimited
+
+
+def is_fake_taken(domain, taken_ratio):
+    """Deterministically decide whether a fake domain is registered"""
+    return (zlib.crc32(domain.encode()) % 1000) < taken_ratio * 1000
+
+
+def sample_latency(latency, jitter, distribution='uniform'):
+    """
+    Simulated round trip in seconds.
+    uniform: latency +/- jitter; lognormal: median latency with a long tail
+    whose spread is jitter (closer to real registries).
+    """
+    if distribution == 'lognormal':
+        return latency * random.lognormvariate(0, jitter)
+    return latency * random.uniform(1 - jitter, 1 + jitter)
+
+
+class FakeResolver:
+    """Async resolver stand-in that answers after a simulated round trip"""
+
+    def __init__(self, latency, taken_ratio, jitter, distribution='uniform'):
+        self.latency = latency
+        self.taken_ratio = taken_ratio
+        self.jitter = jitter
+        self.distribution = distribution
+
+    async def domain_exists(self, domain):
+        await asyncio.sleep(sample_latency(self.latency, self.jitter, self.distribution))
+        # Most taken domains are delegated; the rest need WHOIS to confirm
+        return True if is_fake_taken(domain, self.taken_ratio * 0.8) else None
+
+    def close(self):
+        pass
+
+
+class FakeChecker(DomainChecker):
+    """
+    DomainChecker whose DNS and WHOIS lookups only sleep.
+    failure_rate and throttle_rate make that share of WHOIS lookups fail
+    like a timeout or a registry rate-limit refusal.
+    """
+
+    def __init__(self, dns_latency=0.02, whois_latency=0.2, taken_ratio=0.7, jitter=0.5,
+                 distribution='uniform', failure_rate=0.0, throttle_rate=0.0):
+        super().__init__()
+        self.dns_latency = dns_latency
+        self.whois_latency = whois_latency
+        self.taken_ratio = taken_ratio
+        self.jitter = jitter
+        self.distribution = distribution
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.resolver = FakeResolver(dns_latency, taken_ratio, jitter, distribution)
+
+    def _sleep(self, latency):
+        time.sleep(sample_latency(latency, self.jitter, self.distribution))
+
+    def dns_resolves(self, domain):
+        self._sleep(self.dns_latency)
+        # Most taken domains resolve; the rest need WHOIS to confirm
+        return is_fake_taken(domain, self.taken_ratio * 0.8)
+
+    def whois_record(self, domain):
+        self._sleep(self.whois_latency)
+        roll = random.random()
+        if roll < self.throttle_rate:
+            raise WhoisRateLimited(f"simulated rate limit for {domain}")
+        if roll < self.throttle_rate + self.failure_rate:
+            raise WhoisError(f"simulated timeout for {domain}")
+        return {
+            'registered': is_fake_taken(domain, self.taken_ratio),
+            'expiration_date': None,
+            'statuses': []
+        }
+
+
+class FakeSMTP:
+    """smtplib.SMTP stand-in that records messages instead of sending them"""
+    sent = []
+    latency = 0.0
+
+    def __init__(self, host=None, port=None, *args, **kwargs):
+        self.host = host
+        self.port = port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self, *args, **kwargs):
+        time.sleep(self.latency)
+
+    def login(self, username, password):
+        time.sleep(self.latency)
+
+    def send_message(self, msg, *args, **kwargs):
+        time.sleep(self.latency)
+        FakeSMTP.sent.append(msg)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,118 @@
+"""
+Verify the async DNS resolver against a local stub DNS server.
+The stub answers out of order, truncates some UDP replies (forcing the
+TCP fallback) and drops others (forcing retries). Registered names only
+have NS records, which the synchronous DomainChecker path must see too.
+"""
+import sys
+import os
+import asyncio
+import random
+import socket
+import struct
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import domain_checker
+from dns_resolver import AsyncDnsResolver, parse_response, QTYPE_NS
+
+REGISTERED = {f'taken{i}.com' for i in range(0, 2000, 2)}
+TRUNCATED = {'bigzone.com'}
+
+
+def build_reply(query, truncate=False):
+    """Answer a stub query: NOERROR for known names, NXDOMAIN otherwise"""
+    question = parse_response(query)
+    name = question['name']
+    exists = name in REGISTERED or name in TRUNCATED
+    flags = 0x8180 | (0 if exists else 3)
+    if truncate:
+        flags |= 0x0200
+    header = struct.pack('!HHHHHH', question['id'], flags, 1, 1 if exists else 0, 0, 0)
+    reply = header + query[12:]
+    if exists:
+        # One NS record pointing back at the question name
+        rdata = b'\x02ns\xc0\x0c'
+        reply += b'\xc0\x0c' + struct.pack('!HHIH', QTYPE_NS, 1, 300, len(rdata)) + rdata
+    return reply
+
+
+class StubUdp(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+        self.received = 0
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        # Drop a few queries so the client has to retry
+        if random.random() < 0.02:
+            return
+        name = parse_response(data)['name']
+        reply = build_reply(data, truncate=name in TRUNCATED)
+        # Random delay so replies arrive out of order
+        asyncio.get_running_loop().call_later(random.uniform(0, 0.05), self.transport.sendto, reply, addr)
+
+
+async def handle_tcp(reader, writer):
+    length = struct.unpack('!H', await reader.readexactly(2))[0]
+    query = await reader.readexactly(length)
+    reply = build_reply(query)
+    writer.write(struct.pack('!H', len(reply)) + reply)
+    await writer.drain()
+    writer.close()
+
+
+async def run_checks():
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(('127.0.0.1', 0))
+    udp, stub = await loop.create_datagram_endpoint(StubUdp, sock=sock)
+    port = udp.get_extra_info('sockname')[1]
+    tcp = await asyncio.start_server(handle_tcp, '127.0.0.1', port)
+
+    resolver = AsyncDnsResolver(upstream='127.0.0.1', port=port, timeout=0.5, retries=3)
+    names = [f'taken{i}.com' for i in range(2000)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(resolver.domain_exists(name) for name in names))
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    for name, exists in zip(names, results):
+        if exists != (name in REGISTERED):
+            failures += 1
+            print(f"❌ FAIL: {name} -> {exists}")
+
+    print(f"{len(names)} concurrent lookups in {elapsed:.2f}s ({stub.received} UDP packets received)")
+    if failures == 0:
+        print("✅ PASS: Every reply matched to its query")
+
+    if await resolver.domain_exists('bigzone.com') is True:
+        print("✅ PASS: Truncated reply retried over TCP")
+    else:
+        print("❌ FAIL: TCP fallback")
+
+    # The blocking check (CLI, check_keyword_domains) runs its own loop, so call it from a thread
+    domain_checker.get_resolver = lambda: AsyncDnsResolver(upstream='127.0.0.1', port=port, timeout=0.5, retries=3)
+    checker = domain_checker.DomainChecker()
+    verdicts = [await loop.run_in_executor(None, checker.dns_resolves, name) for name in ('taken2.com', 'taken3.com')]
+    if verdicts == [True, False]:
+        print("✅ PASS: Synchronous check sees a domain with NS but no A record as taken")
+    else:
+        print(f"❌ FAIL: Synchronous check returned {verdicts}")
+
+    resolver.close()
+    udp.close()
+    tcp.close()
+    await tcp.wait_closed()
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("TESTING ASYNC DNS RESOLVER")
+    print("=" * 60)
+    asyncio.run(run_checks())
+    print("=" * 60)
@@ -0,0 +1,189 @@
+"""
+Dashboard push check.
+Subscribes to the EventStream of the API against a temporary database and
+writes from another thread, as the monitor does from its own connection.
+Checks that an idle stream only asks for the data version, that new,
+regained and lost domains, counters, scans and jobs are pushed within a
+check interval, and that the watcher stops once no client is connected.
+
+Usage: python scripts/verify_event_stream.py
+"""
+import sys
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+INTERVAL = 0.2
+
+
+class Recorder:
+    """Storage wrapper that counts the calls made through it"""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        method = getattr(self._db, name)
+
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            return method(*args, **kwargs)
+        return call
+
+
+def elsewhere(work):
+    """Run work on another thread, which has its own database connection"""
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+
+
+def fresh_second():
+    # Transitions are kept per second; a flip needs a second of its own
+    time.sleep(1 - time.time() % 1)
+
+
+def receive(client, timeout=INTERVAL * 10):
+    """Events delivered to a client until it has been quiet for two intervals"""
+    events = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            events.append(client.get(timeout=INTERVAL * 2))
+        except queue.Empty:
+            if events:
+                break
+    return events
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='domain-stream-')
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'stream.db'),
+        'STORAGE_ENGINE': 'sqlite',
+        'STREAM_CHECK_INTERVAL': str(INTERVAL),
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    import api
+    from event_stream import EventStream
+    from scan_manager import ScanJob
+
+    logging.disable(logging.WARNING)
+    db = api.db
+    passed = True
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    try:
+        print("=" * 60)
+        print("DASHBOARD PUSH CHECK")
+        print("=" * 60)
+        keyword_id = db.add_keyword('streamkw')
+        now = datetime.now()
+
+        def scan(results):
+            rows = [(keyword_id, domain, available, now + timedelta(days=1), None, None)
+                    for domain, available in results.items()]
+            elsewhere(lambda: db.apply_scan_results(rows))
+
+        jobs = []
+        recorder = Recorder(db)
+        stream = EventStream(recorder, jobs=lambda: list(jobs))
+
+        print("\n--- Idle ---")
+        client = stream.subscribe()
+        time.sleep(INTERVAL * 3)
+        recorder.calls.clear()
+        time.sleep(INTERVAL * 10)
+        reads = {name: count for name, count in recorder.calls.items() if name != 'get_data_version'}
+        print(f"{recorder.calls['get_data_version']} version check(s), other reads: {reads or 'none'}")
+        check(recorder.calls['get_data_version'] >= 5 and not reads, "An idle stream reads no tables")
+        receive(client)
+
+        print("\n--- Domain changes ---")
+        fresh_second()
+        scan({'streamone.com': 1, 'streamtwo.com': 1, 'streamthree.com': 1, 'streamtaken.com': 0})
+        events = receive(client)
+        domains = {data['domain']: data['change'] for event, data in events if event == 'domain'}
+        status = [data for event, data in events if event == 'status']
+        print(f"Pushed: {[event for event, _ in events]}")
+        check(domains == {'streamone.com': 'new', 'streamtwo.com': 'new', 'streamthree.com': 'new'},
+              "New available domains are pushed; taken ones are not")
+        check(status and status[-1]['domains_found'] == 3 and status[-1]['domains_checked'] == 4,
+              "Counters are pushed")
+
+        fresh_second()
+        scan({'streamone.com': 0, 'streamtwo.com': 1})
+        events = receive(client)
+        changes = [(data['domain'], data['change']) for event, data in events if event == 'domain']
+        check(changes == [('streamone.com', 'lost')], "A lost domain is pushed once")
+
+        fresh_second()
+        scan({'streamone.com': 1})
+        events = receive(client)
+        changes = [(data['domain'], data['change']) for event, data in events if event == 'domain']
+        check(changes == [('streamone.com', 'regained')], "A regained domain is pushed once")
+
+        print("\n--- Scans and jobs ---")
+        elsewhere(lambda: db.add_scan_record(1, 3, 'Success'))
+        events = receive(client)
+        scans = [data for event, data in events if event == 'scan']
+        check(scans and scans[-1]['status'] == 'Success' and scans[-1]['domains_found'] == 3,
+              "A recorded scan is pushed")
+        job = ScanJob()
+        jobs.append(job)
+        job.status = 'running'
+        job.expect(10)
+        job.advance(4)
+        events = receive(client)
+        pushed = [data for event, data in events if event == 'job']
+        check(pushed and pushed[-1]['id'] == job.id and pushed[-1]['checked'] == 4, "Job progress is pushed")
+
+        print("\n--- Clients ---")
+        full = stream.subscribe()
+        for i in range(1100):
+            stream.publish('status', {'n': i})
+        backlog = receive(full)
+        kept = [event for event, _ in backlog]
+        # The backlog and the event that overflowed it become one reset; later events still arrive
+        check(kept.count('reset') == 1 and kept.index('reset') == 0 and len(kept) == 100,
+              "A client that falls behind is told to reload")
+        stream.unsubscribe(full)
+        stream.unsubscribe(client)
+        time.sleep(INTERVAL * 3)
+        recorder.calls.clear()
+        time.sleep(INTERVAL * 5)
+        check(not recorder.calls and stream._thread is None, "The watcher stops once no client is connected")
+
+        print("\n--- HTTP ---")
+        response = api.app.test_client().get('/api/stream')
+        chunks = response.response
+        first = [next(chunks) for _ in range(3)]
+        first = [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in first]
+        response.close()
+        print(f"First messages: {[chunk.split(chr(10))[0] for chunk in first]}")
+        check(response.mimetype == 'text/event-stream' and first[0].startswith('retry:')
+              and first[1].startswith('event: status') and first[2].startswith('event: scan'),
+              "/api/stream sends the current status and latest scan on connect")
+
+        print("\n" + ("✅ PASS: Dashboards are updated by push, and idle streams cost no queries" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
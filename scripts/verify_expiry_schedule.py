@@ -0,0 +1,119 @@
+"""
+Expiry scheduling check.
+Scans keywords against a temporary SQLite file with fake lookups whose WHOIS
+records carry expiry dates. Checks that domains DNS shows as taken are
+scheduled from their expiry (not the flat CACHE_TTL_TAKEN), that a rescan
+reuses the stored expiry instead of asking WHOIS again, and that domains
+close to expiry are looked up again.
+
+Usage: python scripts/verify_expiry_schedule.py [--keywords N]
+"""
+import sys
+import os
+import argparse
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that taken domains are scheduled from their expiry')
+    parser.add_argument('--keywords', type=int, default=20)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-expiry-')
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'expiry.db'),
+        'STORAGE_ENGINE': 'sqlite',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    logging.disable(logging.WARNING)
+    from config import Config
+    from fake_backends import FakeChecker, is_fake_taken
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    class ExpiryChecker(FakeChecker):
+        """Every domain is registered; 'near' keywords expire within the lead window"""
+
+        def __init__(self):
+            super().__init__(dns_latency=0.001, whois_latency=0.002, taken_ratio=1.0, jitter=0.2)
+            self.lookups = Counter()
+
+        def whois_record(self, domain):
+            self.lookups[domain] += 1
+            record = super().whois_record(domain)
+            days = 10 if domain.startswith('near') else 300
+            record['expiration_date'] = datetime.now() + timedelta(days=days)
+            return record
+
+    passed = True
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    try:
+        print("=" * 60)
+        print("EXPIRY SCHEDULING CHECK")
+        print("=" * 60)
+        service = MonitorService(workers=1, storage='sqlite')
+        service.checker = ExpiryChecker()
+        service.engine = ScanEngine(service.checker, 20, registry=service.db)
+        service.db.add_keywords_bulk([f'farkw{i}' for i in range(options.keywords)] +
+                                     [f'nearkw{i}' for i in range(options.keywords)])
+        conn = service.db.get_connection()
+
+        def schedule():
+            rows = conn.execute('SELECT domain, next_check FROM domains').fetchall()
+            return {row['domain']: datetime.fromisoformat(str(row['next_check'])).timestamp() - time.time()
+                    for row in rows}
+
+        # The fake resolver answers for this share of registered domains
+        dns_taken = lambda domain: is_fake_taken(domain, 0.8)
+
+        print("\n--- First scan ---")
+        service.run_scan()
+        intervals = schedule()
+        far = [domain for domain in intervals if domain.startswith('far') and dns_taken(domain)]
+        near = [domain for domain in intervals if domain.startswith('near') and dns_taken(domain)]
+        print(f"{len(far)} far and {len(near)} near domain(s) resolve in DNS")
+        check(far and all(service.checker.lookups[domain] == 1 for domain in far + near),
+              "WHOIS was asked once for the expiry of each DNS-taken domain")
+        expected = min(300 * 86400 - Config.SCHEDULE_LEAD_DAYS * 86400, Config.SCHEDULE_MAX_INTERVAL)
+        shortest = min(intervals[domain] for domain in far)
+        check(shortest > expected - 60 and shortest > 7 * 86400,
+              f"DNS-taken domains far from expiry are scheduled {shortest / 86400:.1f} days ahead, not one")
+        check(all(abs(intervals[domain] - Config.SCHEDULE_NEAR_INTERVAL) < 60 for domain in near),
+              "DNS-taken domains near expiry are checked every SCHEDULE_NEAR_INTERVAL")
+
+        print("\n--- Everything due again ---")
+        conn.execute('UPDATE domains SET next_check = ?', (datetime.now() - timedelta(minutes=1),))
+        conn.commit()
+        service.checker.lookups.clear()
+        service.run_due_scan()
+        intervals = schedule()
+        check(not any(service.checker.lookups[domain] for domain in far),
+              "The rescan scheduled far DNS-taken domains from the stored expiry, without WHOIS")
+        check(all(service.checker.lookups[domain] == 1 for domain in near),
+              "Domains within the lead window were looked up again")
+        shortest = min(intervals[domain] for domain in far)
+        check(shortest > expected - 60,
+              f"Far domains are still scheduled {shortest / 86400:.1f} days ahead")
+
+        print("\n" + ("✅ PASS: Taken domains are scheduled from their expiry" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
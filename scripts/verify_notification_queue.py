@@ -0,0 +1,295 @@
+"""
+Notification queue check.
+Runs scans against a temporary database with fake lookups, and sends their
+alerts over real SMTP to a local sink server. Checks that a slow mail
+server no longer holds up the scan, that alerts are merged into digests
+over one logged-in session, that failed emails are retried with backoff
+and domains are only marked notified once delivered, and that alerts
+queued by a monitor that could not send them are delivered later.
+
+Usage: python scripts/verify_notification_queue.py
+"""
+import sys
+import os
+import multiprocessing
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from email import message_from_string
+from email.header import decode_header, make_header
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that keeps the messages it receives"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SinkHandler)
+        self.port = self.server_address[1]
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.latency = 0.0   # seconds before a message is accepted
+        self.fail_next = 0   # messages to turn away with a temporary error
+        self.clients = set()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def drop_clients(self):
+        """Close every open session, as a server does with idle ones"""
+        for client in list(self.clients):
+            client.shutdown(socket.SHUT_RDWR)
+
+    def subjects(self):
+        return [str(make_header(decode_header(msg['Subject']))) for msg in self.messages]
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server
+        sink.connections += 1
+        sink.clients.add(self.connection)
+        try:
+            self.reply('220 sink ESMTP')
+            data = None
+            for raw in self.rfile:
+                line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                if data is not None:
+                    if line != '.':
+                        data.append(line[1:] if line.startswith('..') else line)
+                        continue
+                    time.sleep(sink.latency)
+                    if sink.fail_next > 0:
+                        sink.fail_next -= 1
+                        self.reply('451 4.3.0 Try again later')
+                    else:
+                        sink.messages.append(message_from_string('\n'.join(data)))
+                        self.reply('250 OK')
+                    data = None
+                    continue
+                verb = line.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    self.reply('250-sink')
+                    self.reply('250 AUTH PLAIN')
+                elif verb == 'AUTH':
+                    sink.logins += 1
+                    self.reply('235 Authenticated')
+                elif verb == 'DATA':
+                    data = []
+                    self.reply('354 End data with <CR><LF>.<CR><LF>')
+                elif verb == 'QUIT':
+                    self.reply('221 Bye')
+                    break
+                elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                    self.reply('250 OK')
+                else:
+                    self.reply('502 Command not implemented')
+        except OSError:
+            pass
+        finally:
+            sink.clients.discard(self.connection)
+
+
+def environment(db_path, port):
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'STORAGE_ENGINE': 'sqlite',
+        'DB_WRITE_BATCH': '50',
+        # Fake registries answer instantly; keep the scans short next to the mail timings
+        'WHOIS_RATE': '50',
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(port),
+        'SMTP_SECURITY': 'none',
+        'SMTP_USERNAME': 'sink',
+        'SMTP_PASSWORD': 'sink',
+        'SMTP_FROM': 'monitor@localhost',
+        'SMTP_TO': 'alerts@localhost',
+        'NOTIFY_DIGEST_DELAY': '0.2',
+        'NOTIFY_POLL_INTERVAL': '0.2',
+        'NOTIFY_BASE_BACKOFF': '0.5',
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def monitor(keywords):
+    """A MonitorService with fake lookups, after adding keywords"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    from fake_backends import FakeChecker
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    logging.disable(logging.WARNING)
+    service = MonitorService()
+    service.checker = FakeChecker(dns_latency=0.002, whois_latency=0.005, jitter=0.2)
+    service.engine = ScanEngine(service.checker, 20, registry=service.db)
+    service.db.add_keywords_bulk(keywords)
+    return service
+
+
+def scan_without_mail(db_path, port, keywords):
+    """Child process: a monitor whose mail server is down"""
+    environment(db_path, port)
+    service = monitor(keywords)
+    service.run_scan()
+    service.sender.close()
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='domain-notify-')
+    sink = SMTPSink()
+    db_path = os.path.join(workdir, 'notify.db')
+    environment(db_path, sink.port)
+
+    from config import Config
+    from email_notifier import connect
+    import smtplib
+
+    passed = True
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    def wait_for(condition, timeout=15):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.05)
+        return condition()
+
+    try:
+        print("=" * 60)
+        print("NOTIFICATION QUEUE CHECK")
+        print("=" * 60)
+        service = monitor([f'notifykw{i}' for i in range(20)])
+        db, sender = service.db, service.sender
+
+        def queued():
+            return db.get_due_notifications(time.time() + 86400, 100000)
+
+        print("\n--- Slow mail server ---")
+        sink.latency = 5.0
+        started = time.time()
+        service.run_scan()
+        elapsed = time.time() - started
+        pending = len(queued())
+        print(f"Scan took {elapsed:.2f}s with a {sink.latency:.0f}s mail server; {pending} alert(s) queued")
+        check(elapsed < sink.latency and pending > 0 and not sink.messages, "The scan does not wait for the email")
+        wait_for(lambda: sink.messages and not queued())
+        unnotified = db.get_unnotified_domains()
+        print(f"Delivered: {sink.subjects()}")
+        check(len(sink.messages) == 1 and 'New Domain' in sink.subjects()[0] and not unnotified,
+              "The background sender delivered one digest and marked the domains notified")
+        sender.close()
+        sink.latency = 0.0
+
+        print("\n--- Session reuse ---")
+        sink.messages.clear()
+        connections, logins = sink.connections, sink.logins
+        Config.NOTIFY_DIGEST_MAX = 10
+        db.queue_notifications('lost', [(f'reuse{i}.com', 'reuse') for i in range(35)])
+        delivered = sender.send_pending()
+        db.queue_notifications('lost', [('reuse-again.com', 'reuse')])
+        delivered += sender.send_pending()
+        print(f"{delivered} alert(s) in {len(sink.messages)} email(s) over {sink.connections - connections} "
+              f"connection(s), {sink.logins - logins} login(s)")
+        check(delivered == 36 and len(sink.messages) == 5 and sink.connections - connections == 1
+              and sink.logins - logins == 1, "Digests share one logged-in SMTP session")
+        sink.drop_clients()
+        db.queue_notifications('lost', [('dropped.com', 'reuse')])
+        check(sender.send_pending() == 1 and sink.connections - connections == 2,
+              "A session the server dropped is replaced without failing the email")
+        Config.SMTP_IDLE_TIMEOUT = 0.2
+        time.sleep(0.3)
+        db.queue_notifications('lost', [('idle.com', 'reuse')])
+        check(sender.send_pending() == 1 and sink.connections - connections == 3,
+              "A session idle for SMTP_IDLE_TIMEOUT is not reused")
+        Config.SMTP_IDLE_TIMEOUT = 60.0
+        Config.NOTIFY_DIGEST_MAX = 1000
+
+        print("\n--- Digests ---")
+        sink.messages.clear()
+        keyword_id = db.add_keyword('digestkw')
+        db.apply_scan_results([(keyword_id, domain, 1, None, None, None)
+                               for domain in ('digest-a.com', 'digest-b.com')])
+        db.queue_notifications('new', [('digest-a.com', 'digestkw'), ('digest-b.com', 'digestkw')])
+        db.queue_notifications('lost', [('digest-c.com', 'digestkw'), ('digest-a.com', 'digestkw')])
+        sender.send_pending()
+        body = sink.messages[0].get_payload()[0].get_payload(decode=True).decode() if sink.messages else ''
+        print(f"Delivered: {sink.subjects()}")
+        check(sink.subjects() == ['🔔 Domain Alert: 1 New Domain(s) Found, 2 Taken'] and body.count('digest-a.com') == 1,
+              "New and lost alerts share one email; a domain is reported as it is now")
+
+        print("\n--- Failures ---")
+        sink.messages.clear()
+        db.apply_scan_results([(keyword_id, f'retry{i}.com', 1, None, None, None) for i in range(3)])
+        sink.fail_next = 2
+        service.send_notifications()
+        # Stops the thread it woke; the first attempt is made here
+        sender.close()
+        rows = queued()
+        print(f"First attempt: {rows[0]['last_error'] if rows else None}")
+        check(not sink.messages and len(rows) == 3 and all(row['attempts'] == 1 for row in rows)
+              and len(db.get_unnotified_domains()) == 3, "A failed email stays queued; domains stay unnotified")
+        check(sender.send_pending() == 0 and not sink.messages, "It is not retried before its backoff")
+        time.sleep(Config.NOTIFY_BASE_BACKOFF + 0.1)
+        sender.send_pending()
+        rows = queued()
+        wait = rows[0]['next_attempt'] - time.time() if rows else 0
+        check(len(rows) == 3 and rows[0]['attempts'] == 2 and 0.8 < wait <= 1.0, f"Backoff doubled ({wait:.2f}s)")
+        time.sleep(wait + 0.1)
+        delivered = sender.send_pending()
+        check(delivered == 3 and not queued() and not db.get_unnotified_domains() and len(sink.messages) == 1,
+              "The retry delivered them and marked them notified")
+
+        print("\n--- Mail server down ---")
+        sink.messages.clear()
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        down_port = closed.getsockname()[1]
+        closed.close()
+        child = multiprocessing.get_context('spawn').Process(
+            target=scan_without_mail, args=(db_path, down_port, [f'downkw{i}' for i in range(10)]))
+        child.start()
+        child.join(120)
+        rows = queued()
+        print(f"Monitor exited with {len(rows)} alert(s) queued: {rows[0]['last_error'] if rows else None}")
+        check(child.exitcode == 0 and rows and all(row['attempts'] == 1 for row in rows)
+              and len(db.get_unnotified_domains()) == len(rows), "Alerts outlive a monitor that could not send them")
+        time.sleep(Config.NOTIFY_BASE_BACKOFF + 0.1)
+        check(sender.send_pending() == len(rows) and not queued() and not db.get_unnotified_domains(),
+              "Another sender delivered them later")
+
+        print("\n--- Connection security ---")
+        config = Config.get_email_config()
+        try:
+            connect({**config, 'smtp_security': 'starttls'})
+            refused = False
+        except smtplib.SMTPNotSupportedError:
+            refused = True
+        try:
+            connect({**config, 'smtp_security': 'tls1'})
+            rejected = False
+        except ValueError:
+            rejected = True
+        check(refused and rejected, "STARTTLS is required when configured, and unknown modes are rejected")
+        sender.close()
+
+        print("\n" + ("✅ PASS: Alerts are queued, batched and retried until delivered" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        sink.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
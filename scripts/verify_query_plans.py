@@ -0,0 +1,229 @@
+"""
+Query plan regression check for database.py.
+Fills a temporary database (1M domains by default), calls every public
+Database method while tracing the SQL it runs, and checks each statement
+with EXPLAIN QUERY PLAN. Fails if a statement scans a whole table or sorts
+with a temporary B-tree, and reports how long each method takes.
+
+Usage: python scripts/verify_query_plans.py [--rows N] [--repeat N]
+"""
+import sys
+import os
+import argparse
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+# Plans look like "SCAN d" (or "SCAN TABLE domains AS d" on older SQLite)
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+TABLE_ALIAS_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+SQL_WORDS = {'where', 'on', 'set', 'left', 'inner', 'join', 'order', 'group', 'limit', 'values', 'select', 'as'}
+SKIP_RE = re.compile(r'^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|CREATE|DROP|ANALYZE|SAVEPOINT|RELEASE)\b', re.I)
+
+# Scans that are the point of the statement, per method
+ALLOWED_SCANS = {
+    'add_domain': {'scan_results'},  # the batch staging table
+    'apply_scan_results': {'scan_results'},
+    'clear_all_data': {'domains', 'keywords', 'scan_history', 'scan_work', 'sqlite_sequence'},
+    'get_scan_history': {'scan_history'},  # backwards by rowid, stops at LIMIT
+}
+
+
+def populate(db, rows):
+    """Insert `rows` domains spread over rows / 20 keywords"""
+    rng = random.Random(7)
+    keyword_count = max(1, rows // 20)
+    now = datetime.now()
+    conn = db.get_connection()
+    conn.executemany('INSERT INTO keywords (keyword, active) VALUES (?, ?)',
+                     ((f'keyword{i}', 0 if i % 50 == 0 else 1) for i in range(keyword_count)))
+    conn.executemany('''
+        INSERT INTO domains (keyword_id, domain, available, checked_date, notified, next_check)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        (i % keyword_count + 1, f'domain{i}.com',
+         1 if rng.random() < 0.3 else 0,
+         now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+         0 if rng.random() < 0.001 else 1,
+         now + timedelta(seconds=rng.randint(-3600, 30 * 86400)))
+        for i in range(rows)
+    ))
+    # A few transitions per domain, spread over the last year
+    epoch = int(time.time())
+    conn.executemany('INSERT OR IGNORE INTO domain_events (domain_id, epoch, available) VALUES (?, ?, ?)', (
+        (i % rows + 1, epoch - rng.randint(0, 365 * 86400), rng.randint(0, 1))
+        for i in range(rows * 3)
+    ))
+    conn.execute("INSERT INTO scan_history (keywords_scanned, domains_found, status) VALUES (1, 1, 'Success')")
+    conn.commit()
+    return keyword_count
+
+
+def build_calls(db, rows, page_cursor):
+    """(method, callable) pairs covering every public Database method; destructive ones last"""
+    rng = random.Random(11)
+    sample = [f'domain{rng.randrange(rows)}.com' for _ in range(500)]
+    now = datetime.now()
+    batch = [(1, domain, rng.randint(0, 1), now + timedelta(days=1), None, None) for domain in sample[:400]]
+    batch += [(1, f'newdomain{i}.com', 1, now + timedelta(days=1), None, None) for i in range(100)]
+    # Cursors from far into each listing; a deep page must cost the same as the first
+    deep = {
+        'available': page_cursor('available', db.get_available_domains(1, keyword='keyword123')[0]),
+        'all': page_cursor('all', db.get_all_domains(1, keyword=f'keyword{rows // 40}')[0]),
+    }
+    keyword_ids = list(range(1, max(1, rows // 20) + 1))
+    scan = {}
+    return [
+        ('get_all_keywords', lambda: db.get_all_keywords()),
+        ('add_keyword', lambda: db.add_keyword(f'planprobe{rng.random()}')),
+        ('add_keywords_bulk', lambda: db.add_keywords_bulk([f'planbulk{rng.random()}' for _ in range(10)])),
+        ('insert_keywords', lambda: db.insert_keywords([f'planinsert{rng.random()}' for _ in range(10)])),
+        ('get_cached_verdicts', lambda: db.get_cached_verdicts(sample)),
+        ('get_registry_records', lambda: db.get_registry_records(sample)),
+        ('get_due_domains', lambda: db.get_due_domains(now, 0, 1000)),
+        ('claim_due_domains', lambda: db.claim_due_domains(now, 0, 1000, 60)),
+        ('get_next_check_time', lambda: db.get_next_check_time()),
+        ('get_available_domains', lambda: db.get_available_domains(100)),
+        ('get_available_domains', lambda: db.get_available_domains(100, deep['available'], tld='com')),
+        ('get_all_domains', lambda: db.get_all_domains(10000)),
+        ('get_all_domains', lambda: db.get_all_domains(100, deep['all'], status='taken')),
+        ('get_all_domains', lambda: db.get_all_domains(100, keyword='keyword7')),
+        ('get_all_domains', lambda: db.get_all_domains(100, status='taken')),
+        ('iter_export_rows', lambda: sum(1 for _ in islice(db.iter_export_rows(status='taken'), 10000))),
+        ('get_unnotified_domains', lambda: db.get_unnotified_domains()),
+        ('get_domain_history', lambda: db.get_domain_history(sample[2])),
+        ('get_events', lambda: db.get_events(int(time.time()) - 86400)),
+        ('get_events_after', lambda: db.get_events_after((int(time.time()) - 86400, 0, 0))),
+        ('get_data_version', lambda: db.get_data_version()),
+        ('compact_events', lambda: db.compact_events(int(time.time()) - 3600)),
+        ('get_stats', lambda: db.get_stats()),
+        ('get_setting', lambda: db.get_setting('smtp_server')),
+        ('get_settings', lambda: db.get_settings()),
+        ('save_setting', lambda: db.save_setting('plan_probe', 1)),
+        ('save_settings', lambda: db.save_settings({'plan_probe': 2, 'plan_probe2': 3})),
+        ('add_domain', lambda: db.add_domain(1, sample[0], 1, now)),
+        ('apply_scan_results', lambda: db.apply_scan_results(batch)),
+        ('set_next_check', lambda: db.set_next_check(sample[1], now)),
+        ('queue_notifications', lambda: db.queue_notifications('new', [(domain, 'keyword1') for domain in sample])),
+        ('get_due_notifications', lambda: db.get_due_notifications(time.time())),
+        ('defer_notifications', lambda: db.defer_notifications(list(range(1, 101)), time.time() + 60, 'plan probe')),
+        ('complete_notifications', lambda: db.complete_notifications(list(range(1, 501)))),
+        ('add_scan_record', lambda: db.add_scan_record(1, 1, 'Success')),
+        ('get_scan_history', lambda: db.get_scan_history()),
+        ('start_scan', lambda: scan.update(id=db.start_scan(keyword_ids))),
+        ('claim_scan_work', lambda: db.claim_scan_work(scan['id'], 'plan-node', 1000, 60)),
+        ('renew_scan_work', lambda: db.renew_scan_work(scan['id'], 'plan-node', keyword_ids[:1000], 60)),
+        ('release_scan_work', lambda: db.release_scan_work(scan['id'], 'plan-node', keyword_ids[500:1000])),
+        ('checkpoint_scan', lambda: db.checkpoint_scan(scan['id'], keyword_ids[:500], 10, 5, 5, 5, 1.5, 'Partial')),
+        ('get_scan_work', lambda: db.get_scan_work(scan['id'])),
+        ('get_scan', lambda: db.get_scan(scan['id'])),
+        ('join_scan', lambda: db.join_scan(60)),
+        ('acquire_lease', lambda: db.acquire_lease(f"scan:{scan['id']}", 'plan-node', 60)),
+        ('release_lease', lambda: db.release_lease(f"scan:{scan['id']}", 'plan-node')),
+        ('finish_scan', lambda: db.finish_scan(scan['id'])),
+        ('clear_all_data', lambda: db.clear_all_data()),
+    ]
+
+
+def check_plan(conn, method, sql):
+    """Return a list of problems in the statement's query plan"""
+    try:
+        plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    except Exception as e:
+        return [f'could not explain ({e})']
+    # Plans name tables by alias; map aliases back to tables
+    aliases = {}
+    for table, alias in TABLE_ALIAS_RE.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_WORDS:
+            aliases[alias.lower()] = table.lower()
+
+    problems = []
+    allowed = ALLOWED_SCANS.get(method, set())
+    for row in plan:
+        detail = row['detail']
+        scan = FULL_SCAN_RE.match(detail)
+        if scan and aliases.get(scan.group(1).lower(), scan.group(1).lower()) not in allowed:
+            problems.append(detail)
+        elif TEMP_SORT_RE.search(detail) and method not in ALLOWED_SCANS:
+            problems.append(detail)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN regression check for database.py')
+    parser.add_argument('--rows', type=int, default=1000000, help='Domains in the test database')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per read-only method')
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-plans-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'plans.db')
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import Database
+    from storage import page_cursor
+
+    try:
+        print("=" * 60)
+        print(f"QUERY PLAN CHECK ({options.rows:,} domains)")
+        print("=" * 60)
+
+        db = Database()
+        start = time.perf_counter()
+        populate(db, options.rows)
+        print(f"Populated in {time.perf_counter() - start:.1f}s\n")
+
+        calls = build_calls(db, options.rows, page_cursor)
+        public = {name for name in dir(Database) if not name.startswith('_')}
+        untested = public - {name for name, _ in calls} - {'get_connection', 'close_connection', 'init_database'}
+
+        conn = db.get_connection()
+        failures = []
+        for method, call in calls:
+            statements = []
+            conn.set_trace_callback(statements.append)
+            timings = []
+            # Writes and the clear run once; reads are repeated for a stable median
+            runs = options.repeat if method.startswith('get_') else 1
+            for _ in range(runs):
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            conn.set_trace_callback(None)
+
+            problems = []
+            for sql in dict.fromkeys(statements):
+                if SKIP_RE.match(sql):
+                    continue
+                for problem in check_plan(conn, method, sql):
+                    problems.append(f"{problem}  <-  {' '.join(sql.split())[:100]}")
+
+            status = '✅' if not problems else '❌'
+            print(f"{status} {method:<24} {statistics.median(timings):>9.2f} ms")
+            for problem in problems:
+                print(f"      {problem}")
+            if problems:
+                failures.append(method)
+
+        if untested:
+            print(f"\n❌ FAIL: No plan check for {', '.join(sorted(untested))}; add them to build_calls()")
+        elif failures:
+            print(f"\n❌ FAIL: Full scans or temp sorts in {', '.join(failures)}")
+        else:
+            print("\n✅ PASS: Every query uses an index")
+        print("=" * 60)
+        sys.exit(1 if failures or untested else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Scan manager check.
+Drives the /api/scan-now and /api/scans endpoints with Flask's test client
+against a temporary database and fake lookups. Checks that repeated
+triggers join the running job, that progress is reported, that a
+cancelled full scan is kept for resuming, and that a scan can be limited
+to some keywords.
+
+Usage: python scripts/verify_scan_manager.py [--keywords N]
+"""
+import sys
+import os
+import argparse
+import shutil
+import tempfile
+import time
+
+
+def wait_for(client, job_id, statuses, timeout=120):
+    """Poll a job until its status is one of statuses; returns the job"""
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f'/api/scans/{job_id}').get_json()['job']
+        if job['status'] in statuses or time.time() > deadline:
+            return job
+        time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check scan jobs started through the API')
+    parser.add_argument('--keywords', type=int, default=100)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-jobs-')
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'jobs.db'),
+        'STORAGE_ENGINE': 'sqlite',
+        'DB_WRITE_BATCH': '50',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    from fake_backends import FakeChecker, FakeSMTP
+    import email_notifier
+    import api
+    import scan_manager
+    from config import Config
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    logging.disable(logging.WARNING)
+    email_notifier.smtplib.SMTP = FakeSMTP
+
+    services = []
+
+    def fake_service():
+        service = MonitorService()
+        service.checker = FakeChecker(dns_latency=0.005, whois_latency=0.02, jitter=0.2)
+        service.engine = ScanEngine(service.checker, 20, registry=service.db)
+        services.append(service)
+        return service
+
+    scan_manager._manager = scan_manager.ScanManager(fake_service)
+    client = api.app.test_client()
+    db = api.db
+    passed = True
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    try:
+        print("=" * 60)
+        print("SCAN MANAGER CHECK")
+        print("=" * 60)
+        db.add_keywords_bulk([f'jobkw{i}' for i in range(options.keywords)])
+        per_keyword = len(Config.DOMAIN_EXTENSIONS)
+
+        print("\n--- Repeated triggers ---")
+        first = client.post('/api/scan-now').get_json()
+        second = client.post('/api/scan-now').get_json()
+        job_id = first['job']['id']
+        check(first['created'] and not second['created'] and second['job']['id'] == job_id,
+              "A second click joins the running scan")
+        other = client.post('/api/scans', json={'keywords': ['jobkw1']})
+        check(other.status_code == 409 and other.get_json()['job']['id'] == job_id,
+              "A scan of other keywords is refused while one runs (409)")
+
+        print("\n--- Progress ---")
+        deadline = time.time() + 30
+        job = first['job']
+        while time.time() < deadline and job['checked'] < 200:
+            time.sleep(0.1)
+            job = client.get(f'/api/scans/{job_id}').get_json()['job']
+        print(f"Job {job_id}: {job['checked']}/{job['expected']} checked, {job['rate']}/s, "
+              f"ETA {job['eta_seconds']}s")
+        check(job['status'] == 'running' and job['expected'] == options.keywords * per_keyword,
+              "Job is running and expects every candidate")
+        check(0 < job['checked'] < job['expected'] and job['remaining'] == job['expected'] - job['checked']
+              and job['rate'] > 0 and job['eta_seconds'] is not None,
+              "Checked, remaining, rate and ETA are reported")
+
+        print("\n--- Cancellation ---")
+        cancelled = client.post(f'/api/scans/{job_id}/cancel').get_json()['job']
+        check(cancelled['status'] == 'cancelling', "Cancel request is acknowledged")
+        job = wait_for(client, job_id, ('cancelled', 'finished', 'failed'))
+        scan = db.get_scan_history(1)[0]
+        print(f"Job {job_id} {job['status']} after {job['checked']} candidate(s); scan #{scan['id']} is {scan['status']}")
+        check(job['status'] == 'cancelled' and job['remaining'] == 0 and job['eta_seconds'] is None,
+              "Job ends as cancelled")
+        check(scan['status'] == 'Partial' and 0 < scan['keywords_done'] < options.keywords,
+              "Cancelled full scan is kept for resuming")
+        check(client.post('/api/scans/unknown/cancel').status_code == 404
+              and client.get('/api/scans/unknown').status_code == 404, "Unknown jobs are 404")
+
+        print("\n--- Keyword subset ---")
+        bad = client.post('/api/scans', json={'keywords': ['nosuchkeyword']})
+        check(bad.status_code == 400, "Unknown keywords are rejected (400)")
+        stored_before = db.get_stats()['domains']
+        subset = ['jobkw98', 'JOBKW99']
+        response = client.post('/api/scans', json={'keywords': subset})
+        job = wait_for(client, response.get_json()['job']['id'], ('cancelled', 'finished', 'failed'))
+        record = db.get_scan_history(1)[0]
+        print(f"Job {job['id']} {job['status']}: {job['checked']} candidate(s), "
+              f"{db.get_stats()['domains'] - stored_before} new domain(s) stored")
+        check(response.status_code == 202 and job['status'] == 'finished'
+              and job['checked'] == job['expected'] == len(subset) * per_keyword,
+              "Subset job checked only the chosen keywords")
+        check(record['status'] == 'Manual' and record['keywords_scanned'] == len(subset),
+              "Subset scan is recorded separately from the full scan")
+
+        print("\n--- Resume through the API ---")
+        response = client.post('/api/scan-now').get_json()
+        job = wait_for(client, response['job']['id'], ('cancelled', 'finished', 'failed'))
+        scan = next(row for row in db.get_scan_history(5) if row['status'] not in ('Manual',))
+        print(f"Job {job['id']} {job['status']}: {job['checked']} candidate(s); scan #{scan['id']} is {scan['status']}, "
+              f"resumed {scan['resumed']}x")
+        check(job['status'] == 'finished' and scan['status'] == 'Success' and scan['resumed'] == 1,
+              "The next full scan resumed and finished the cancelled one")
+        check(db.get_stats()['domains'] == options.keywords * per_keyword, "Every domain is stored")
+        check(len(services) == 1, "One MonitorService served every job")
+        jobs = client.get('/api/scans').get_json()['jobs']
+        check([job['id'] for job in jobs][-1] == job_id and len(jobs) == 3, "Jobs are listed newest first")
+
+        print("\n" + ("✅ PASS: Scan jobs are coalesced, tracked and cancellable" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
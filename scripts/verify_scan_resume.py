@@ -0,0 +1,234 @@
+"""
+Checkpointed scan check.
+Runs MonitorService.run_scan with fake lookups in a child process against a
+temporary database, kills it partway (SIGKILL, as a crash would), resumes
+and stops it again (SIGINT, as Ctrl+C or the app quitting would), then lets
+a third run finish. Checks that each run picks up the same scan, skips the
+keywords already done and that every domain ends up stored. Then kills one
+worker process of a sharded scan and checks that the scan fails instead of
+waiting forever, and hands its keywords back for the next run.
+
+Usage: python scripts/verify_scan_resume.py [--keywords N]
+"""
+import sys
+import os
+import argparse
+import multiprocessing
+import shutil
+import signal
+import sqlite3
+import tempfile
+import time
+
+
+def run_child(db_path, results):
+    """Child process: one run_scan with fake DNS/WHOIS"""
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'STORAGE_ENGINE': 'sqlite',
+        # Leases held by a dead run expire after a second
+        'SCAN_LEASE_SECONDS': '1',
+        'DB_WRITE_BATCH': '50',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import logging
+    from fake_backends import FakeChecker, FakeSMTP
+    import email_notifier
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    logging.disable(logging.WARNING)
+    email_notifier.smtplib.SMTP = FakeSMTP
+
+    service = MonitorService()
+    service.checker = FakeChecker(dns_latency=0.005, whois_latency=0.02, jitter=0.2)
+    service.engine = ScanEngine(service.checker, 20, registry=service.db)
+    service.run_scan()
+    results.put(service.engine.generator.generated)
+
+
+def run_sharded_child(db_path, results):
+    """Child process: a run_scan over two shards, one of which is killed partway"""
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'STORAGE_ENGINE': 'sqlite',
+        'SCAN_LEASE_SECONDS': '60',
+        'DB_WRITE_BATCH': '50',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import logging
+    import threading
+    import multiprocessing
+    from fake_backends import FakeChecker, FakeSMTP
+    import email_notifier
+    from monitor_service import MonitorService
+    from sharded_scan import ShardedScanEngine
+
+    logging.disable(logging.CRITICAL)
+    email_notifier.smtplib.SMTP = FakeSMTP
+
+    service = MonitorService()
+    service.engine = ShardedScanEngine(2, 20, checker_factory=FakeChecker, storage='sqlite')
+
+    def kill_a_shard():
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            scan, _, domains = scan_row(db_path)
+            shards = [child for child in multiprocessing.active_children() if child.name == 'scan-shard-0']
+            if scan and domains > 0 and shards:
+                os.kill(shards[0].pid, signal.SIGKILL)
+                return
+            time.sleep(0.05)
+
+    threading.Thread(target=kill_a_shard, daemon=True).start()
+    started = time.time()
+    try:
+        service.run_scan()
+        outcome = 'finished'
+    except Exception as e:
+        outcome = type(e).__name__
+    results.put((outcome, time.time() - started))
+
+
+def scan_row(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        scan = conn.execute('SELECT * FROM scan_history ORDER BY id DESC LIMIT 1').fetchone()
+        pending = conn.execute('SELECT COUNT(*) FROM scan_work WHERE scan_id = ? AND done = 0',
+                               (scan['id'],)).fetchone()[0] if scan else 0
+        domains = conn.execute('SELECT COUNT(*) FROM domains').fetchone()[0]
+        return scan, pending, domains
+    except sqlite3.OperationalError:
+        # Schema not created yet
+        return None, 0, 0
+    finally:
+        conn.close()
+
+
+def leased_work(db_path):
+    """Keywords of unfinished scans that some node still holds a lease on"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM scan_work WHERE done = 0 AND owner IS NOT NULL').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def interrupt_when_progressing(context, db_path, results, sig):
+    """Start a child run and send it `sig` once it has checkpointed more keywords"""
+    scan, _, _ = scan_row(db_path)
+    done_before = scan['keywords_done'] if scan else 0
+    child = context.Process(target=run_child, args=(db_path, results))
+    child.start()
+    deadline = time.time() + 60
+    while time.time() < deadline and child.is_alive():
+        scan, _, _ = scan_row(db_path)
+        if scan and scan['status'] == 'Running' and scan['keywords_done'] > done_before:
+            break
+        time.sleep(0.05)
+    os.kill(child.pid, sig)
+    child.join(30)
+    return scan_row(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that interrupted scans resume where they stopped')
+    parser.add_argument('--keywords', type=int, default=300)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-resume-')
+    db_path = os.path.join(workdir, 'resume.db')
+    os.environ['DATABASE_PATH'] = db_path
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    logging.disable(logging.INFO)
+    from config import Config
+    from database import Database
+
+    passed = True
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    try:
+        print("=" * 60)
+        print("CHECKPOINTED SCAN CHECK")
+        print("=" * 60)
+        Database().add_keywords_bulk([f'resumekw{i}' for i in range(options.keywords)])
+        expected_domains = options.keywords * len(Config.DOMAIN_EXTENSIONS)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+
+        print("\n--- Run 1: killed partway ---")
+        scan, pending, domains = interrupt_when_progressing(context, db_path, results, signal.SIGKILL)
+        print(f"Scan #{scan['id']}: {scan['keywords_done']}/{scan['keywords_scanned']} keyword(s) done, "
+              f"{domains} domain(s) stored")
+        check(scan['status'] == 'Running' and 0 < pending < options.keywords,
+              "Killed scan is left Running with part of its work list pending")
+        scan_id = scan['id']
+
+        print("\n--- Run 2: resumed, then interrupted ---")
+        # The killed run's leases must expire; checkpoint times have one-second resolution
+        time.sleep(2.5)
+        scan, pending_after, domains = interrupt_when_progressing(context, db_path, results, signal.SIGINT)
+        print(f"Scan #{scan['id']}: {scan['keywords_done']}/{scan['keywords_scanned']} keyword(s) done, "
+              f"status {scan['status']}, {scan['elapsed_seconds']:.2f}s so far")
+        check(scan['id'] == scan_id and scan['resumed'] == 1, "Second run resumed the same scan")
+        check(scan['status'] == 'Partial' and pending_after < pending,
+              "Interrupted scan is recorded as Partial and made progress")
+
+        print("\n--- Run 3: resumed to the end ---")
+        child = context.Process(target=run_child, args=(db_path, results))
+        child.start()
+        generated = results.get(timeout=120)
+        child.join(30)
+        scan, left, domains = scan_row(db_path)
+        print(f"Scan #{scan['id']}: {scan['keywords_done']}/{scan['keywords_scanned']} keyword(s) done, "
+              f"status {scan['status']}, resumed {scan['resumed']}x, {scan['elapsed_seconds']:.2f}s in total")
+        print(f"Last run generated {generated} candidate(s) for {pending_after} pending keyword(s)")
+        check(scan['id'] == scan_id and scan['resumed'] == 2 and scan['status'] == 'Success',
+              "Third run finished the same scan")
+        check(generated == pending_after * len(Config.DOMAIN_EXTENSIONS),
+              "Only the keywords not yet done were scanned again")
+        check(left == 0 and scan['keywords_done'] == options.keywords and scan['finished_date'] is not None,
+              "Work list is cleared and the scan is complete")
+        check(domains == expected_domains, f"All {expected_domains} domains are stored ({domains})")
+
+        print("\n--- Sharded scan: a worker process killed partway ---")
+        sharded_path = os.path.join(workdir, 'sharded.db')
+        Config.DATABASE_PATH = os.environ['DATABASE_PATH'] = sharded_path
+        Database().add_keywords_bulk([f'shardkw{i}' for i in range(options.keywords)])
+        child = context.Process(target=run_sharded_child, args=(sharded_path, results))
+        child.start()
+        outcome, elapsed = results.get(timeout=180)
+        child.join(30)
+        scan, pending, domains = scan_row(sharded_path)
+        print(f"run_scan ended with {outcome} after {elapsed:.2f}s; scan #{scan['id']}: "
+              f"{scan['keywords_done']}/{scan['keywords_scanned']} keyword(s) done, status {scan['status']}")
+        check(outcome == 'ShardFailed' and scan['status'] == 'Partial' and pending > 0,
+              "The scan fails instead of waiting for the dead shard's keywords")
+        check(leased_work(sharded_path) == 0, "Its unfinished keywords are handed back, not left leased")
+        child = context.Process(target=run_child, args=(sharded_path, results))
+        child.start()
+        results.get(timeout=120)
+        child.join(30)
+        scan, left, domains = scan_row(sharded_path)
+        check(scan['status'] == 'Success' and left == 0 and domains == expected_domains,
+              f"The next run finished the scan with all {expected_domains} domains stored ({domains})")
+
+        print("\n" + ("✅ PASS: Interrupted scans resume where they stopped" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Storage engine parity check.
+Runs the same keyword, scan, notification, history and settings operations
+against the SQLite engine (temporary database) and the in-memory engine and
+checks that every StorageBackend method returns the same thing.
+
+Usage: python scripts/verify_storage_parity.py [--domains N]
+"""
+import sys
+import os
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Columns that differ by design: wall-clock stamps set by each engine, and
+# ids (SQLite AUTOINCREMENT also spends ids on upserts that update)
+VOLATILE = {'added_date', 'scan_date', 'checked_date', 'checkpoint_date', 'finished_date', 'queued_date', 'epoch',
+            'id', 'keyword_id', 'domain_id'}
+
+
+def plain(value):
+    """Comparable form of a method result (rows become dicts without volatile columns)"""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items() if key not in VOLATILE}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if hasattr(value, 'keys'):
+        return plain({key: value[key] for key in value.keys()})
+    return value
+
+
+def operations(domain_count):
+    """(name, callable(storage)) steps; every StorageBackend method is used"""
+    rng = random.Random(5)
+    base = datetime(2030, 1, 1)
+    domains = [f'site{i}.{rng.choice(["com", "net", "io"])}' for i in range(domain_count)]
+
+    def keyword_id(storage, keyword):
+        return next(row['id'] for row in storage.get_all_keywords() if row['keyword'] == keyword)
+
+    def fresh_second():
+        # Transitions are kept per second; writes that share one in one engine must in the other too
+        time.sleep(1 - time.time() % 1)
+
+    def scan(storage, seed):
+        fresh_second()
+        local = random.Random(seed)
+        # Keyword ids are engine-assigned (SQLite's have gaps), so look them up
+        keyword_ids = {row['keyword']: row['id'] for row in storage.get_all_keywords()}
+        rows = []
+        for i, domain in enumerate(domains):
+            roll = local.random()
+            available = None if roll < 0.05 else int(roll < 0.4)
+            rows.append((keyword_ids[f'word{i % 20}'], domain, available, base + timedelta(hours=local.randint(0, 48)),
+                         base + timedelta(days=300) if local.random() < 0.2 else None,
+                         'ok' if local.random() < 0.2 else None))
+        return storage.apply_scan_results(rows)
+
+    def due_pages(storage, cutoff):
+        """Every due domain, 50 at a time, paged by id like ExpiryScheduler"""
+        pages, last_id = [], 0
+        while True:
+            rows = storage.get_due_domains(cutoff, last_id, 50)
+            if not rows:
+                return pages
+            pages.append(rows)
+            last_id = rows[-1]['id']
+
+    def claim_due(storage, cutoff):
+        """Claim a page of due domains, then schedule them at a fixed time again"""
+        claimed = storage.claim_due_domains(cutoff, 0, 30, 60)
+        still_due = sum(len(page) for page in due_pages(storage, cutoff))
+        # Claims push next_check to a wall-clock time, which differs per engine
+        for row in claimed:
+            storage.set_next_check(row['domain'], base + timedelta(hours=1))
+        return claimed, still_due
+
+    def full_scan(storage):
+        """Id of the first scan started below (the second one has no keywords)"""
+        return storage.get_scan_history(2)[-1]['id']
+
+    def keyword_ids(storage, count):
+        return sorted(row['id'] for row in storage.get_all_keywords())[:count]
+
+    def walk(storage, method, **filters):
+        """Every page of a listing, 37 rows at a time"""
+        from storage import page_cursor
+        listing = 'available' if method == 'get_available_domains' else 'all'
+        pages, cursor = [], None
+        while True:
+            rows = getattr(storage, method)(37, cursor, **filters)
+            pages.append(rows)
+            if len(rows) < 37:
+                return pages
+            cursor = page_cursor(listing, rows[-1])
+
+    def feed(storage):
+        """Every transition, 50 at a time, paged by (epoch, available, domain_id) like EventStream"""
+        rows, after = [], (0, 0, 0)
+        while True:
+            page = storage.get_events_after(after, 50)
+            rows.extend(page)
+            if len(page) < 50:
+                # Ids and epochs are engine-assigned, so compare the transitions as a set
+                return len(rows), sorted((row['domain'], row['keyword'], row['available'], str(row['previous']))
+                                         for row in rows)
+            last = page[-1]
+            after = (last['epoch'], last['available'], last['domain_id'])
+
+    def data_version(storage):
+        """The version moves when another connection (thread) writes, and not by itself"""
+        before = storage.get_data_version()
+        writer = threading.Thread(target=lambda: storage.save_settings({'smtp_from': 'feed@example'}))
+        writer.start()
+        writer.join()
+        after = storage.get_data_version()
+        return [after != before, storage.get_data_version() == after]
+
+    def unnotified(storage):
+        return sorted((row['domain'], row['keyword']) for row in storage.get_unnotified_domains())
+
+    def due_ids(storage, count):
+        return [row['id'] for row in storage.get_due_notifications(base.timestamp(), count)]
+
+    return [
+        ('add_keyword', lambda s: [s.add_keyword(f'word{i}') for i in range(15)] + [s.add_keyword('WORD3 ')]),
+        ('add_keywords_bulk', lambda s: s.add_keywords_bulk([f'word{i}' for i in range(10, 20)])),
+        ('insert_keywords', lambda s: s.insert_keywords(['word19', 'word20', 'word21'])),
+        ('get_all_keywords', lambda s: s.get_all_keywords()),
+        ('apply_scan_results', lambda s: scan(s, 1)),
+        ('apply_scan_results (rescan)', lambda s: scan(s, 2)),
+        ('add_domain', lambda s: [fresh_second(), s.add_domain(keyword_id(s, 'word0'), domains[0], 1),
+                                  fresh_second(), s.add_domain(keyword_id(s, 'word0'), domains[0], 0),
+                                  s.add_domain(keyword_id(s, 'word1'), 'brandnew.com', 1, base)]),
+        ('get_cached_verdicts', lambda s: s.get_cached_verdicts(domains[:200] + ['unknown.com'])),
+        ('get_registry_records', lambda s: s.get_registry_records(domains[:200] + ['unknown.com'])),
+        ('set_next_check', lambda s: [s.set_next_check(domains[5], base), s.set_next_check('unknown.com', base)]),
+        ('get_due_domains', lambda s: due_pages(s, base + timedelta(hours=12))),
+        ('claim_due_domains', lambda s: claim_due(s, base + timedelta(hours=6))),
+        ('get_next_check_time', lambda s: s.get_next_check_time()),
+        ('get_available_domains', lambda s: walk(s, 'get_available_domains')),
+        ('get_available_domains (filtered)', lambda s: walk(s, 'get_available_domains', tld='.io', keyword='Word4')),
+        ('get_all_domains', lambda s: walk(s, 'get_all_domains')),
+        ('get_all_domains (filtered)', lambda s: walk(s, 'get_all_domains', tld='net', status='taken')),
+        ('get_all_domains (keyword)', lambda s: walk(s, 'get_all_domains', keyword='word7')),
+        ('iter_export_rows', lambda s: list(s.iter_export_rows(status='available', batch_size=50))),
+        ('get_unnotified_domains', lambda s: sorted(s.get_unnotified_domains(), key=lambda row: row['id'])),
+        ('queue_notifications', lambda s: [s.queue_notifications('new', unnotified(s)[:40]),
+                                           s.queue_notifications('new', unnotified(s)[30:50]),
+                                           s.queue_notifications('lost', [(domains[1], 'word1'), (domains[2], 'word2')]),
+                                           s.queue_notifications('lost', [(domains[1], 'word1')])]),
+        ('get_due_notifications', lambda s: [s.get_due_notifications(base.timestamp()),
+                                             s.get_due_notifications(base.timestamp(), 5)]),
+        ('defer_notifications', lambda s: [s.defer_notifications(due_ids(s, 5), base.timestamp() + 60, 'timed out'),
+                                           s.defer_notifications(due_ids(s, 2), base.timestamp() + 30, 'refused'),
+                                           len(s.get_due_notifications(base.timestamp())),
+                                           s.get_due_notifications(base.timestamp() + 3600, 8)]),
+        ('complete_notifications', lambda s: [s.complete_notifications(due_ids(s, 45)), len(unnotified(s)),
+                                              s.get_due_notifications(base.timestamp() + 3600),
+                                              s.queue_notifications('lost', [(domains[1], 'word1')])]),
+        ('get_stats', lambda s: s.get_stats()),
+        ('get_domain_history', lambda s: [len(s.get_domain_history(domain)) for domain in domains[:100]]),
+        ('get_events', lambda s: sorted((row['domain'], row['available'], row['keyword'])
+                                        for row in s.get_events(0, limit=100000))),
+        ('get_events_after', lambda s: feed(s)),
+        ('get_data_version', lambda s: data_version(s)),
+        ('compact_events', lambda s: s.compact_events(int(time.time()) + 60)),
+        ('get_events (compacted)', lambda s: len(s.get_events(0, limit=100000))),
+        ('add_scan_record', lambda s: [s.add_scan_record(15, 7, 'Success', 3, 4, lookups=6), s.add_scan_record(1, 0, 'No keywords')]),
+        ('get_scan_history', lambda s: s.get_scan_history(5)),
+        ('start_scan', lambda s: [s.start_scan([row['id'] for row in s.get_all_keywords()]), s.start_scan([])]),
+        ('get_scan_work', lambda s: sorted(s.get_scan_work(full_scan(s)).values())),
+        ('claim_scan_work', lambda s: [len(s.claim_scan_work(full_scan(s), 'node-a', 6, 60)),
+                                       len(s.claim_scan_work(full_scan(s), 'node-b', 100, 60)),
+                                       s.claim_scan_work(full_scan(s), 'node-c', 100, 60)]),
+        ('renew_scan_work', lambda s: [s.renew_scan_work(full_scan(s), 'node-a', keyword_ids(s, 10), 60),
+                                       s.renew_scan_work(full_scan(s), 'node-c', keyword_ids(s, 10), 60)]),
+        ('release_scan_work', lambda s: [s.release_scan_work(full_scan(s), 'node-a', keyword_ids(s, 3)),
+                                         len(s.claim_scan_work(full_scan(s), 'node-c', 100, 60))]),
+        ('checkpoint_scan', lambda s: [s.checkpoint_scan(full_scan(s), keyword_ids(s, 5), 4, 3, 2, 2, 1.5),
+                                       s.checkpoint_scan(full_scan(s), keyword_ids(s, 8), 6, 3, 9, 7, 2.5, 'Partial')]),
+        ('get_scan', lambda s: [s.get_scan(full_scan(s)), s.get_scan(-1)]),
+        ('join_scan', lambda s: [s.join_scan(60), s.join_scan(60)]),
+        ('acquire_lease', lambda s: [s.acquire_lease('scan:1', 'node-a', 60), s.acquire_lease('scan:1', 'node-b', 60),
+                                     s.acquire_lease('scan:1', 'node-a', 60), s.acquire_lease('scan:2', 'node-b', 0),
+                                     s.acquire_lease('scan:2', 'node-a', 60)]),
+        ('release_lease', lambda s: [s.release_lease('scan:1', 'node-b'), s.acquire_lease('scan:1', 'node-b', 60),
+                                     s.release_lease('scan:1', 'node-a'), s.acquire_lease('scan:1', 'node-b', 60),
+                                     s.release_lease('scan:1', 'node-b'), s.release_lease('scan:2', 'node-a')]),
+        ('finish_scan', lambda s: s.finish_scan(full_scan(s))),
+        ('get_scan_history (scans)', lambda s: [s.get_scan_history(3), s.get_scan_work(full_scan(s))]),
+        ('save_setting', lambda s: s.save_setting('smtp_port', 587)),
+        ('save_settings', lambda s: s.save_settings({'smtp_server': 'mail.example', 'smtp_to': 'a@b'})),
+        ('get_setting', lambda s: [s.get_setting('smtp_port'), s.get_setting('missing', 'x')]),
+        ('get_settings', lambda s: {key: value for key, value in s.get_settings().items()}),
+        ('clear_all_data', lambda s: [s.acquire_lease('scan:1', 'node-a', 60), s.clear_all_data()]),
+        ('get_stats (cleared)', lambda s: s.get_stats()),
+        ('acquire_lease (cleared)', lambda s: s.acquire_lease('scan:1', 'node-b', 60)),
+        ('get_setting (generation)', lambda s: s.get_setting('data_generation')),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the storage engines behave the same')
+    parser.add_argument('--domains', type=int, default=2000)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-parity-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'parity.db')
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    logging.disable(logging.INFO)
+    from storage import StorageBackend, get_storage
+
+    try:
+        print("=" * 60)
+        print("STORAGE ENGINE PARITY CHECK")
+        print("=" * 60)
+        sqlite, memory = get_storage('sqlite'), get_storage('memory')
+        steps = operations(options.domains)
+
+        failures = []
+        for name, step in steps:
+            expected, actual = plain(step(sqlite)), plain(step(memory))
+            if expected == actual:
+                print(f"✅ {name}")
+            else:
+                print(f"❌ {name}\n      sqlite: {str(expected)[:200]}\n      memory: {str(actual)[:200]}")
+                failures.append(name)
+
+        interface = {name for name in dir(StorageBackend) if not name.startswith('_')}
+        untested = interface - {name.split(' ')[0] for name, _ in steps}
+        if untested:
+            print(f"\n❌ FAIL: Not compared: {', '.join(sorted(untested))}; add them to operations()")
+        elif failures:
+            print(f"\n❌ FAIL: Engines differ in {', '.join(failures)}")
+        else:
+            print("\n✅ PASS: SQLite and in-memory engines agree")
+        print("=" * 60)
+        sys.exit(1 if failures or untested else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
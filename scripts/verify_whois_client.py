@@ -0,0 +1,84 @@
+"""
+Verify the WHOIS client against a local fake port-43 server.
+The fake plays both IANA (for server discovery) and a registry.
+"""
+import sys
+import os
+import socketserver
+import tempfile
+import threading
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from whois_client import WhoisClient, WhoisRateLimited
+
+REGISTERED_RECORD = """Domain Name: TAKEN.TEST
+Registry Domain ID: 123_DOMAIN_TEST-VRSN
+Registry Expiry Date: 2031-04-05T12:00:00Z
+Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+Domain Status: redemptionPeriod https://icann.org/epp#redemptionPeriod
+"""
+
+
+class FakeWhoisHandler(socketserver.StreamRequestHandler):
+    connections = 0
+
+    def handle(self):
+        FakeWhoisHandler.connections += 1
+        query = self.rfile.readline().decode().strip()
+        if query == 'test':
+            # IANA-style referral for the TLD
+            reply = f"domain:       TEST\nwhois:        {self.server.registry}\n"
+        elif query == 'taken.test':
+            reply = REGISTERED_RECORD
+        elif query == 'busy.test':
+            reply = "Query rate limit exceeded. Please try again later.\n"
+        else:
+            reply = f'No match for "{query.upper()}".\n'
+        self.wfile.write(reply.encode())
+
+
+def check(label, ok):
+    print(f"{'✅ PASS' if ok else '❌ FAIL'}: {label}")
+
+
+def main():
+    print("=" * 60)
+    print("TESTING WHOIS CLIENT")
+    print("=" * 60)
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeWhoisHandler)
+    server.daemon_threads = True
+    address = f"127.0.0.1:{server.server_address[1]}"
+    server.registry = address
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    cache_path = os.path.join(tempfile.mkdtemp(), 'whois_servers.json')
+    client = WhoisClient(iana_server=address, timeout=2, cache_path=cache_path)
+
+    record = client.lookup('taken.test')
+    check("IANA referral discovered the registry", record['server'] == address)
+    check("Registered domain parsed", record['registered'] is True)
+    check("Expiration date parsed", record['expiration_date'] and record['expiration_date'].year == 2031)
+    check("Status codes parsed", record['statuses'] == ['clientTransferProhibited', 'redemptionPeriod'])
+
+    check("Unregistered domain parsed", client.lookup('free.test')['registered'] is False)
+
+    try:
+        client.lookup('busy.test')
+        check("Rate-limit refusal raised", False)
+    except WhoisRateLimited:
+        check("Rate-limit refusal raised", True)
+
+    # A fresh client should route from the persisted map without asking IANA
+    before = FakeWhoisHandler.connections
+    WhoisClient(iana_server='127.0.0.1:1', timeout=2, cache_path=cache_path).lookup('taken.test')
+    check("Learned server reused from cache", FakeWhoisHandler.connections == before + 1)
+
+    server.shutdown()
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
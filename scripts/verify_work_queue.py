@@ -0,0 +1,228 @@
+"""
+Shared scan check.
+Runs MonitorService.run_scan in several processes at once against one
+temporary SQLite file, with fake lookups and SMTP. Checks that the nodes
+split the scan instead of each scanning everything, that one of them sends
+the new-domain alert, and that when a node is killed mid-scan the others
+reclaim its keywords once its leases run out.
+
+Usage: python scripts/verify_work_queue.py [--nodes N] [--keywords N]
+"""
+import sys
+import os
+import argparse
+import multiprocessing
+import re
+import shutil
+import signal
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+
+def run_node(db_path, name, start, results):
+    """Child process: one monitor node running run_scan"""
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'STORAGE_ENGINE': 'sqlite',
+        'NODE_ID': name,
+        # Short leases and small batches, so the test sees claims and expiry
+        'SCAN_LEASE_SECONDS': '2',
+        'SCAN_CLAIM_BATCH': '5',
+        'DB_WRITE_BATCH': '50',
+        'SMTP_SERVER': 'localhost',
+        'SMTP_USERNAME': 'queue',
+        'SMTP_PASSWORD': 'queue',
+        'SMTP_FROM': 'queue@localhost',
+        'SMTP_TO': 'queue@localhost',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import logging
+    from fake_backends import FakeChecker, FakeSMTP
+    import email_notifier
+    from monitor_service import MonitorService
+    from scan_engine import ScanEngine
+
+    logging.disable(logging.WARNING)
+    email_notifier.smtplib.SMTP = FakeSMTP
+
+    service = MonitorService()
+    service.checker = FakeChecker(dns_latency=0.005, whois_latency=0.02, jitter=0.2)
+    service.engine = ScanEngine(service.checker, 20, registry=service.db)
+
+    checked = []
+    scan_candidates = service.engine.scan_candidates
+
+    def recording(candidates):
+        for result in scan_candidates(candidates):
+            checked.append((result[0], result[2]))
+            yield result
+
+    service.engine.scan_candidates = recording
+    start.wait()
+    service.run_scan()
+    # Alerts are emailed from a background thread; deliver them before reporting
+    service.sender.close()
+    results.put({'node': name, 'checked': checked, 'emails': [msg['Subject'] for msg in FakeSMTP.sent]})
+
+
+def add_keywords(db_path, count):
+    """Child process: create the database with its keywords"""
+    os.environ['DATABASE_PATH'] = db_path
+    from database import Database
+    Database().add_keywords_bulk([f'queuekw{i}' for i in range(count)])
+
+
+def query(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        # Schema not created yet
+        return []
+    finally:
+        conn.close()
+
+
+def start_nodes(context, db_path, count, results):
+    start = context.Event()
+    nodes = [context.Process(target=run_node, args=(db_path, f'node-{i}', start, results)) for i in range(count)]
+    for node in nodes:
+        node.start()
+    # Let every node import before any of them scans
+    time.sleep(1)
+    start.set()
+    return nodes
+
+
+def collect(results, count, timeout=180):
+    reports = []
+    deadline = time.time() + timeout
+    while len(reports) < count and time.time() < deadline:
+        try:
+            reports.append(results.get(timeout=max(0.1, deadline - time.time())))
+        except Exception:
+            break
+    return reports
+
+
+def new_domain_alerts(reports):
+    return [subject for report in reports for subject in report['emails'] if 'New Domain' in subject]
+
+
+def alerted(reports):
+    """Domains announced by the new-domain alerts (large scans take several digests)"""
+    return sum(int(re.search(r'(\d+) New Domain', subject).group(1)) for subject in new_domain_alerts(reports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that monitor nodes share one scan')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--keywords', type=int, default=300)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='domain-queue-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'unused.db')
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+    import logging
+    logging.disable(logging.INFO)
+    from config import Config
+
+    passed = True
+    context = multiprocessing.get_context('spawn')
+
+    def check(ok, message):
+        nonlocal passed
+        passed = passed and ok
+        print(f"{'✅ PASS' if ok else '❌ FAIL'}: {message}")
+
+    def prepare(name):
+        # Database connections are per thread, not per file, so each file is set up in its own process
+        db_path = os.path.join(workdir, name)
+        setup = context.Process(target=add_keywords, args=(db_path, options.keywords))
+        setup.start()
+        setup.join()
+        return db_path
+
+    try:
+        print("=" * 60)
+        print(f"SHARED SCAN CHECK ({options.nodes} nodes)")
+        print("=" * 60)
+        expected_domains = options.keywords * len(Config.DOMAIN_EXTENSIONS)
+        results = context.Queue()
+
+        print("\n--- All nodes run to the end ---")
+        db_path = prepare('shared.db')
+        nodes = start_nodes(context, db_path, options.nodes, results)
+        reports = collect(results, options.nodes)
+        for node in nodes:
+            node.join(30)
+        checks = Counter(domain for report in reports for _, domain in report['checked'])
+        scan = query(db_path, 'SELECT * FROM scan_history ORDER BY id DESC')
+        stored = query(db_path, 'SELECT COUNT(*) FROM domains')[0][0]
+        available = query(db_path, 'SELECT COUNT(*) FROM domains WHERE available = 1')[0][0]
+        for report in sorted(reports, key=lambda report: report['node']):
+            print(f"{report['node']}: checked {len(report['checked'])} domain(s), sent {len(report['emails'])} email(s)")
+        check(len(reports) == options.nodes and all(report['checked'] for report in reports),
+              "Every node finished and did part of the work")
+        check(max(checks.values(), default=0) == 1 and len(checks) == expected_domains,
+              f"Each of the {expected_domains} domains was checked by exactly one node")
+        check(len(scan) == 1 and scan[0]['status'] == 'Success' and scan[0]['keywords_done'] == options.keywords,
+              "The nodes shared one scan, which finished")
+        check(scan and scan[0]['domains_found'] == available and scan[0]['lookups'] == expected_domains,
+              "Scan totals add up over the nodes")
+        alerts = new_domain_alerts(reports)
+        senders = [report['node'] for report in reports if new_domain_alerts([report])]
+        check(len(senders) == 1 and alerted(reports) == available and stored == expected_domains,
+              f"One node announced each of the {available} available domains once ({len(alerts)} digest(s))")
+
+        print("\n--- One node killed mid-scan ---")
+        db_path = prepare('killed.db')
+        nodes = start_nodes(context, db_path, options.nodes, results)
+        victim = nodes[0]
+        held = []
+        deadline = time.time() + 60
+        while time.time() < deadline and not held:
+            held = [row[0] for row in query(db_path, "SELECT keyword_id FROM scan_work "
+                                                     "WHERE owner = 'node-0' AND done = 0")]
+            done = query(db_path, 'SELECT keywords_done FROM scan_history ORDER BY id DESC LIMIT 1')
+            if not (done and done[0][0] > 0):
+                held = []
+                time.sleep(0.05)
+        os.kill(victim.pid, signal.SIGKILL)
+        victim.join()
+        # What it still held when it died; its leases keep others off for a while
+        held = [row[0] for row in query(db_path, "SELECT keyword_id FROM scan_work "
+                                                 "WHERE owner = 'node-0' AND done = 0")]
+        print(f"Killed node-0 holding {len(held)} keyword(s)")
+        reports = collect(results, options.nodes - 1)
+        for node in nodes:
+            node.join(30)
+        checks = Counter(domain for report in reports for _, domain in report['checked'])
+        reclaimed = {keyword_id for report in reports for keyword_id, _ in report['checked']} & set(held)
+        scan = query(db_path, 'SELECT * FROM scan_history ORDER BY id DESC')
+        stored = query(db_path, 'SELECT COUNT(*) FROM domains')[0][0]
+        print(f"Survivors checked {sum(checks.values())} domain(s); scan #{scan[0]['id']} is {scan[0]['status']}")
+        check(len(reports) == options.nodes - 1 and max(checks.values(), default=0) == 1,
+              "Surviving nodes finished without checking a domain twice")
+        check(held and len(reclaimed) == len(held), "The killed node's keywords were reclaimed and checked")
+        check(len(scan) == 1 and scan[0]['status'] == 'Success' and scan[0]['keywords_done'] == options.keywords,
+              "The scan still finished")
+        check(stored == expected_domains, f"All {expected_domains} domains are stored ({stored})")
+        available = query(db_path, 'SELECT COUNT(*) FROM domains WHERE available = 1')[0][0]
+        check(alerted(reports) == available, "Each available domain was announced once")
+
+        print("\n" + ("✅ PASS: Monitor nodes share scans through the work queue" if passed
+                      else "❌ FAIL: See above"))
+        print("=" * 60)
+        sys.exit(0 if passed else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()